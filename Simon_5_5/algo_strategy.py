@@ -42,7 +42,138 @@ class AlgoStrategy(gamelib.AlgoCore):
         MP = 1
         SP = 0
         # This is a good place to do initial setup
-        self.scored_on_locations = []
+        # Per-tile totals of the events of every action frame, breaches included
+        self.frame_events = gamelib.FrameEventAggregator()
+        # Damage our structures take each action phase, to decide what to rebuild before it falls
+        self.health_forecast = gamelib.StructureHealthForecast(config)
+        self.compile_build_plans(config)
+        # Answers worked out offline for enemy layouts seen before, see scripts/build_opening_book.py
+        self.opening_book = gamelib.OpeningBook(config).load()
+        self.book_response = None
+        # Load the tables that are the same every game with this config, building them on the first game
+        self.precompute = gamelib.PrecomputeCache(config)
+        self.precompute.load_or_build(layouts=[("opening", self.opening_layout(config))])
+        self.precompute.install()
+
+    def compile_build_plans(self, config):
+        """
+        Write down the build orders of build_defences and build_active_defense once, spawns and early upgrades
+        together. Each turn they only queue the steps that are not done yet and that we can afford, in this order.
+        The upgrades that used to come after every spawn are kept apart, to be picked by value once the plan is done.
+        """
+        # Useful tool for setting up your base locations: https://www.kevinbai.design/terminal-map-maker
+        # More community tools available at: https://terminal.c1games.com/rules#Download
+
+        # Place turrets that attack enemy units
+        # turret_locations = [[0, 13], [27, 13], [8, 11], [19, 11], [13, 11], [14, 11]]
+        turret_locations = [[12, 10], [16, 10], [16, 9], [12, 9]]
+
+        # Place walls in front of turrets to soak up damage for them
+        # wall_locations = [[8, 12], [19, 12]]
+        wall_locations = [[0, 13], [27, 13], [1, 12], [26, 12], [2, 11], [25, 11], [12, 11], [16, 11], 
+                          [13, 12], [15, 12], [2, 12], [25, 12], [13, 10], [15, 10], [13, 9], [15, 9]]
+        support_locations = [[11, 9], [17, 9], [10, 9], [18 ,9]]
+
+        self.basic_turret_locations = turret_locations
+        self.basic_wall_locations = wall_locations
+        self.basic_support_locations = support_locations
+        self.important_wall_locations = [[2, 12], [25, 12], [12, 11], [16, 11], [13, 10], [15, 10], [13, 9], [16, 9]]
+
+        plan = gamelib.BuildPlan(config)
+        # round 0
+        plan.spawn(WALL, wall_locations[:9])
+        for x in range(3, 11):
+            plan.spawn(WALL, [[x, 10], [27-x, 10]])
+        plan.spawn(WALL, [11, 10])
+        plan.spawn(TURRET, turret_locations[:2])
+        plan.upgrade(TURRET, turret_locations[0])
+        # round 1
+        plan.spawn(WALL, wall_locations[9])
+        plan.upgrade(WALL, wall_locations[:2])
+        # round 2
+        plan.spawn(WALL, wall_locations[10:14])
+        # round 3
+        plan.spawn(SUPPORT, support_locations[0])
+        plan.upgrade(SUPPORT, support_locations[0])
+        # round 4
+        plan.upgrade(TURRET, turret_locations[1])
+        # round 5
+        plan.upgrade(WALL, wall_locations[2:4])
+        # round 6
+        plan.spawn(WALL, wall_locations[14:])
+        plan.spawn(TURRET, turret_locations[2:])
+        self.defence_plan = plan
+        # round 7 and 8~ ([16, 9] holds a turret)
+        self.defence_upgrade_locations = turret_locations[2:] + [location for location in self.important_wall_locations if location not in turret_locations]
+        # upgrade walls so they soak more damage
+        #self.defence_upgrade_locations += wall_locations
+
+        turret_locations_stage_1 = [[11, 8], [16, 8]]
+        wall_locations_stage_1 = [[12, 8], [15, 8]]
+        support_locations_stage_1 = self.basic_support_locations
+
+        turret_locations_stage_2  = turret_locations_stage_1 + [[11, 7], [15, 7]]
+        wall_locations_stage_2 = wall_locations_stage_1 + [[12, 7], [14, 7]]
+        support_locations_stage_2 = support_locations_stage_1 + [[9, 9], [19, 9]]
+
+        support_locations_stage_3 =  [[11, 8], [17, 9], [10, 8], [18, 8], [8, 8], [19, 8]]
+        turret_locations_stage_3 = [[11, 6], [16, 6], [12, 5], [16, 5], [11, 4], [16, 4], 
+                                                               [11, 3], [15, 3]]
+        guard_walls = [[12, 6], [15, 6], [13, 5], [15, 5], [12, 4], [15, 4], 
+                                                               [12, 3], [14, 3]]
+
+        stage_1 = gamelib.BuildPlan(config)
+        stage_1.spawn(TURRET, turret_locations_stage_1)
+        stage_1.spawn(WALL, wall_locations_stage_1)
+
+        stage_2 = gamelib.BuildPlan(config)
+        stage_2.spawn(TURRET, turret_locations_stage_1)
+        stage_2.upgrade(TURRET, turret_locations_stage_1)
+        stage_2.spawn(TURRET, turret_locations_stage_2)
+        stage_2.spawn(WALL, wall_locations_stage_2)
+        stage_2.spawn(SUPPORT, support_locations_stage_2)
+
+        stage_3 = gamelib.BuildPlan(config)
+        stage_3.spawn(TURRET, turret_locations_stage_2)
+        stage_3.spawn(WALL, wall_locations_stage_2)
+        stage_3.spawn(SUPPORT, support_locations_stage_2)
+        stage_3.upgrade(TURRET, turret_locations_stage_2)
+        stage_3.upgrade(WALL, wall_locations_stage_2)
+        stage_3.upgrade(SUPPORT, support_locations_stage_2)
+        stage_3.upgrade(WALL, [[13, 12], [15, 12]])
+        stage_3.upgrade(TURRET, [[3, 11], [24, 11]])
+        stage_3.upgrade(WALL, [[3, 12], [24, 12]])
+        for i in range(len(turret_locations_stage_3)):
+            stage_3.spawn(WALL, guard_walls[i])
+            if turret_locations_stage_3[i] != [11, 3]:
+                stage_3.spawn(TURRET, turret_locations_stage_3[i])
+            if i<6:
+                stage_3.spawn(SUPPORT, support_locations_stage_3[i])
+
+        self.active_defense_plans = [stage_1, stage_2, stage_3]
+        self.active_defense_upgrade_locations = [
+            turret_locations_stage_1 + wall_locations_stage_1,
+            turret_locations_stage_2 + wall_locations_stage_2 + support_locations_stage_2 + [[2, 11], [25, 11]],
+            turret_locations_stage_3 + guard_walls + support_locations_stage_3]
+
+    def opening_layout(self, config):
+        """
+        The structures build_defences places on turn 0, found by running it on an empty board.
+        """
+        resources = config["resources"]
+        stats = [resources["startingHP"], resources["startingCores"], resources["startingBits"], 0]
+        empty = [[] for _ in config["unitInformation"]]
+        turn_0 = json.dumps({"p1Units": empty, "p2Units": empty, "turnInfo": [0, 0, -1],
+                             "p1Stats": stats, "p2Stats": stats, "events": {}})
+        game_state = gamelib.GameState(config, turn_0)
+        game_state.suppress_warnings(True)
+        game_state.enable_path_guard(True)
+        self.build_defences(game_state)
+        structures = []
+        for location in game_state.game_map:
+            for unit in game_state.game_map[location]:
+                structures.append((unit.unit_type, location, unit.player_index, unit.upgraded))
+        return structures
 
     def on_turn(self, turn_state):
         """
@@ -55,6 +186,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         game_state = gamelib.GameState(self.config, turn_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
+        game_state.enable_path_guard(True)  #Never wall off every route our scouts could take.
+        self.book_response = self.opening_book.lookup(game_state)
 
         self.starter_strategy(game_state)
 
@@ -73,6 +206,63 @@ class AlgoStrategy(gamelib.AlgoCore):
         For offense we will use long range demolishers if they place stationary units near the enemy's front.
         If there are no stationary units to attack in the front, we will send Scouts to try and score quickly.
         """
+        self.build_base(game_state)
+        if self.book_response is not None:
+            self.book_response.build(game_state)
+        self.reinforce_base(game_state)
+
+        # If the turn is less than 5, stall with interceptors and wait to see enemy's base
+        if game_state.turn_number == 0:
+            pass
+        else:
+            # if self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
+                # self.demolisher_line_strategy(game_state)
+                # They don't have many units in the front so lets figure out their least defended area and send Scouts there.
+            if game_state.turn_number < self.stage_1:
+                if game_state.turn_number % 3 == 0:
+                    # Only attack every other turn
+                    self.send_attack(game_state)
+                elif game_state.turn_number % 3 == 1:
+                    self.build_active_defense(game_state)
+                else:
+                    self.build_active_defense(game_state)
+                    game_state.attempt_remove(self.exit_locations_2)
+                
+            elif game_state.turn_number >= self.stage_1 and game_state.turn_number < self.stage_2: 
+                if game_state.turn_number % 4 == 0 and game_state.turn_number < 24:
+                    # Only attack every other turn
+                    if game_state.turn_number == 11:
+                        pass
+                    else:
+                        self.send_attack(game_state)
+                elif game_state.turn_number % 4 == 1 and game_state.turn_number >= 24:
+                    if game_state.turn_number == 11:
+                        pass
+                    else:
+                        self.send_attack(game_state)
+                else:
+                    self.build_active_defense(game_state)
+                    game_state.attempt_remove(self.exit_locations_2)
+                    # If they have many units in the front we can build a line for
+            
+            else:
+                if game_state.turn_number % 6 == 1:
+                    # Only attack every other turn
+                    self.send_attack(game_state)
+                else:
+                    self.build_active_defense(game_state)
+                    game_state.attempt_remove(self.exit_locations_2)
+
+            # Lastly, if we have spare SP, let's build some supports
+            support_locations = self.basic_support_locations
+            game_state.attempt_spawn(SUPPORT, support_locations)
+            game_state.attempt_upgrade(support_locations)
+
+    def build_base(self, game_state):
+        """
+        Set up this turn's locations, replace worn walls, guard the corners the enemy has scored on and
+        build the basic defences. This is the board the opening book's structures are added to.
+        """
         # define exit_locations for our attacks
         self.stage_1 = 12
         self.stage_2 = 36
@@ -86,10 +276,11 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         self.attacked_locations = []
         # First, place basic defenses
+        # Damaged walls are judged by the health they are expected to have after the coming action phase
         self.detect_scored_on_locations(game_state)
         for location in self.essential_locations:
             for unit in game_state.game_map[location]:
-                if unit.player_index == 0 and unit.unit_type == WALL and unit.health/unit.max_health < 0.55:
+                if unit.player_index == 0 and unit.unit_type == WALL and self.predicted_health_ratio(game_state, unit) < 0.55:
                     game_state.attempt_remove(location)
                     self.attacked_locations.append(location)
         if game_state.turn_number > 20:
@@ -101,20 +292,26 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         for location in self.essential_locations_2:
             for unit in game_state.game_map[location]:
-                if unit.player_index == 0 and unit.unit_type == WALL and unit.health/unit.max_health < 0.35:
+                if unit.player_index == 0 and unit.unit_type == WALL and self.predicted_health_ratio(game_state, unit) < 0.35:
                     game_state.attempt_remove(location)
         
-        for location in self.scored_on_locations:
-            if location[0]>=14 and location[1]>10:
-                game_state.attempt_spawn(WALL, [24, 12])
-                game_state.attempt_spawn(TURRET, [24, 11])
-            if location[0]<14 and location[1]>10:
-                game_state.attempt_spawn(WALL, [3, 12])
-                game_state.attempt_spawn(TURRET, [3, 11])
+        # Guard the corners the enemy has scored on
+        if self.frame_events.total("breach", 1, valid_x=range(14, 28), valid_y=range(11, 28)) > 0:
+            game_state.attempt_spawn(WALL, [24, 12])
+            game_state.attempt_spawn(TURRET, [24, 11])
+        if self.frame_events.total("breach", 1, valid_x=range(14), valid_y=range(11, 28)) > 0:
+            game_state.attempt_spawn(WALL, [3, 12])
+            game_state.attempt_spawn(TURRET, [3, 11])
 
 
         
         self.build_defences(game_state)
+
+    def reinforce_base(self, game_state):
+        """
+        Rebuild the corners we just replaced walls at and upgrade them, after the opening book's structures.
+        This is the board our attacks are sent against.
+        """
         if len(self.attacked_locations) != 0:
             if self.essential_locations[0] in self.attacked_locations:
                 game_state.attempt_spawn(WALL, [3, 12])
@@ -131,90 +328,22 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         self.upgrade_defences(game_state, nums = 0)
 
-        # If the turn is less than 5, stall with interceptors and wait to see enemy's base
-        if game_state.turn_number == 0:
-            pass
-        else:
-            # if self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
-                # self.demolisher_line_strategy(game_state)
-                # They don't have many units in the front so lets figure out their least defended area and send Scouts there.
-            if game_state.turn_number < self.stage_1:
-                if game_state.turn_number % 3 == 0:
-                    # Only attack every other turn
-
-                    # If they have many units in the front we can build a line for our demolishers to attack them at long range.
-                    # Now let's analyze the enemy base to see where their defenses are concentrated.
-                    if self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
-                        self.demolisher_line_strategy(game_state)
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                    else:
-                    # Sending more at once is better since attacks can only hit a single scout at a time
-                    # To simplify we will just check sending them from back left and right
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                elif game_state.turn_number % 3 == 1:
-                    self.build_active_defense(game_state)
-                else:
-                    self.build_active_defense(game_state)
-                    game_state.attempt_remove(self.exit_locations_2)
-                
-            elif game_state.turn_number >= self.stage_1 and game_state.turn_number < self.stage_2: 
-                if game_state.turn_number % 4 == 0 and game_state.turn_number < 24:
-                    # Only attack every other turn
-                    if game_state.turn_number == 11:
-                        pass
-                    elif self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
-                        self.demolisher_line_strategy(game_state)
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                    else:
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                elif game_state.turn_number % 4 == 1 and game_state.turn_number >= 24:
-                    if game_state.turn_number == 11:
-                        pass
-                    elif self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
-                        self.demolisher_line_strategy(game_state)
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                    else:
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                else:
-                    self.build_active_defense(game_state)
-                    game_state.attempt_remove(self.exit_locations_2)
-                    # If they have many units in the front we can build a line for
-            
-            else:
-                if game_state.turn_number % 6 == 1:
-                    # Only attack every other turn
-                    if self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
-                        self.demolisher_line_strategy(game_state)
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                    else:
-                        scout_spawn_location_options = self.scout_spawn_location_options
-                        best_location = self.least_damage_spawn_location(game_state, scout_spawn_location_options)
-                        game_state.attempt_spawn(SCOUT, best_location, 1000)
-                else:
-                    self.build_active_defense(game_state)
-                    game_state.attempt_remove(self.exit_locations_2)
+    def predicted_health_ratio(self, game_state, unit):
+        """
+        The share of its max health a structure is expected to have left after this turn's action phase,
+        going by the damage its location has taken in earlier action phases.
+        Structures at full health have not been hit since they were built, so they keep their full health.
+        """
+        if unit.health >= unit.max_health:
+            return 1.0
+        return self.health_forecast.predicted_health(unit, game_state.turn_number) / unit.max_health
 
-            # Lastly, if we have spare SP, let's build some supports
-            support_locations = self.basic_support_locations
-            game_state.attempt_spawn(SUPPORT, support_locations)
-            game_state.attempt_upgrade(support_locations)
+    def upgrade_by_value(self, game_state, locations):
+        """
+        Upgrade the structures at these locations that add the most threat coverage and durability
+        for the SP we have, picked together instead of in list order.
+        """
+        return gamelib.UpgradePrioritizer(game_state, locations).attempt()
 
     def upgrade_defences(self, game_state, wall_locations = None, nums = 2):
         if wall_locations is None:
@@ -233,71 +362,20 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         Build basic defenses using hardcoded locations.
         Remember to defend corners and avoid placing units in the front where enemy demolishers can attack them.
+        The build order is compiled once in compile_build_plans.
         """
-        # Useful tool for setting up your base locations: https://www.kevinbai.design/terminal-map-maker
-        # More community tools available at: https://terminal.c1games.com/rules#Download
+        game_state.attempt_build_plan(self.defence_plan)
+        # Only once nothing in the plan is waiting for SP, upgrade whichever of these add the most for what is left
+        if game_state.build_plan_finished(self.defence_plan):
+            self.upgrade_by_value(game_state, self.defence_upgrade_locations)
 
-        # Place turrets that attack enemy units
-        # turret_locations = [[0, 13], [27, 13], [8, 11], [19, 11], [13, 11], [14, 11]]
-        turret_locations = [[12, 10], [16, 10], [16, 9], [12, 9]]
-        # attempt_spawn will try to spawn units if we have resources, and will check if a blocking unit is already there
-        
-        # Place walls in front of turrets to soak up damage for them
-        # wall_locations = [[8, 12], [19, 12]]
-        wall_locations = [[0, 13], [27, 13], [1, 12], [26, 12], [2, 11], [25, 11], [12, 11], [16, 11], 
-                          [13, 12], [15, 12], [2, 12], [25, 12], [13, 10], [15, 10], [13, 9], [15, 9]]
-        support_locations = [[11, 9], [17, 9], [10, 9], [18 ,9]]
-
-        self.basic_turret_locations = turret_locations
-        self.basic_wall_locations = wall_locations
-        self.basic_support_locations = support_locations
-        self.important_wall_locations = [[2, 12], [25, 12], [12, 11], [16, 11], [13, 10], [15, 10], [13, 9], [16, 9]]
-        # round 0
-        game_state.attempt_spawn(WALL, wall_locations[:9])
-        for x in range(3, 11):
-            game_state.attempt_spawn(WALL, [x, 10])
-            game_state.attempt_spawn(WALL, [27-x, 10])
-        game_state.attempt_spawn(WALL, [11, 10])
-        game_state.attempt_spawn(TURRET, turret_locations[:2])
-        game_state.attempt_upgrade(turret_locations[0])
-
-        # round 1
-        game_state.attempt_spawn(WALL, wall_locations[9])
-        game_state.attempt_upgrade(wall_locations[:2])
-        
-        # round 2
-        game_state.attempt_spawn(WALL, wall_locations[10:14])
-
-        # round 3
-        game_state.attempt_spawn(SUPPORT, support_locations[0])
-        game_state.attempt_upgrade(support_locations[0])
-        
-        # round 4
-        game_state.attempt_upgrade(turret_locations[1])
-
-        # round 5
-        game_state.attempt_upgrade(wall_locations[2:4])
-
-        # round 6
-        game_state.attempt_spawn(WALL, wall_locations[14:])
-        game_state.attempt_spawn(TURRET, turret_locations[2:])
-
-        # round 7
-        game_state.attempt_upgrade(turret_locations[2:])
-
-        # round 8~
-        game_state.attempt_upgrade(self.important_wall_locations)
-
-        # upgrade walls so they soak more damage
-        #game_state.attempt_upgrade(wall_locations)
     def detect_scored_on_locations(self, game_state):
         """
         This function will help us guess which location is the safest to spawn moving units from.
         It gets the path the unit will take then checks locations on that path to 
         estimate the path's damage risk.
         """
-        for location in self.scored_on_locations:
-            self.breaking_locations.append([location[0], location[1]])
+        self.breaking_locations = self.frame_events.locations("breach", 1)
 
     def build_reactive_defense(self, game_state):
         """
@@ -319,68 +397,36 @@ class AlgoStrategy(gamelib.AlgoCore):
             
 
     def build_active_defense(self, game_state):
-        turret_locations_stage_1 = [[11, 8], [16, 8]]
-        wall_locations_stage_1 = [[12, 8], [15, 8]]
-        support_locations_stage_1 = self.basic_support_locations
-
-        turret_locations_stage_2  = turret_locations_stage_1 + [[11, 7], [15, 7]]
-        wall_locations_stage_2 = wall_locations_stage_1 + [[12, 7], [14, 7]]
-        support_locations_stage_2 = support_locations_stage_1 + [[9, 9], [19, 9]]
-
-        wall_locations_stage_3 = []
-        support_locations_stage_3 =  [[11, 8], [17, 9], [10, 8], [18, 8], [8, 8], [19, 8]]
-        turret_locations_stage_3 = [[11, 6], [16, 6], [12, 5], [16, 5], [11, 4], [16, 4], 
-                                                               [11, 3], [15, 3]]
-        guard_walls = [[12, 6], [15, 6], [13, 5], [15, 5], [12, 4], [15, 4], 
-                                                               [12, 3], [14, 3]]
-
         if game_state.turn_number < self.stage_1:
-            game_state.attempt_spawn(TURRET, turret_locations_stage_1)
-            game_state.attempt_spawn(WALL, wall_locations_stage_1)
-            game_state.attempt_upgrade(turret_locations_stage_1)
-            game_state.attempt_upgrade(wall_locations_stage_1)
-            
-        if game_state.turn_number >= self.stage_1 and game_state.turn_number < self.stage_2:
-
-            game_state.attempt_spawn(TURRET, turret_locations_stage_1)
-            game_state.attempt_upgrade(turret_locations_stage_1)
-
-            game_state.attempt_spawn(TURRET, turret_locations_stage_2)
-
-            game_state.attempt_spawn(WALL, wall_locations_stage_2)
-            game_state.attempt_spawn(SUPPORT, support_locations_stage_2)
-            game_state.attempt_upgrade(turret_locations_stage_2)
-            game_state.attempt_upgrade(wall_locations_stage_2)
-            game_state.attempt_upgrade(support_locations_stage_2)
-
-            game_state.attempt_upgrade([[2, 11], [25, 11]])
-
-        if game_state.turn_number >= self.stage_2:
-            game_state.attempt_spawn(TURRET, turret_locations_stage_2)
-            game_state.attempt_spawn(WALL, wall_locations_stage_2)
-            game_state.attempt_spawn(SUPPORT, support_locations_stage_2)
-            game_state.attempt_upgrade(turret_locations_stage_2)
-            game_state.attempt_upgrade(wall_locations_stage_2)
-            game_state.attempt_upgrade(support_locations_stage_2)
-
-            game_state.attempt_spawn(WALL, wall_locations_stage_3)
-            game_state.attempt_upgrade([[13, 12], [15, 12]])
-            game_state.attempt_upgrade([[3, 11],[24, 11],[3,12],[24,12]])
-
-            for i in range(len(turret_locations_stage_3)):
-                game_state.attempt_spawn(WALL, guard_walls[i])
-                if turret_locations_stage_3[i] != [11, 3]:
-                    game_state.attempt_spawn(TURRET, turret_locations_stage_3[i])
-                if i<6:
-                    game_state.attempt_spawn(SUPPORT, support_locations_stage_3[i])
-
-                game_state.attempt_upgrade(turret_locations_stage_3[i])
-                game_state.attempt_upgrade(guard_walls[i])
-                if i < 6:
-                    game_state.attempt_upgrade(support_locations_stage_3[i])
-            
-
+            stage = 0
+        elif game_state.turn_number < self.stage_2:
+            stage = 1
+        else:
+            stage = 2
+        game_state.attempt_build_plan(self.active_defense_plans[stage])
+        # Only once nothing in the plan is waiting for SP, upgrade whichever of these add the most for what is left
+        if game_state.build_plan_finished(self.active_defense_plans[stage]):
+            self.upgrade_by_value(game_state, self.active_defense_upgrade_locations[stage])
 
+    def send_attack(self, game_state):
+        """
+        If the opening book knows the position, send exactly the wave it tested, or nothing if holding beat every
+        wave it tested. Otherwise split our MP between demolishers and scouts the way the attack planner expects to do the most
+        damage. If the planner finds nothing worth sending, send demolishers when the enemy front is crowded and
+        every scout from the safest tile.
+        """
+        if self.book_response is not None and (self.book_response.spawn is not None or self.book_response.hold):
+            self.book_response.deploy(game_state)
+            return
+        plan = gamelib.AttackPlanner(game_state).plan()
+        if plan is not None and plan.attempt(game_state):
+            return
+        # If they have many units in the front we can build a line for our demolishers to attack them at long range.
+        if self.detect_enemy_unit(game_state, unit_type=None, valid_x=None, valid_y=[17, 18]) > 30:
+            self.demolisher_line_strategy(game_state)
+        # Sending more at once is better since attacks can only hit a single scout at a time
+        best_location = self.least_damage_spawn_location(game_state, self.scout_spawn_location_options)
+        game_state.attempt_spawn(SCOUT, best_location, 1000)
 
     def stall_with_interceptors(self, game_state):
         """
@@ -423,9 +469,11 @@ class AlgoStrategy(gamelib.AlgoCore):
         #for x in range(27, 5, -1):
             #game_state.attempt_spawn(cheapest_unit, [x, 10])
 
-        # Now spawn demolishers next to the line
-        # By asking attempt_spawn to spawn 1000 units, it will essentially spawn as many as we have resources for
-        game_state.attempt_spawn(DEMOLISHER, [24, 10], nums)
+        # Now spawn demolishers where they are expected to deal the most damage to enemy structures per MP,
+        # or next to the line if they would not hit anything
+        best = gamelib.FiringPositionOptimizer(game_state, DEMOLISHER, nums).best()
+        location = [24, 10] if best is None else best.spawn_location
+        game_state.attempt_spawn(DEMOLISHER, location, nums)
 
     def least_damage_spawn_location(self, game_state, location_options):
         """
@@ -433,27 +481,17 @@ class AlgoStrategy(gamelib.AlgoCore):
         It gets the path the unit will take then checks locations on that path to 
         estimate the path's damage risk.
         """
-        damages = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
-            damage = 0
-            for path_location in path:
-                # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
-            damages.append(damage)
-        
-        # Now just return the location that takes the least damage
-        return location_options[damages.index(min(damages))]
+        # Every spawn tile is scored in one cached pass, using the damage of upgraded turrets where they are upgraded
+        ranking = gamelib.get_spawn_ranking(game_state, SCOUT)
+        best_location = ranking.least_damage(location_options)
+        # Only happens if every option is blocked
+        if best_location is None:
+            return location_options[0]
+        return best_location
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
-        total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
-        return total_units
+        # The structure index is kept up to date by the game map, so this no longer scans the board
+        return game_state.count_structures(1, unit_type, valid_x, valid_y)
         
     def filter_blocked_locations(self, locations, game_state):
         filtered = []
@@ -471,6 +509,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         # Let's record at what position we get scored on
         state = json.loads(turn_string)
+        self.health_forecast.observe_frame(state)
+        self.frame_events.observe_frame(state)
         events = state["events"]
         breaches = events["breach"]
         for breach in breaches:
@@ -480,8 +520,6 @@ class AlgoStrategy(gamelib.AlgoCore):
             # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
             if not unit_owner_self:
                 gamelib.debug_write("Got scored on at: {}".format(location))
-                self.scored_on_locations.append(location)
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
 
 
 if __name__ == "__main__":
@@ -16,14 +16,89 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to path-finding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+transposition.py contains the zobrist hashing used by GameMap and the TranspositionTable GameState uses to cache results between turns. \n
+
+distance_field.py contains flat-grid distance fields that reproduce the paths of navigation.py and can be patched incrementally when a single structure is added or removed. \n
+
+threat.py contains the ThreatMap class, which stamps the attack range of every structure onto the board so the threat on any tile can be looked up directly. \n
+
+placement.py contains the PlacementEngine class, which ranks candidate structure placements by how they change the paths of enemy units. \n
+
+chokepoints.py contains the ChokepointAnalysis class, which finds the cells every enemy route passes through and the fewest cells that funnel enemy units through a chosen region. \n
+
+forecast.py contains the AttackForecast class, which walks the paths of hypothetical enemy units from every enemy spawn tile and estimates where they can breach us before the action phase. \n
+
+simulator.py contains the ActionPhaseSimulator class, a stand-in for the game engine's action phase used for local self-play and estimates. \n
+
+replay.py contains the ReplayRecorder class, which records the raw traffic between the algo and the game engine to a compressed file on a background thread, and read_replay, which reads it back. \n
+
+precompute.py contains the PrecomputeCache class, which saves the tables that only depend on the config to disk, keyed by a hash of the config, so later games load them instead of rebuilding them. \n
+
+structure_index.py contains the StructureIndex class, which GameMap keeps up to date with the structures of each player by type, row and column, so GameState.count_structures does not scan the board. \n
+
+spawn_ranking.py contains the SpawnRanking class, which scores every open tile of our edges by the path a unit spawned there takes, the damage it takes along the way and where it breaches. \n
+
+waves.py contains the WaveEstimator class, which estimates how many of a wave of our mobile units survive their path and how much damage they deal, for any wave size, without simulating frames. \n
+
+firing_positions.py contains the FiringPositionOptimizer class, which ranks our spawn tiles by the damage a wave of demolishers is expected to deal to enemy structures per MP. \n
+
+upgrade_priority.py contains the UpgradePrioritizer class, which scores the upgrade of each of our structures by the threat coverage and durability it adds and picks the best set the SP affords. \n
+
+build_plan.py contains the BuildPlan class, an ordered list of structures to spawn and upgrade that is checked once and queued each turn by GameState.attempt_build_plan in a single pass. \n
+
+health_forecast.py contains the StructureHealthForecast class, which reads the damage and death events of action frames as they arrive and forecasts the damage each of our structures takes in the next action phase, using constant memory per location. \n
+
+frame_events.py contains the FrameEventAggregator class, which adds the breach, damage, death, attack, spawn and shield events of each action frame to fixed-size per-tile totals for recent turns and for the whole game, and answers region queries on them. \n
+
+opening_book.py contains the OpeningBook class, which loads responses to known enemy layouts, keyed by turn and the zobrist fingerprint of the enemy structures, from a JSON book built offline by scripts/build_opening_book.py, so a known opening is answered with a single dict lookup. \n
+
+attack_planner.py contains the AttackPlanner class, which searches mixes of demolisher and scout counts and spawn tiles under current and projected MP, plays each mix out with a quick frame by frame walk of all its waves together, skips mixes whose best case cannot beat the best found, and stops at a time budget. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
-from .algocore import AlgoCore
-from .util import debug_write
-from .game_state import GameState
-from .unit import GameUnit
-from .game_map import GameMap
+import importlib
+
+# Classes and functions reachable as gamelib.<name>, and the module each lives in.
+# Nothing is imported until it is first used, so an algo only pays at startup for
+# the parts of gamelib it touches, and tools never load what they do not need.
+_LAZY_ATTRIBUTES = {
+    "AlgoCore": "algocore",
+    "debug_write": "util",
+    "GameState": "game_state",
+    "GameUnit": "unit",
+    "GameMap": "game_map",
+    "TranspositionTable": "transposition",
+    "PlacementEngine": "placement",
+    "ChokepointAnalysis": "chokepoints",
+    "AttackForecast": "forecast",
+    "PrecomputeCache": "precompute",
+    "SpawnRanking": "spawn_ranking",
+    "get_spawn_ranking": "spawn_ranking",
+    "WaveEstimator": "waves",
+    "FiringPositionOptimizer": "firing_positions",
+    "UpgradePrioritizer": "upgrade_priority",
+    "BuildPlan": "build_plan",
+    "StructureHealthForecast": "health_forecast",
+    "FrameEventAggregator": "frame_events",
+    "OpeningBook": "opening_book",
+    "AttackPlanner": "attack_planner",
+}
+
+__all__ = ["algocore", "game_state", "game_map", "navigation", "transposition", "unit", "util", "distance_field", "threat", "placement", "chokepoints", "forecast", "simulator", "replay", "precompute", "structure_index", "spawn_ranking", "waves", "firing_positions", "upgrade_priority", "build_plan", "health_forecast", "frame_events", "opening_book", "attack_planner"]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module("." + _LAZY_ATTRIBUTES[name], __name__), name)
+    elif name in __all__:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    # Later lookups find it directly and skip __getattr__
+    globals()[name] = value
+    return value
+
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
- 
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(__all__))
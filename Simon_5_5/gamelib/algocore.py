@@ -1,7 +1,8 @@
 import json
+import os
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .util import get_command, debug_write, BANNER_TEXT, send_command, set_recorder
 
 class AlgoCore(object):
     """
@@ -10,10 +11,12 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * replay_directory (string): If set, all engine traffic is recorded to a new file in this directory. Defaults to the ALGO_REPLAY_DIR environment variable
 
     """
     def __init__(self):
         self.config = None
+        self.replay_directory = os.environ.get("ALGO_REPLAY_DIR")
 
     def on_game_start(self, config):
         """
@@ -53,6 +56,14 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        recorder = None
+        if self.replay_directory:
+            # Imported here so games that are not recorded never load gzip and threading
+            from .replay import ReplayRecorder
+            recorder = ReplayRecorder.in_directory(self.replay_directory)
+            set_recorder(recorder)
+            debug_write("Recording engine traffic to {}".format(recorder.path))
+
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
@@ -82,6 +93,9 @@ class AlgoCore(object):
                     This is the end game message. This means the game is over so break and finish the program.
                     """
                     debug_write("Got end state, game over. Stopping algo.")
+                    if recorder is not None:
+                        set_recorder(None)
+                        recorder.close()
                     break
                 else:
                     """
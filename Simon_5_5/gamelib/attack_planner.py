@@ -0,0 +1,315 @@
+"""
+How to split our MP between unit types, wave sizes and spawn tiles.
+
+A single WaveProfile answers for one wave on its own. Waves sent together get
+in each other's way: a turret shoots one target at a time, so demolishers in
+front soak fire that would have killed scouts, and turrets the demolishers
+destroy stop firing at whatever comes after them.
+
+The planner lists mixes of unit counts that our MP affords, now and, if asked,
+after waiting a few turns for projected MP. Each unit type is sent from the
+few spawn tiles where its WaveProfile does best on its own. Mixes are tried
+best estimate first. A mix is played out with a quick walk of all its waves
+together, frame by frame, where each enemy turret fires at its nearest wave
+and our units take down the nearest structures. A mix is skipped without
+being played if even a wave that took no fire could not beat the best mix so
+far. The search stops when the time budget runs out, keeping the best mix
+found.
+
+The walk uses each wave's health with every shield on its path already
+given, and ignores enemy mobile units, so it ranks mixes rather than predicts
+the engine exactly.
+"""
+
+import time
+
+from .distance_field import ARENA_SIZE
+from .simulator import unit_stats
+from .threat import indices_in_range
+from .waves import WaveEstimator
+
+
+class PlannedWave:
+    """One wave of an AttackPlan
+
+    Attributes :
+        * unit_type (string): The mobile unit sent
+        * spawn_location ([x, y]): Where it spawns
+        * units (int): How many are sent
+        * profile (:obj: WaveProfile): The wave profile of its path
+
+    """
+    def __init__(self, profile, units):
+        self.unit_type = profile.unit_type
+        self.spawn_location = profile.spawn_location
+        self.units = units
+        self.profile = profile
+
+    def __repr__(self):
+        return "{} {} from {}".format(self.units, self.unit_type, self.spawn_location)
+
+
+class AttackPlan:
+    """A mix of waves and the turn to send it
+
+    Attributes :
+        * waves (list): The PlannedWaves sent together
+        * turn (int): Turns to wait before sending, 0 to send now
+        * MP (float): The MP the waves cost
+        * breach_damage (float): The damage expected to the enemy's health
+        * structure_damage (float): The damage expected to enemy structures
+        * score (float): breach_damage plus structure_damage times the planner's structure_weight
+        * value (float): score discounted for the turns waited
+
+    """
+    def __init__(self, waves, turn, MP):
+        self.waves = waves
+        self.turn = turn
+        self.MP = MP
+        self.breach_damage = 0.0
+        self.structure_damage = 0.0
+        self.score = 0.0
+        self.value = 0.0
+
+    def attempt(self, game_state):
+        """Queues the waves if the plan is to send them now
+
+        Returns:
+            The number of units spawned
+
+        """
+        if self.turn != 0:
+            return 0
+        spawned = 0
+        for wave in self.waves:
+            spawned += game_state.attempt_spawn(wave.unit_type, wave.spawn_location, wave.units) or 0
+        return spawned
+
+    def __repr__(self):
+        return "AttackPlan {} on turn +{}: breach {:.1f} structures {:.1f} score {:.2f}".format(
+            self.waves, self.turn, self.breach_damage, self.structure_damage, self.score)
+
+
+class AttackPlanner:
+    """Searches mixes of mobile units for the one expected to do the most damage
+
+    Attributes :
+        * unit_types (list): The mobile units mixed. The last one gets whatever MP the others leave
+        * structure_weight (float): What a point of damage to enemy structures is worth next to a point of enemy health
+        * tiles (int): The spawn tiles tried for each unit type
+        * evaluated (int): Mixes played out by the last search
+        * pruned (int): Mixes skipped by the last search because they could not beat the best one
+
+    """
+    def __init__(self, game_state, unit_types=None, estimator=None, structure_weight=0.02, tiles=3):
+        """
+        Args:
+            game_state: The current GameState, including anything already queued
+            unit_types: The mobile units to mix. Defaults to DEMOLISHER and SCOUT
+            estimator: A WaveEstimator for game_state to share, one is created if None
+            structure_weight: See the attribute
+            tiles: See the attribute
+
+        """
+        config = game_state.config
+        if unit_types is None:
+            unit_types = [config["unitInformation"][4]["shorthand"], config["unitInformation"][3]["shorthand"]]
+        if estimator is None:
+            estimator = WaveEstimator(game_state)
+        self.game_state = game_state
+        self.unit_types = unit_types
+        self.structure_weight = structure_weight
+        self.tiles = tiles
+        self.evaluated = 0
+        self.pruned = 0
+        self.__estimator = estimator
+        type_indices = dict((info.get("shorthand"), index) for index, info in enumerate(config["unitInformation"]))
+        self.__stats = dict((unit_type, unit_stats(config, type_indices[unit_type])) for unit_type in unit_types)
+        self.__structures = estimator.enemy_structures
+        self.__structure_health = sum(unit.health for unit in self.__structures)
+        # The enemy turrets that can hit each tile, as (structure index, damage, squared distance) triples
+        self.__turrets = [()] * (ARENA_SIZE * ARENA_SIZE)
+        for structure, unit in enumerate(self.__structures):
+            if unit.damage_i <= 0 or unit.attackRange <= 0:
+                continue
+            for index in indices_in_range([unit.x, unit.y], unit.attackRange):
+                distance = (index // ARENA_SIZE - unit.x) ** 2 + (index % ARENA_SIZE - unit.y) ** 2
+                self.__turrets[index] = self.__turrets[index] + ((structure, unit.damage_i, distance),)
+
+    def __cost(self, unit_type):
+        return self.__stats[unit_type]["cost"][self.game_state.MP]
+
+    def __estimate(self, profile, units):
+        """The score of a wave sent on its own"""
+        structure_damage = min(self.__structure_health, profile.damage_to_structures(units))
+        return profile.damage_to_health(units) + self.structure_weight * structure_damage
+
+    def __bound(self, profile, units):
+        """The score of a wave that takes no fire, which no mix can beat"""
+        breach = units * profile.breach_damage if profile.reaches_edge else 0.0
+        structure_damage = units * (sum(per_unit for _, per_unit in profile.structure_hits) + profile.self_destruct_damage)
+        return breach, structure_damage
+
+    def evaluate(self, waves):
+        """Plays out waves sent together
+
+        Args:
+            waves: A list of PlannedWaves
+
+        Returns:
+            A [breach damage, structure damage] pair
+
+        """
+        structures = self.__structures
+        turrets = self.__turrets
+        health_left = {}
+        breach_damage = 0.0
+        structure_damage = 0.0
+        groups = []
+        for wave in waves:
+            stats = self.__stats[wave.unit_type]
+            targets = self.__estimator.targets_in_range(stats["attack_range"]) if stats["damage_f"] > 0 else None
+            # [wave, speed, units alive, health of the front unit, targets in range of each tile]
+            groups.append([wave, stats["speed"] or 1, wave.units, wave.profile.health, targets])
+        frame = 0
+        while groups:
+            # Every turret fires at its nearest wave
+            fire = {}
+            for group in groups:
+                wave, speed = group[0], group[1]
+                index = wave.profile.path[min(len(wave.profile.path) - 1, int(frame * speed))]
+                for structure, damage, distance in turrets[index]:
+                    if health_left.get(structure, 1) <= 0:
+                        continue
+                    known = fire.get(structure)
+                    if known is None or distance < known[0]:
+                        fire[structure] = (distance, damage, group)
+            for _, damage, group in fire.values():
+                health = group[0].profile.health
+                if damage < group[3] or health <= 0:
+                    group[3] -= damage
+                    continue
+                damage -= group[3]
+                whole = int(damage // health)
+                group[2] -= 1 + whole
+                group[3] = health - (damage - whole * health)
+            # Every wave still alive fires at the structures nearest to it
+            finished = []
+            for group in groups:
+                wave, speed, alive, _, targets = group
+                path = wave.profile.path
+                step = int(frame * speed)
+                if alive <= 0:
+                    finished.append(group)
+                    continue
+                tile_targets = targets[path[min(len(path) - 1, step)]] if targets is not None else None
+                damage = alive * self.__stats[wave.unit_type]["damage_f"]
+                for structure in tile_targets or ():
+                    if damage <= 0:
+                        break
+                    remaining = health_left.get(structure, structures[structure].health)
+                    if remaining <= 0:
+                        continue
+                    dealt = min(damage, remaining)
+                    health_left[structure] = remaining - dealt
+                    structure_damage += dealt
+                    damage -= dealt
+                if int((frame + 1) * speed) >= len(path):
+                    if wave.profile.reaches_edge:
+                        breach_damage += alive * wave.profile.breach_damage
+                    else:
+                        structure_damage += alive * wave.profile.self_destruct_damage
+                    finished.append(group)
+            for group in finished:
+                groups.remove(group)
+            frame += 1
+        return [breach_damage, min(self.__structure_health, structure_damage)]
+
+    def __mixes(self, MP):
+        """Yields the unit counts of every mix MP affords, the last type taking the MP left over"""
+        costs = [self.__cost(unit_type) for unit_type in self.unit_types]
+
+        def counts(position, MP_left):
+            cost = costs[position]
+            most = int(MP_left // cost) if cost > 0 else 0
+            if position == len(costs) - 1:
+                yield [most]
+                return
+            for units in range(most + 1):
+                for rest in counts(position + 1, MP_left - units * cost):
+                    yield [units] + rest
+
+        for mix in counts(0, MP):
+            if any(mix):
+                yield mix
+
+    def __best_tiles(self, unit_type, units):
+        profiles = self.__estimator.profiles(unit_type)
+        return sorted(profiles, key=lambda profile: -self.__estimate(profile, units))[:self.tiles]
+
+    def __candidates(self, MP, turn, discount):
+        """Every mix of counts and spawn tiles, as (estimate, bound, AttackPlan) triples"""
+        candidates = []
+        tiles = {}
+        for mix in self.__mixes(MP):
+            choices = [[]]
+            for unit_type, units in zip(self.unit_types, mix):
+                if units == 0:
+                    continue
+                key = (unit_type, units)
+                if key not in tiles:
+                    tiles[key] = self.__best_tiles(unit_type, units)
+                choices = [chosen + [PlannedWave(profile, units)] for chosen in choices for profile in tiles[key]]
+            for waves in choices:
+                if not waves:
+                    continue
+                estimate = sum(self.__estimate(wave.profile, wave.units) for wave in waves)
+                breach, structure_damage = 0.0, 0.0
+                for wave in waves:
+                    wave_breach, wave_structure_damage = self.__bound(wave.profile, wave.units)
+                    breach += wave_breach
+                    structure_damage += wave_structure_damage
+                bound = breach + self.structure_weight * min(self.__structure_health, structure_damage)
+                cost = sum(wave.units * self.__cost(wave.unit_type) for wave in waves)
+                weight = discount ** turn
+                candidates.append((estimate * weight, bound * weight, AttackPlan(waves, turn, cost)))
+        return candidates
+
+    def plan(self, lookahead=0, discount=0.75, time_budget=0.05):
+        """Gets the best mix of waves found within the time budget
+
+        Args:
+            lookahead: Also plan for sending after waiting up to this many turns, with projected MP
+            discount: What a point of damage a turn later is worth next to one now
+            time_budget: Seconds to search for. At least one mix is always played out
+
+        Returns:
+            The AttackPlan with the highest value, or None if nothing can be afforded or nothing does any damage
+
+        """
+        start = time.perf_counter()
+        self.evaluated = 0
+        self.pruned = 0
+        MP = self.game_state.get_resource(self.game_state.MP)
+        candidates = []
+        for turn in range(lookahead + 1):
+            turn_MP = MP if turn == 0 else self.game_state.project_future_MP(turn, current_MP=MP)
+            candidates.extend(self.__candidates(turn_MP, turn, discount))
+        candidates.sort(key=lambda candidate: (-candidate[0], -candidate[1]))
+
+        best = None
+        for estimate, bound, candidate in candidates:
+            if best is not None and time.perf_counter() - start > time_budget:
+                break
+            if best is not None and bound <= best.value:
+                self.pruned += 1
+                continue
+            candidate.breach_damage, candidate.structure_damage = self.evaluate(candidate.waves)
+            candidate.score = candidate.breach_damage + self.structure_weight * candidate.structure_damage
+            candidate.value = candidate.score * discount ** candidate.turn
+            self.evaluated += 1
+            if best is None or candidate.value > best.value:
+                best = candidate
+        if best is None or best.score <= 0:
+            return None
+        return best
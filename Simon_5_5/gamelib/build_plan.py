@@ -0,0 +1,145 @@
+"""
+Build orders written down once and replayed every turn.
+
+A defence is usually the same list of structures every turn, most of them
+already standing. Going through it with attempt_spawn and attempt_upgrade
+checks bounds, territory, type and cost again for every location, and warns for
+every step that is already done or cannot be afforded.
+
+A BuildPlan takes the steps in build order and checks them once, when it is
+compiled. It works out the cost of every step and the total cost of all the
+steps up to it. GameState.attempt_build_plan then goes through the steps once.
+It looks at the map to skip steps that are already done, and stops at the first
+step that cannot be afforded, so a later step never uses SP an earlier one
+was waiting for.
+"""
+
+from .distance_field import HALF_ARENA, IN_ARENA, to_index
+from .util import debug_write
+
+
+SPAWN = "spawn"
+UPGRADE = "upgrade"
+
+
+class BuildStep:
+    """One compiled step of a BuildPlan
+
+    Attributes :
+        * action (string): SPAWN or UPGRADE
+        * unit_type (string): The structure spawned, or the structure expected at location for an upgrade
+        * x (int): The x coordinate
+        * y (int): The y coordinate
+        * cost ([SP, MP]): What the step costs
+        * cumulative_cost (float): The SP cost of this step and every step before it
+
+    """
+    def __init__(self, action, unit_type, x, y, cost, cumulative_cost):
+        self.action = action
+        self.unit_type = unit_type
+        self.x = x
+        self.y = y
+        self.cost = cost
+        self.cumulative_cost = cumulative_cost
+
+    def __repr__(self):
+        return "{} {} at {} for {} SP".format(self.action, self.unit_type, [self.x, self.y], self.cost[0])
+
+
+class BuildPlan:
+    """An ordered list of structures to spawn and upgrade
+
+    Build a plan once, for example in on_game_start, and pass it to GameState.attempt_build_plan
+    every turn. Steps added after it was compiled are compiled the next time it is used.
+
+    Attributes :
+        * steps (list): The (action, unit_type, [x, y]) steps, in build order
+
+    """
+    def __init__(self, config, steps=None):
+        """
+        Args:
+            config: The game config
+            steps: Optional (action, unit_type, location) steps to start with
+
+        """
+        self.config = config
+        self.steps = []
+        self.__compiled = None
+        for action, unit_type, location in steps or []:
+            self.add(action, unit_type, location)
+
+    def add(self, action, unit_type, locations):
+        """Appends a step for each location
+
+        Args:
+            action: SPAWN or UPGRADE
+            unit_type: The structure type
+            locations: A single location or a list of locations, in build order
+
+        Returns:
+            The plan, so calls can be chained
+
+        """
+        if locations and type(locations[0]) == int:
+            locations = [locations]
+        for location in locations:
+            self.steps.append((action, unit_type, [int(location[0]), int(location[1])]))
+        self.__compiled = None
+        return self
+
+    def spawn(self, unit_type, locations):
+        """Appends SPAWN steps, see add"""
+        return self.add(SPAWN, unit_type, locations)
+
+    def upgrade(self, unit_type, locations):
+        """Appends UPGRADE steps, see add"""
+        return self.add(UPGRADE, unit_type, locations)
+
+    def locations(self, action=None):
+        """The locations of the steps, optionally only those of one action"""
+        return [location for step_action, _, location in self.steps if action is None or step_action == action]
+
+    def compile(self):
+        """Checks every step once and works out its cost
+
+        Steps that can never succeed, such as a mobile unit, a location outside our half of the
+        arena or an upgrade of a type without one, are dropped with a debug message.
+
+        Returns:
+            The list of BuildSteps
+
+        """
+        if self.__compiled is not None:
+            return self.__compiled
+        unit_information = self.config["unitInformation"]
+        types = dict((info.get("shorthand"), info) for info in unit_information)
+        compiled = []
+        cumulative_cost = 0.0
+        for action, unit_type, (x, y) in self.steps:
+            info = types.get(unit_type)
+            valid_type = info is not None and info.get("unitCategory") == 0
+            valid_location = 0 <= x < 2 * HALF_ARENA and 0 <= y < HALF_ARENA and IN_ARENA[to_index([x, y])]
+            if action not in (SPAWN, UPGRADE) or not valid_type or not valid_location:
+                debug_write("Build plan step {} {} at {} can never succeed, dropped".format(action, unit_type, [x, y]))
+                continue
+            cost = [info.get("cost1", 0), info.get("cost2", 0)]
+            if action == UPGRADE:
+                upgrade = info.get("upgrade")
+                if upgrade is None:
+                    debug_write("Build plan step {} {} at {} can never succeed, dropped".format(action, unit_type, [x, y]))
+                    continue
+                cost = [upgrade.get("cost1", cost[0]), upgrade.get("cost2", cost[1])]
+            cumulative_cost += cost[0]
+            compiled.append(BuildStep(action, unit_type, x, y, cost, cumulative_cost))
+        self.__compiled = compiled
+        return compiled
+
+    @property
+    def total_cost(self):
+        """The SP cost of every step, as if nothing were built yet"""
+        compiled = self.compile()
+        return compiled[-1].cumulative_cost if compiled else 0.0
+
+    def __len__(self):
+        return len(self.steps)
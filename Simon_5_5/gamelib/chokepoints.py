@@ -0,0 +1,301 @@
+"""
+Choke-point analysis of the traversal graph.
+
+The open tiles of the arena form a graph, with an edge between tiles that
+share a side. This module finds the cells every route between two sets of
+edges has to pass through (articulation cells), and the smallest sets of cells
+that, once filled with structures, would cut every route that avoids a chosen
+region, so all enemy units are funneled through it.
+
+Minimum vertex cuts are found with a unit capacity max flow over the tile
+graph with each tile split into an in and an out node.
+"""
+
+from collections import deque
+
+from .distance_field import (ARENA_SIZE, HALF_ARENA, ARENA_INDICES, EDGE_INDICES, NEIGHBORS, TOP_LEFT, TOP_RIGHT,
+                             BOTTOM_LEFT, BOTTOM_RIGHT, to_index, to_location)
+
+
+INFINITE = float("inf")
+_NUM_TILES = ARENA_SIZE * ARENA_SIZE
+_SOURCE = 2 * _NUM_TILES
+_SINK = 2 * _NUM_TILES + 1
+
+
+class CutResult:
+    """A minimum set of cells that separates the sources from the sinks
+
+    Attributes :
+        * size (int): The number of cells in a minimum cut
+        * source_side ([[x, y]]): The minimum cut closest to the source edges
+        * sink_side ([[x, y]]): The minimum cut closest to the sink edges
+
+    Both cuts have the same size. They differ when there is more than one minimum cut.
+
+    """
+    def __init__(self, size, source_side, sink_side):
+        self.size = size
+        self.source_side = source_side
+        self.sink_side = sink_side
+
+    def __repr__(self):
+        return "CutResult size: {} source side: {} sink side: {}".format(self.size, self.source_side, self.sink_side)
+
+
+class ChokepointAnalysis:
+    """Articulation cells and minimum vertex cuts of the arena
+
+    By default the sources are the enemy spawn edges and the sinks are our edges,
+    so the analysis is about routes enemy units can take to breach us.
+
+    Attributes :
+        * blocked (list): Flat list, True where a structure stands
+        * sources (list): Flat indices of the open tiles routes start from
+        * sinks (list): Flat indices of the open tiles routes end at
+
+    """
+    def __init__(self, game_state=None, blocked=None, source_edges=(TOP_LEFT, TOP_RIGHT), sink_edges=(BOTTOM_LEFT, BOTTOM_RIGHT)):
+        if blocked is None:
+            blocked = game_state.game_map.get_blocked_mask()
+        self.blocked = list(blocked)
+        self.sources = [index for edge in source_edges for index in EDGE_INDICES[edge] if not self.blocked[index]]
+        self.sinks = [index for edge in sink_edges for index in EDGE_INDICES[edge] if not self.blocked[index]]
+
+    def is_connected(self, excluded=()):
+        """True if any source can reach any sink without passing through the excluded locations"""
+        removed = set(to_index(location) for location in excluded)
+        sinks = set(self.sinks)
+        blocked = self.blocked
+        seen = set(index for index in self.sources if index not in removed)
+        current = deque(seen)
+        while current:
+            tile = current.popleft()
+            if tile in sinks:
+                return True
+            for neighbor in NEIGHBORS[tile]:
+                if neighbor not in seen and not blocked[neighbor] and neighbor not in removed:
+                    seen.add(neighbor)
+                    current.append(neighbor)
+        return False
+
+    def articulation_cells(self):
+        """Gets the open cells every route from a source to a sink passes through
+
+        A single structure on any of these cells would cut every route.
+
+        Returns:
+            A list of [x, y] locations, ordered from the sources to the sinks
+
+        """
+        blocked = self.blocked
+        root = _SOURCE
+        target = _SINK
+        sources = self.sources
+        sink_set = set(self.sinks)
+
+        def neighbors(node):
+            if node == root:
+                return sources
+            if node == target:
+                return list(self.sinks)
+            result = [neighbor for neighbor in NEIGHBORS[node] if not blocked[neighbor]]
+            if node in sink_set:
+                result.append(target)
+            if node in source_set:
+                result.append(root)
+            return result
+        source_set = set(sources)
+
+        # Iterative Tarjan: discovery order and low links of a depth first search from the sources
+        discovery = {root: 0}
+        low = {root: 0}
+        parent = {root: None}
+        counter = 1
+        stack = [(root, iter(neighbors(root)))]
+        while stack:
+            node, children = stack[-1]
+            advanced = False
+            for child in children:
+                if child not in discovery:
+                    discovery[child] = low[child] = counter
+                    counter += 1
+                    parent[child] = node
+                    stack.append((child, iter(neighbors(child))))
+                    advanced = True
+                    break
+                elif child != parent[node]:
+                    low[node] = min(low[node], discovery[child])
+            if not advanced:
+                stack.pop()
+                if stack:
+                    up = stack[-1][0]
+                    low[up] = min(low[up], low[node])
+
+        if target not in discovery:
+            return []
+        # A cell on the tree path to the sinks separates them from the sources if the
+        # subtree below it cannot climb above the cell without it
+        cells = []
+        child = target
+        node = parent[target]
+        while node != root:
+            if low[child] >= discovery[node]:
+                cells.append(to_location(node))
+            child = node
+            node = parent[node]
+        cells.reverse()
+        return cells
+
+    def min_cut(self, region=None, buildable=None):
+        """Finds the fewest cells that cut every route avoiding region
+
+        Filling the returned cells with structures forces every unit going from a source
+        to a sink through region. Without a region it cuts the sources off entirely.
+
+        Args:
+            region: The locations units should be funneled through. They are never part of the cut
+            buildable: The locations that may be part of the cut. Defaults to every open cell on our half
+
+        Returns:
+            A CutResult, or None if no set of buildable cells can cut every route
+
+        """
+        blocked = self.blocked
+        removed = set(to_index(location) for location in region) if region else set()
+        if buildable is None:
+            capacity = [1 if index % ARENA_SIZE < HALF_ARENA else INFINITE for index in range(_NUM_TILES)]
+        else:
+            capacity = [INFINITE] * _NUM_TILES
+            for location in buildable:
+                capacity[to_index(location)] = 1
+        open_tile = [not blocked[index] and index not in removed for index in range(_NUM_TILES)]
+        sources = [index for index in self.sources if open_tile[index]]
+        sink_set = set(index for index in self.sinks if open_tile[index])
+
+        # If a route only uses cells we cannot build on, no cut exists
+        unbuildable = [open_tile[index] and capacity[index] == INFINITE for index in range(_NUM_TILES)]
+        seen = set(index for index in sources if unbuildable[index])
+        current = deque(seen)
+        while current:
+            tile = current.popleft()
+            if tile in sink_set:
+                return None
+            for neighbor in NEIGHBORS[tile]:
+                if unbuildable[neighbor] and neighbor not in seen:
+                    seen.add(neighbor)
+                    current.append(neighbor)
+
+        internal_flow = [0] * _NUM_TILES
+        edge_flow = {}
+        size = 0
+        while True:
+            parent = self.__augmenting_path(sources, sink_set, open_tile, capacity, internal_flow, edge_flow)
+            if parent is None:
+                break
+            # Walk back from the sink applying one unit of flow
+            node = _SINK
+            while node != _SOURCE:
+                previous = parent[node]
+                if previous != _SOURCE and node != _SINK:
+                    tile, previous_tile = node >> 1, previous >> 1
+                    if tile == previous_tile:
+                        if node & 1:
+                            internal_flow[tile] += 1
+                        else:
+                            internal_flow[tile] -= 1
+                    elif node & 1:
+                        edge_flow[(tile, previous_tile)] -= 1
+                    else:
+                        edge_flow[(previous_tile, tile)] = edge_flow.get((previous_tile, tile), 0) + 1
+                node = previous
+            size += 1
+
+        reached = self.__reachable_from_source(sources, sink_set, open_tile, capacity, internal_flow, edge_flow)
+        reaching = self.__reaching_sink(sources, sink_set, open_tile, capacity, internal_flow, edge_flow)
+        source_side = [to_location(tile) for tile in ARENA_INDICES if (2 * tile) in reached and (2 * tile + 1) not in reached]
+        sink_side = [to_location(tile) for tile in ARENA_INDICES if (2 * tile + 1) in reaching and (2 * tile) not in reaching]
+        return CutResult(size, source_side, sink_side)
+
+    def __residual_neighbors(self, node, sources, sink_set, open_tile, capacity, internal_flow, edge_flow):
+        if node == _SOURCE:
+            return [2 * tile for tile in sources]
+        tile = node >> 1
+        result = []
+        if node & 1:
+            if internal_flow[tile] > 0:
+                result.append(2 * tile)
+            for neighbor in NEIGHBORS[tile]:
+                if open_tile[neighbor]:
+                    result.append(2 * neighbor)
+            if tile in sink_set:
+                result.append(_SINK)
+        else:
+            if internal_flow[tile] < capacity[tile]:
+                result.append(2 * tile + 1)
+            for neighbor in NEIGHBORS[tile]:
+                if open_tile[neighbor] and edge_flow.get((neighbor, tile), 0) > 0:
+                    result.append(2 * neighbor + 1)
+        return result
+
+    def __augmenting_path(self, *graph):
+        parent = {_SOURCE: None}
+        current = deque([_SOURCE])
+        while current:
+            node = current.popleft()
+            for neighbor in self.__residual_neighbors(node, *graph):
+                if neighbor not in parent:
+                    parent[neighbor] = node
+                    if neighbor == _SINK:
+                        return parent
+                    current.append(neighbor)
+        return None
+
+    def __reachable_from_source(self, *graph):
+        seen = {_SOURCE}
+        current = deque([_SOURCE])
+        while current:
+            node = current.popleft()
+            if node == _SINK:
+                continue
+            for neighbor in self.__residual_neighbors(node, *graph):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    current.append(neighbor)
+        return seen
+
+    def __reaching_sink(self, sources, sink_set, open_tile, capacity, internal_flow, edge_flow):
+        """
+        Nodes with a residual path to the sink, found by searching the residual graph backwards.
+        """
+        source_set = set(sources)
+        seen = {_SINK}
+        current = deque([_SINK])
+        while current:
+            node = current.popleft()
+            if node == _SINK:
+                predecessors = [2 * tile + 1 for tile in sink_set]
+            elif node == _SOURCE:
+                continue
+            else:
+                tile = node >> 1
+                predecessors = []
+                if node & 1:
+                    if internal_flow[tile] < capacity[tile]:
+                        predecessors.append(2 * tile)
+                    for neighbor in NEIGHBORS[tile]:
+                        if open_tile[neighbor] and edge_flow.get((tile, neighbor), 0) > 0:
+                            predecessors.append(2 * neighbor)
+                else:
+                    if internal_flow[tile] > 0:
+                        predecessors.append(2 * tile + 1)
+                    for neighbor in NEIGHBORS[tile]:
+                        if open_tile[neighbor]:
+                            predecessors.append(2 * neighbor + 1)
+                    if tile in source_set:
+                        predecessors.append(_SOURCE)
+            for predecessor in predecessors:
+                if predecessor not in seen:
+                    seen.add(predecessor)
+                    current.append(predecessor)
+        return seen
@@ -0,0 +1,406 @@
+"""
+Flat-grid distance fields that reproduce the paths of ShortestPathFinder.
+
+Locations are stored as a single index, x * ARENA_SIZE + y, so the board is a
+list of 784 entries. A DistanceField holds the breadth first distance from every
+tile to one edge. It is built once per layout and can then be patched
+incrementally when a single structure is added or removed, which is far cheaper
+than repeating the search for every hypothetical placement.
+"""
+
+from collections import deque
+
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+UNREACHABLE = -1
+
+HORIZONTAL = 1
+VERTICAL = 2
+
+
+def to_index(location):
+    """Converts an [x, y] location to a flat index"""
+    return location[0] * ARENA_SIZE + location[1]
+
+
+def to_location(index):
+    """Converts a flat index to an [x, y] location"""
+    return [index // ARENA_SIZE, index % ARENA_SIZE]
+
+
+def _in_arena_bounds(x, y):
+    # Same rule as GameMap.in_arena_bounds
+    row_size = y + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < HALF_ARENA and x >= startx and x <= endx)
+
+    row_size = (ARENA_SIZE - 1 - y) + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= HALF_ARENA and x >= startx and x <= endx)
+    return bottom_half_check or top_half_check
+
+
+def _build_edges():
+    top_right = [(HALF_ARENA + num) * ARENA_SIZE + (ARENA_SIZE - 1 - num) for num in range(HALF_ARENA)]
+    top_left = [(HALF_ARENA - 1 - num) * ARENA_SIZE + (ARENA_SIZE - 1 - num) for num in range(HALF_ARENA)]
+    bottom_left = [(HALF_ARENA - 1 - num) * ARENA_SIZE + num for num in range(HALF_ARENA)]
+    bottom_right = [(HALF_ARENA + num) * ARENA_SIZE + num for num in range(HALF_ARENA)]
+    return [top_right, top_left, bottom_left, bottom_right]
+
+
+IN_ARENA = [_in_arena_bounds(index // ARENA_SIZE, index % ARENA_SIZE) for index in range(ARENA_SIZE * ARENA_SIZE)]
+ARENA_INDICES = [index for index in range(ARENA_SIZE * ARENA_SIZE) if IN_ARENA[index]]
+EDGE_INDICES = _build_edges()
+# In-bounds neighbours in the order ShortestPathFinder._get_neighbors visits them: up, down, right, left
+NEIGHBORS = []
+for _index in range(ARENA_SIZE * ARENA_SIZE):
+    _x, _y = _index // ARENA_SIZE, _index % ARENA_SIZE
+    NEIGHBORS.append(tuple(
+        (nx * ARENA_SIZE + ny) for nx, ny in [(_x, _y + 1), (_x, _y - 1), (_x + 1, _y), (_x - 1, _y)]
+        if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and IN_ARENA[nx * ARENA_SIZE + ny]))
+EDGE_MEMBERSHIP = [set(edge) for edge in EDGE_INDICES]
+
+
+def edge_direction(target_edge):
+    """The [x, y] direction a unit heading to the given edge moves in, as ShortestPathFinder computes it"""
+    return [[1, 1], [-1, 1], [-1, -1], [1, -1]][target_edge]
+
+
+def get_target_edge(index):
+    """The edge a unit spawned at the given index heads to, as GameState.get_target_edge computes it"""
+    left = index // ARENA_SIZE < HALF_ARENA
+    bottom = index % ARENA_SIZE < HALF_ARENA
+    if left and bottom:
+        return TOP_RIGHT
+    elif left:
+        return BOTTOM_RIGHT
+    elif bottom:
+        return TOP_LEFT
+    return BOTTOM_LEFT
+
+
+def get_blocked_mask(game_state):
+    """Gets a flat list with True for every tile holding a structure
+
+    Args:
+        game_state: The GameState to read structures from
+
+    """
+    return game_state.game_map.get_blocked_mask()
+
+
+def get_distance_field(game_state, target_edge):
+    """Gets the distance field to an edge for the current layout of game_state
+
+    Fields are cached in game_state.transposition_table under the layout's zobrist hash.
+
+    Returns:
+        A DistanceField that the caller may modify
+
+    """
+    key = (game_state.game_map.zobrist_hash, "distance_field", target_edge)
+    field = game_state.transposition_table.get(key)
+    if field is None:
+        field = DistanceField(get_blocked_mask(game_state), target_edge)
+        game_state.transposition_table.put(key, field)
+    return field.copy()
+
+
+class DistanceField:
+    """Breadth first distances from every tile to one edge
+
+    Attributes :
+        * target_edge (int): The edge the distances are measured to, see GameMap.TOP_RIGHT and similar constants
+        * blocked (list): Flat list, True where a structure stands
+        * distances (list): Flat list of step counts to the nearest open tile of the edge, UNREACHABLE (-1) if there is no route
+
+    """
+    def __init__(self, blocked, target_edge, distances=None):
+        self.target_edge = target_edge
+        self.blocked = list(blocked)
+        self.__pocket_cache = {}
+        if distances is None:
+            self.distances = self.__search()
+        else:
+            self.distances = list(distances)
+
+    def copy(self):
+        """A copy that can be patched without affecting this field"""
+        return DistanceField(self.blocked, self.target_edge, self.distances)
+
+    def __search(self):
+        blocked = self.blocked
+        distances = [UNREACHABLE] * (ARENA_SIZE * ARENA_SIZE)
+        current = deque()
+        for index in EDGE_INDICES[self.target_edge]:
+            if not blocked[index]:
+                distances[index] = 0
+                current.append(index)
+        while current:
+            index = current.popleft()
+            next_distance = distances[index] + 1
+            for neighbor in NEIGHBORS[index]:
+                if distances[neighbor] == UNREACHABLE and not blocked[neighbor]:
+                    distances[neighbor] = next_distance
+                    current.append(neighbor)
+        return distances
+
+    def distance(self, location):
+        """The number of steps from a location to the edge, UNREACHABLE if it cannot get there"""
+        return self.distances[to_index(location)]
+
+    def block(self, location):
+        """Adds a structure at the given location and repairs the distances it invalidates
+
+        Only tiles whose every shortest route ran through the new structure are searched again.
+
+        """
+        index = to_index(location)
+        blocked = self.blocked
+        distances = self.distances
+        if blocked[index]:
+            return
+        blocked[index] = True
+        self.__pocket_cache = {}
+        old_distance = distances[index]
+        distances[index] = UNREACHABLE
+        if old_distance == UNREACHABLE:
+            return
+
+        # Find the tiles that lost all of their parents, layer by layer
+        affected = set()
+        checked = set()
+        current = deque(neighbor for neighbor in NEIGHBORS[index] if distances[neighbor] == old_distance + 1)
+        while current:
+            tile = current.popleft()
+            if tile in checked:
+                continue
+            checked.add(tile)
+            parent_distance = distances[tile] - 1
+            supported = False
+            for neighbor in NEIGHBORS[tile]:
+                if distances[neighbor] == parent_distance and not blocked[neighbor] and neighbor not in affected:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(tile)
+            for neighbor in NEIGHBORS[tile]:
+                if distances[neighbor] == parent_distance + 2 and not blocked[neighbor]:
+                    current.append(neighbor)
+        if not affected:
+            return
+
+        # Seed the affected tiles from their surviving neighbours and search outward in distance order
+        for tile in affected:
+            distances[tile] = UNREACHABLE
+        buckets = {}
+        for tile in affected:
+            best = UNREACHABLE
+            for neighbor in NEIGHBORS[tile]:
+                distance = distances[neighbor]
+                if distance != UNREACHABLE and not blocked[neighbor] and (best == UNREACHABLE or distance + 1 < best):
+                    best = distance + 1
+            if best != UNREACHABLE:
+                distances[tile] = best
+                buckets.setdefault(best, []).append(tile)
+        if not buckets:
+            return
+        level = min(buckets)
+        last_level = max(buckets)
+        while level <= last_level:
+            for tile in buckets.pop(level, ()):
+                if distances[tile] != level:
+                    continue
+                for neighbor in NEIGHBORS[tile]:
+                    if neighbor in affected and (distances[neighbor] == UNREACHABLE or distances[neighbor] > level + 1):
+                        distances[neighbor] = level + 1
+                        buckets.setdefault(level + 1, []).append(neighbor)
+                        last_level = max(last_level, level + 1)
+            level += 1
+
+    def unblock(self, location):
+        """Removes the structure at the given location and spreads the shorter distances it opens up
+
+        """
+        index = to_index(location)
+        blocked = self.blocked
+        distances = self.distances
+        if not blocked[index]:
+            return
+        blocked[index] = False
+        self.__pocket_cache = {}
+        if index in EDGE_MEMBERSHIP[self.target_edge]:
+            distances[index] = 0
+        else:
+            best = UNREACHABLE
+            for neighbor in NEIGHBORS[index]:
+                distance = distances[neighbor]
+                if distance != UNREACHABLE and not blocked[neighbor] and (best == UNREACHABLE or distance + 1 < best):
+                    best = distance + 1
+            distances[index] = best
+            if best == UNREACHABLE:
+                return
+        current = deque([index])
+        while current:
+            tile = current.popleft()
+            next_distance = distances[tile] + 1
+            for neighbor in NEIGHBORS[tile]:
+                if not blocked[neighbor] and (distances[neighbor] == UNREACHABLE or distances[neighbor] > next_distance):
+                    distances[neighbor] = next_distance
+                    current.append(neighbor)
+
+    def path_from(self, start_location):
+        """Gets the path a unit at start_location would take, identical to GameState.find_path_to_edge
+
+        If the edge cannot be reached the path ends at the unit's self destruct location.
+
+        Returns:
+            A list of [x, y] locations, or None if start_location is blocked
+
+        """
+        path = self.path_indices(to_index(start_location))
+        if path is None:
+            return None
+        return [to_location(index) for index in path]
+
+    def path_indices(self, start):
+        """Same as path_from, but takes and returns flat indices
+
+        """
+        if self.blocked[start]:
+            return None
+        distances = self.distances
+        if distances[start] == UNREACHABLE:
+            distances = self.__pocket_cache.get(start)
+            if distances is None:
+                distances = self.__pocket_distances(start)
+        return self._walk(start, distances)
+
+    def reaches_edge(self, start):
+        """True if a unit at the flat index start can reach the target edge"""
+        return not self.blocked[start] and self.distances[start] != UNREACHABLE
+
+    def __pocket_distances(self, start):
+        """
+        Distances to the most ideal self destruct tile of the pocket containing start.
+        Used when the edge cannot be reached.
+        """
+        blocked = self.blocked
+        direction = edge_direction(self.target_edge)
+        pocket = [start]
+        seen = {start}
+        position = 0
+        while position < len(pocket):
+            for neighbor in NEIGHBORS[pocket[position]]:
+                if neighbor not in seen and not blocked[neighbor]:
+                    seen.add(neighbor)
+                    pocket.append(neighbor)
+            position += 1
+
+        def idealness(index):
+            x, y = index // ARENA_SIZE, index % ARENA_SIZE
+            value = 28 * y if direction[1] == 1 else 28 * (27 - y)
+            value += x if direction[0] == 1 else (27 - x)
+            return value
+        ideal = max(pocket, key=idealness)
+
+        distances = [UNREACHABLE] * (ARENA_SIZE * ARENA_SIZE)
+        distances[ideal] = 0
+        current = deque([ideal])
+        while current:
+            tile = current.popleft()
+            for neighbor in NEIGHBORS[tile]:
+                if distances[neighbor] == UNREACHABLE and not blocked[neighbor]:
+                    distances[neighbor] = distances[tile] + 1
+                    current.append(neighbor)
+        for tile in pocket:
+            self.__pocket_cache[tile] = distances
+        return distances
+
+    def next_step(self, start, move_direction=0):
+        """Gets the single move a unit at start would make
+
+        Used to move units one tile at a time, keeping the direction of their previous move
+        for tie breaking as the game engine does.
+
+        Args:
+            start: The flat index of the unit
+            move_direction: HORIZONTAL or VERTICAL for the unit's previous move, 0 if it has not moved
+
+        Returns:
+            A tuple (next_index, move_direction), or None if the unit is already at the end of its path
+
+        """
+        distances = self.distances
+        if distances[start] == UNREACHABLE:
+            distances = self.__pocket_cache.get(start)
+            if distances is None:
+                distances = self.__pocket_distances(start)
+        if distances[start] == 0:
+            return None
+        return self._choose_step(start, distances, move_direction)
+
+    def _walk(self, start, distances):
+        """
+        Follows the distances down to 0 with the same tie breaking as ShortestPathFinder._choose_next_move.
+        Returns flat indices.
+        """
+        path = [start]
+        current = start
+        move_direction = 0
+        while distances[current] != 0:
+            step = self._choose_step(current, distances, move_direction)
+            if step is None:
+                # Cannot happen on a consistent field, guards against looping forever
+                break
+            current, move_direction = step
+            path.append(current)
+        return path
+
+    def _choose_step(self, current, distances, move_direction):
+        """
+        The neighbour ShortestPathFinder._choose_next_move would pick, and the direction of that move.
+        """
+        blocked = self.blocked
+        direction_x, direction_y = edge_direction(self.target_edge)
+        current_x, current_y = current // ARENA_SIZE, current % ARENA_SIZE
+        ideal = current
+        ideal_x, ideal_y = current_x, current_y
+        best_distance = distances[current]
+        for neighbor in NEIGHBORS[current]:
+            if blocked[neighbor]:
+                continue
+            distance = distances[neighbor]
+            if distance > best_distance:
+                continue
+            new_x, new_y = neighbor // ARENA_SIZE, neighbor % ARENA_SIZE
+            if distance == best_distance:
+                # Same rules as ShortestPathFinder._better_direction
+                if move_direction == HORIZONTAL and new_x != ideal_x:
+                    better = current_y != new_y
+                elif move_direction == VERTICAL and new_y != ideal_y:
+                    better = current_x != new_x
+                elif move_direction == 0:
+                    better = current_y != new_y
+                elif new_y == ideal_y:
+                    better = (direction_x == 1 and new_x > ideal_x) or (direction_x == -1 and new_x < ideal_x)
+                elif new_x == ideal_x:
+                    better = (direction_y == 1 and new_y > ideal_y) or (direction_y == -1 and new_y < ideal_y)
+                else:
+                    better = True
+                if not better:
+                    continue
+            ideal = neighbor
+            ideal_x, ideal_y = new_x, new_y
+            best_distance = distance
+        if ideal == current:
+            return None
+        return ideal, (VERTICAL if ideal_x == current_x else HORIZONTAL)
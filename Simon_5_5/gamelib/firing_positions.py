@@ -0,0 +1,126 @@
+"""
+Where to send demolishers so they hit the most enemy structures.
+
+Every open tile of our edges is tried. The enemy structures in range of each
+tile, nearest first, come from the table the WaveEstimator built for its own
+walks, and the wave profile of each path says how many demolishers are still
+firing on each tile.
+Walking a path then only has to add up frames in range and hand out damage
+to the nearest structures, taking destroyed structures out as it goes.
+"""
+
+from .simulator import unit_stats
+from .waves import WaveEstimator
+
+
+class FiringPosition:
+    """The expected result of sending a wave from one spawn tile
+
+    Attributes :
+        * spawn_location ([x, y]): Where the wave spawns
+        * units (int): The number of units sent
+        * MP (float): The MP they cost
+        * damage (float): The damage they are expected to deal to enemy structures
+        * damage_per_MP (float): damage divided by MP
+        * exposure (dict): Frames each enemy structure spends in range of the wave, keyed by (x, y)
+        * destroyed (list): The [x, y] locations of the structures expected to be destroyed
+        * profile (:obj: WaveProfile): The wave profile of the path
+
+    """
+    def __init__(self, profile, units, MP):
+        self.spawn_location = profile.spawn_location
+        self.units = units
+        self.MP = MP
+        self.damage = 0.0
+        self.damage_per_MP = 0.0
+        self.exposure = {}
+        self.destroyed = []
+        self.profile = profile
+
+    def __repr__(self):
+        return "{} {} from {}: damage {:.1f} per MP {:.2f}, destroys {}".format(
+            self.units, self.profile.unit_type, self.spawn_location, self.damage, self.damage_per_MP, len(self.destroyed))
+
+
+class FiringPositionOptimizer:
+    """Ranks our spawn tiles by the structure damage a wave does per MP
+
+    Attributes :
+        * unit_type (string): The unit sent. Defaults to DEMOLISHER
+        * units (int): The wave size every tile is evaluated for
+        * ranked (list): A FiringPosition for every open spawn tile, most damage per MP first
+
+    """
+    def __init__(self, game_state, unit_type=None, units=None, estimator=None):
+        """Evaluates every spawn tile
+
+        Args:
+            game_state: The current GameState, including anything already queued
+            unit_type: The unit sent. Defaults to DEMOLISHER
+            units: The wave size. Defaults to as many as our MP affords, and at least one
+            estimator: A WaveEstimator for game_state to share, one is created if None
+
+        """
+        config = game_state.config
+        if unit_type is None:
+            unit_type = config["unitInformation"][4]["shorthand"]
+        self.unit_type = unit_type
+        type_index = [info.get("shorthand") for info in config["unitInformation"]].index(unit_type)
+        stats = unit_stats(config, type_index)
+        cost = stats["cost"][game_state.MP]
+        if units is None:
+            units = int(game_state.get_resource(game_state.MP) // cost) if cost > 0 else 1
+        self.units = max(1, units)
+        if estimator is None:
+            estimator = WaveEstimator(game_state)
+
+        self.__structures = estimator.enemy_structures
+        self.__targets = estimator.targets_in_range(stats["attack_range"])
+        self.__damage_per_tile = stats["damage_f"] / stats["speed"] if stats["speed"] > 0 else stats["damage_f"]
+        self.__frames_per_tile = 1 / stats["speed"] if stats["speed"] > 0 else 1
+        self.ranked = []
+        if stats["damage_f"] > 0:
+            for profile in estimator.profiles(unit_type):
+                self.ranked.append(self.__evaluate(profile, self.units * cost))
+        self.ranked.sort(key=lambda position: (-position.damage_per_MP, -position.damage))
+
+    def __evaluate(self, profile, MP):
+        position = FiringPosition(profile, self.units, MP)
+        health = {}
+        exposure = {}
+        structures = self.__structures
+        for step, index in enumerate(profile.path):
+            tile_targets = self.__targets[index]
+            if tile_targets is None:
+                continue
+            for structure in tile_targets:
+                exposure[structure] = exposure.get(structure, 0.0) + self.__frames_per_tile
+            damage = profile.alive(self.units, step) * self.__damage_per_tile
+            for structure in tile_targets:
+                if damage <= 0:
+                    break
+                remaining = health.get(structure, structures[structure].health)
+                if remaining <= 0:
+                    continue
+                dealt = min(damage, remaining)
+                health[structure] = remaining - dealt
+                position.damage += dealt
+                damage -= dealt
+        position.damage += profile.survivors(self.units) * profile.self_destruct_damage
+        position.damage_per_MP = position.damage / MP if MP > 0 else 0.0
+        position.exposure = dict(((structures[structure].x, structures[structure].y), frames) for structure, frames in exposure.items())
+        position.destroyed = [[structures[structure].x, structures[structure].y] for structure, remaining in health.items() if remaining <= 0]
+        return position
+
+    def best(self):
+        """The FiringPosition with the most damage per MP, or None if no spawn tile hits anything"""
+        if not self.ranked or self.ranked[0].damage <= 0:
+            return None
+        return self.ranked[0]
+
+    def position(self, location):
+        """The FiringPosition of one spawn tile, or None if it is not an open spawn tile"""
+        for position in self.ranked:
+            if position.spawn_location == location:
+                return position
+        return None
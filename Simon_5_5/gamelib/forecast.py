@@ -0,0 +1,116 @@
+"""
+Forecast of where the enemy can breach us this turn.
+
+Instead of learning about breaches from action frames after the fact, the
+paths of hypothetical enemy units from every tile of the enemy edges are walked
+in one batched pass, and the damage our turrets can deal along each path is
+weighed against the number of units the enemy can afford.
+"""
+
+import math
+
+from .distance_field import ARENA_SIZE, to_index, to_location
+from .placement import PlacementEngine
+from .unit import GameUnit
+
+
+class SpawnForecast:
+    """The expected outcome of the enemy spending all of its MP on one spawn tile
+
+    Attributes :
+        * spawn_location ([x, y]): Where the enemy units spawn
+        * breach_location ([x, y]): Where they breach, or self destruct if reaches_edge is False
+        * reaches_edge (bool): False if the path ends in a self destruct
+        * units (int): The number of units the enemy can afford
+        * damage (float): The damage our turrets can deal along the path
+        * survivors (float): The expected number of units left when the path ends
+
+    """
+    def __init__(self, spawn_path, units, unit_health):
+        self.spawn_location = spawn_path.spawn_location
+        self.breach_location = spawn_path.breach_location
+        self.reaches_edge = spawn_path.reaches_edge
+        self.path = spawn_path.path
+        self.units = units
+        self.damage = spawn_path.damage
+        # Turrets focus on one unit at a time, so damage removes whole units in turn
+        self.survivors = max(0.0, units - spawn_path.damage / unit_health) if unit_health > 0 else float(units)
+
+    def __repr__(self):
+        return "SpawnForecast from {} breach: {} units: {} survivors: {:.1f}".format(
+            self.spawn_location, self.breach_location, self.units, self.survivors)
+
+
+class AttackForecast:
+    """Per tile breach risk from an all-in enemy attack
+
+    Attributes :
+        * unit_type (string): The mobile unit the enemy is assumed to send
+        * enemy_MP (float): The MP the enemy is assumed to spend
+        * spawns (list): A SpawnForecast for every open enemy spawn tile
+        * breach_risk (list): Flat list, the most surviving enemy units that can breach at each tile
+        * traffic (list): Flat list, the most enemy units still alive when passing each tile
+
+    """
+    def __init__(self, game_state, unit_type=None, turns_in_future=0):
+        """Walks every enemy spawn path and scores it
+
+        Args:
+            game_state: The current GameState, including anything we have already queued this turn
+            unit_type: The unit the enemy sends. Defaults to SCOUT
+            turns_in_future: 0 to use the MP the enemy holds now, otherwise the MP project_future_MP predicts for that turn
+
+        """
+        config = game_state.config
+        if unit_type is None:
+            unit_type = config["unitInformation"][3]["shorthand"]
+        self.unit_type = unit_type
+        if turns_in_future > 0:
+            self.enemy_MP = game_state.project_future_MP(turns_in_future, player_index=1)
+        else:
+            self.enemy_MP = game_state.get_resource(game_state.MP, 1)
+        unit = GameUnit(unit_type, config)
+        units = int(math.floor(self.enemy_MP / unit.cost[game_state.MP])) if unit.cost[game_state.MP] > 0 else 0
+
+        engine = PlacementEngine(game_state, unit_type)
+        self.spawns = [SpawnForecast(spawn_path, units, unit.max_health) for spawn_path in engine.baseline]
+
+        self.breach_risk = [0.0] * (ARENA_SIZE * ARENA_SIZE)
+        self.traffic = [0.0] * (ARENA_SIZE * ARENA_SIZE)
+        threat_damage = engine.threat_map.damage
+        for spawn in self.spawns:
+            if spawn.reaches_edge:
+                breach = to_index(spawn.breach_location)
+                self.breach_risk[breach] = max(self.breach_risk[breach], spawn.survivors)
+            damage_taken = 0.0
+            for index in spawn.path:
+                alive = max(0.0, units - damage_taken / unit.max_health) if unit.max_health > 0 else float(units)
+                if alive > self.traffic[index]:
+                    self.traffic[index] = alive
+                damage_taken += threat_damage[index] / engine.speed
+
+    def risk_at(self, location):
+        """The most enemy units expected to breach at location"""
+        return self.breach_risk[to_index(location)]
+
+    def riskiest_breaches(self, count=None, threshold=0):
+        """Gets the breach tiles sorted by risk
+
+        Args:
+            count: The maximum number of tiles to return, all of them if None
+            threshold: Only tiles where more than this many units are expected to breach are returned
+
+        Returns:
+            A list of [location, expected_units] pairs, riskiest first
+
+        """
+        risky = [[to_location(index), risk] for index, risk in enumerate(self.breach_risk) if risk > threshold]
+        risky.sort(key=lambda pair: -pair[1])
+        return risky if count is None else risky[:count]
+
+    def worst_spawn(self):
+        """The spawn tile that gets the most enemy units to our edge, or None if there are none"""
+        breaching = [spawn for spawn in self.spawns if spawn.reaches_edge]
+        if not breaching:
+            return None
+        return max(breaching, key=lambda spawn: spawn.survivors)
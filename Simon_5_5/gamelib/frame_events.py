@@ -0,0 +1,173 @@
+"""
+Per-tile totals of action frame events, kept up to date as frames arrive.
+
+Each action frame carries lists of events in the game engine's format. The
+aggregator adds every breach, damage, death, attack, spawn and shield event to
+a flat per-tile array for its kind and player:
+
+* One array per turn for the last few turns, in a ring that is reused, so
+  recent turns can be summed exactly.
+* One array decayed by a constant factor each turn, so the whole game can be
+  weighed with recent turns counting most.
+
+The arrays have a fixed size, so memory does not grow with the length of the
+game. Region queries reuse the flat indices of each region they have seen, so
+asking the same question every turn only adds up a handful of numbers.
+
+gamelib does not depend on NumPy, so the arrays are plain lists.
+"""
+
+from .distance_field import ARENA_SIZE, to_location
+
+
+# The tile each kind of event is counted on, and the value counted
+#   breach: where the unit breached, 1 per breach
+#   damage: where the damaged unit stood, the damage
+#   death: where the unit died, 1 per death, removals excluded
+#   attack: where the attacker stood, the damage
+#   spawn: where the unit spawned, 1 per unit
+#   shield: where the support stands, the shield given
+EVENT_KINDS = ["breach", "damage", "death", "attack", "spawn", "shield"]
+
+
+def _event_value(kind, event):
+    """The location, value and player number of one event, or None to skip it"""
+    if kind == "breach":
+        return event[0], 1, event[4]
+    if kind == "damage":
+        return event[0], event[1], event[4]
+    if kind == "death":
+        return None if event[4] else (event[0], 1, event[3])
+    if kind == "attack":
+        return event[0], event[2], event[6]
+    if kind == "spawn":
+        return event[0], 1, event[3]
+    return event[0], event[2], event[6]
+
+
+class FrameEventAggregator:
+    """Per-tile totals of each kind of event, by player, for recent turns and for the whole game
+
+    Attributes :
+        * window (int): The number of most recent turns kept exactly
+        * decay (float): The factor the whole-game totals are multiplied by each turn
+        * turn_number (int): The turn of the latest frame read, -1 before any
+
+    """
+    def __init__(self, window=10, decay=0.8):
+        self.window = window
+        self.decay = decay
+        self.turn_number = -1
+        size = ARENA_SIZE * ARENA_SIZE
+        self.__recent = dict((kind, [[[0.0] * size for _ in range(window)] for _ in range(2)]) for kind in EVENT_KINDS)
+        self.__decayed = dict((kind, [[0.0] * size for _ in range(2)]) for kind in EVENT_KINDS)
+        self.__regions = {}
+
+    def __advance(self, turn_number):
+        """Starts a new turn: clears the ring slots being reused and decays the whole-game totals"""
+        turns = turn_number - self.turn_number if self.turn_number >= 0 else self.window
+        factor = self.decay ** turns
+        size = ARENA_SIZE * ARENA_SIZE
+        for kind in EVENT_KINDS:
+            for player_index in range(2):
+                ring = self.__recent[kind][player_index]
+                for turn in range(turn_number - min(turns, self.window) + 1, turn_number + 1):
+                    ring[turn % self.window] = [0.0] * size
+                decayed = self.__decayed[kind][player_index]
+                if any(decayed):
+                    decayed[:] = [value * factor for value in decayed]
+        self.turn_number = turn_number
+
+    def observe(self, turn_number, events):
+        """Adds the events of one action frame
+
+        Args:
+            turn_number: The turn the action phase belongs to. Frames of older turns are ignored
+            events: The frame's events in the game engine's format
+
+        """
+        if turn_number < self.turn_number:
+            return
+        if turn_number > self.turn_number:
+            self.__advance(turn_number)
+        slot = turn_number % self.window
+        for kind in EVENT_KINDS:
+            kind_events = events.get(kind)
+            if not kind_events:
+                continue
+            recent = self.__recent[kind]
+            decayed = self.__decayed[kind]
+            for event in kind_events:
+                counted = _event_value(kind, event)
+                if counted is None:
+                    continue
+                (x, y), value, player = counted
+                index = int(x) * ARENA_SIZE + int(y)
+                recent[player - 1][slot][index] += value
+                decayed[player - 1][index] += value
+
+    def observe_frame(self, state):
+        """Adds an action frame as AlgoCore.on_action_frame gets it, already parsed from json"""
+        self.observe(int(state["turnInfo"][1]), state["events"])
+
+    def __region(self, valid_x, valid_y):
+        key = (None if valid_x is None else tuple(sorted(set(valid_x))), None if valid_y is None else tuple(sorted(set(valid_y))))
+        indices = self.__regions.get(key)
+        if indices is None:
+            xs = range(ARENA_SIZE) if valid_x is None else [x for x in key[0] if 0 <= x < ARENA_SIZE]
+            ys = range(ARENA_SIZE) if valid_y is None else [y for y in key[1] if 0 <= y < ARENA_SIZE]
+            indices = [x * ARENA_SIZE + y for x in xs for y in ys]
+            self.__regions[key] = indices
+        return indices
+
+    def __arrays(self, kind, player_index, turns):
+        if turns is None:
+            return [self.__decayed[kind][player_index]]
+        turns = min(turns, self.window, self.turn_number + 1)
+        ring = self.__recent[kind][player_index]
+        return [ring[turn % self.window] for turn in range(self.turn_number - turns + 1, self.turn_number + 1)]
+
+    def total(self, kind, player_index, valid_x=None, valid_y=None, turns=None):
+        """Adds up one kind of event over a region
+
+        Args:
+            kind: One of EVENT_KINDS
+            player_index: The player whose units the events belong to, 0 for you 1 for the enemy.
+                For attacks and shields this is the attacker or the support
+            valid_x: Only count tiles in these columns, None for all of them
+            valid_y: Only count tiles in these rows, None for all of them
+            turns: Only count the last turns, up to window. None for the whole game, decayed
+
+        Returns:
+            The total value of the events
+
+        """
+        indices = self.__region(valid_x, valid_y)
+        return sum(array[index] for array in self.__arrays(kind, player_index, turns) for index in indices)
+
+    def frequency(self, kind, player_index, valid_x=None, valid_y=None, turns=5):
+        """The average total per turn over the last turns, see total"""
+        turns = min(turns, self.window, self.turn_number + 1)
+        if turns <= 0:
+            return 0.0
+        return self.total(kind, player_index, valid_x, valid_y, turns) / turns
+
+    def locations(self, kind, player_index, turns=None):
+        """Gets the distinct tiles with any events of one kind, most first
+
+        Args:
+            kind: One of EVENT_KINDS
+            player_index: The player whose units the events belong to
+            turns: Only look at the last turns, up to window. None for the whole game
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        arrays = self.__arrays(kind, player_index, turns)
+        totals = {}
+        for array in arrays:
+            for index, value in enumerate(array):
+                if value:
+                    totals[index] = totals.get(index, 0.0) + value
+        return [to_location(index) for index, _ in sorted(totals.items(), key=lambda item: (-item[1], item[0]))]
@@ -1,6 +1,8 @@
 import math
 from .unit import GameUnit
 from .util import debug_write
+from .transposition import get_zobrist_keys
+from .structure_index import StructureIndex
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -18,6 +20,12 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * zobrist_hash (int): A hash of every structure on the map, see transposition.py. Kept up to date by
+          add_unit, remove_unit, upgrade_unit, place_unit and item assignment
+        * structures (:obj: StructureIndex): Every structure on the map by owner, type, row and column, kept up to date
+          at the same points as zobrist_hash
+        * player_hashes (list): The same hash split by owner, player_hashes[player_index] covers only that player's
+          structures. Together they XOR to zobrist_hash
 
     """
     def __init__(self, config):
@@ -37,6 +45,13 @@ class GameMap:
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
         self.__start = [13,0]
+        self.__zobrist_keys = get_zobrist_keys(self.ARENA_SIZE)
+        self.__structure_type_index = {}
+        for index, unit_info in enumerate(self.config["unitInformation"][:3]):
+            self.__structure_type_index[unit_info.get("shorthand")] = index
+        self.zobrist_hash = 0
+        self.player_hashes = [0, 0]
+        self.structures = StructureIndex(self.ARENA_SIZE, len(self.__structure_type_index))
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -46,6 +61,10 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
+            for unit in self.__map[location[0]][location[1]]:
+                self.__toggle_structure(unit)
+            for unit in val:
+                self.__toggle_structure(unit)
             self.__map[location[0]][location[1]] = val
             return
         self._invalid_coordinates(location)
@@ -75,6 +94,18 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __toggle_structure(self, unit):
+        """
+        Adds or removes a structure from zobrist_hash, player_hashes and the structure index. Mobile units are in none of them.
+        """
+        if unit.stationary:
+            type_index = self.__structure_type_index[unit.unit_type]
+            player_index = unit.player_index or 0
+            key = self.__zobrist_keys.key(unit.x, unit.y, player_index, type_index, unit.upgraded)
+            self.zobrist_hash ^= key
+            self.player_hashes[player_index] ^= key
+            self.structures.toggle(unit, type_index)
+
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
 
@@ -171,8 +202,47 @@ class GameMap:
         if not new_unit.stationary:
             self.__map[x][y].append(new_unit)
         else:
+            for unit in self.__map[x][y]:
+                self.__toggle_structure(unit)
+            self.__toggle_structure(new_unit)
             self.__map[x][y] = [new_unit]
 
+    def place_unit(self, unit):
+        """Add an existing GameUnit to the map at its own x, y location.
+
+        Args:
+            unit: The GameUnit to add. Unlike add_unit, units already at the location are kept.
+
+        Used by GameState when parsing the turn so that zobrist_hash stays in sync.
+        """
+        if not self.in_arena_bounds([unit.x, unit.y]):
+            self._invalid_coordinates([unit.x, unit.y])
+            return
+        self.__map[unit.x][unit.y].append(unit)
+        self.__toggle_structure(unit)
+
+    def upgrade_unit(self, location):
+        """Upgrade the structure at the given location.
+
+        Args:
+            location: The location of the structure to upgrade
+
+        Returns:
+            The upgraded unit, or None if there is no structure at the location
+
+        Call this rather than GameUnit.upgrade() on units in the map so that zobrist_hash stays in sync.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        x, y = location
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                self.__toggle_structure(unit)
+                unit.upgrade()
+                self.__toggle_structure(unit)
+                return unit
+
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
 
@@ -186,8 +256,28 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        for unit in self.__map[x][y]:
+            self.__toggle_structure(unit)
         self.__map[x][y] = []
 
+    def get_blocked_mask(self):
+        """Gets which locations hold a structure
+
+        Returns:
+            A flat list indexed by x * ARENA_SIZE + y, True where there is a structure
+
+        """
+        mask = [False] * (self.ARENA_SIZE * self.ARENA_SIZE)
+        index = 0
+        for column in self.__map:
+            for units in column:
+                for unit in units:
+                    if unit.stationary:
+                        mask[index] = True
+                        break
+                index += 1
+        return mask
+
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
 
@@ -6,6 +6,9 @@ from .navigation import ShortestPathFinder
 from .util import send_command, debug_write
 from .unit import GameUnit
 from .game_map import GameMap
+from .transposition import default_transposition_table
+from .distance_field import get_distance_field, to_index, UNREACHABLE
+from .build_plan import SPAWN
 
 def is_stationary(unit_type):
     """
@@ -44,6 +47,10 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * transposition_table (:obj: TranspositionTable): Cache for results that only depend on the structure layout.
+          Shared between turns, keyed by game_map.zobrist_hash
+        * path_guard (bool): If true, structures that would cut every route from our edges to the enemy edges are refused.
+          See enable_path_guard
 
     """
 
@@ -91,6 +98,10 @@ class GameState:
 
         self.game_map = GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
+        self.transposition_table = default_transposition_table(self.config)
+        self.path_guard = False
+        self.__lane_fields = None
+        self.__lane_hash = None
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
@@ -144,10 +155,10 @@ class GameState:
                         self.game_map[x,y][0].pending_removal = True
                 elif unit_type == UPGRADE:
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                        self.game_map.upgrade_unit([x,y])
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map.place_unit(unit)
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -334,6 +345,7 @@ class GameState:
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
         on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        blocks_paths = self.path_guard and stationary and correct_territory and not blocked and self.would_block_paths(location)
 
         if self.enable_warnings:
             fail_reason = ""
@@ -345,12 +357,14 @@ class GameState:
                 fail_reason = fail_reason + " Location in enemy territory."
             if not (stationary or on_edge):
                 fail_reason = fail_reason + " Information units must be deployed on the edge."
+            if blocks_paths:
+                fail_reason = fail_reason + " Location would block every path to the enemy edge."
             if len(fail_reason) > 0:
                 self.warn("Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason))
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
-                (not stationary or num == 1))
+                (not stationary or num == 1) and not blocks_paths)
 
     def attempt_spawn(self, unit_type, locations, num=1):
         """Attempts to spawn new units with the type given in the given locations.
@@ -381,8 +395,10 @@ class GameState:
                     costs = self.type_cost(unit_type)
                     self.__set_resource(SP, 0 - costs[SP])
                     self.__set_resource(MP, 0 - costs[MP])
+                    previous_hash = self.game_map.zobrist_hash
                     self.game_map.add_unit(unit_type, location, 0)
                     if is_stationary(unit_type):
+                        self.__block_attack_lanes(location, previous_hash)
                         self._build_stack.append((unit_type, x, y))
                     else:
                         self._deploy_stack.append((unit_type, x, y))
@@ -445,13 +461,71 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
+                        self.game_map.upgrade_unit([x, y])
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
                 self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
         return spawned_units
 
+    def attempt_build_plan(self, plan):
+        """Queues the steps of a BuildPlan that are not done yet, in order, until one cannot be afforded
+
+        The plan was checked when it was compiled, so each step only looks at its own tile. A spawn is
+        skipped if anything already stands there, and an upgrade is skipped unless a structure of the
+        step's type that is not upgraded is there. Skipped steps cost nothing; the first step whose
+        cumulative cost, less the cost of the skipped steps, is more than we have ends the pass.
+
+        Args:
+            plan: A BuildPlan
+
+        Returns:
+            The number of steps queued
+
+        """
+        available = self.get_resource(SP)
+        skipped = 0.0
+        queued = 0
+        for step in plan.compile():
+            location = [step.x, step.y]
+            if self.__build_step_done(step):
+                skipped += step.cost[SP]
+                continue
+            if step.cumulative_cost - skipped > available or step.cost[MP] > self.get_resource(MP):
+                break
+            self.__set_resource(SP, 0 - step.cost[SP])
+            self.__set_resource(MP, 0 - step.cost[MP])
+            if step.action == SPAWN:
+                previous_hash = self.game_map.zobrist_hash
+                self.game_map.add_unit(step.unit_type, location, 0)
+                self.__block_attack_lanes(location, previous_hash)
+                self._build_stack.append((step.unit_type, step.x, step.y))
+            else:
+                self.game_map.upgrade_unit(location)
+                self._build_stack.append((UPGRADE, step.x, step.y))
+            queued += 1
+        return queued
+
+    def build_plan_finished(self, plan):
+        """Checks whether every step of a BuildPlan is done or queued, so attempt_build_plan did not stop early
+
+        Args:
+            plan: A BuildPlan
+
+        Returns:
+            True if no step is left for attempt_build_plan to queue
+
+        """
+        return all(self.__build_step_done(step) for step in plan.compile())
+
+    def __build_step_done(self, step):
+        """Whether attempt_build_plan skips a step, see attempt_build_plan"""
+        units = self.game_map[step.x, step.y]
+        if step.action == SPAWN:
+            return len(units) > 0 or (self.path_guard and self.would_block_paths([step.x, step.y]))
+        existing = units[0] if units else None
+        return existing is None or existing.upgraded or existing.pending_removal or existing.unit_type != step.unit_type
+
     def get_target_edge(self, start_location):
         """Gets the target edge given a starting location
 
@@ -495,8 +569,92 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        # The path only depends on the structure layout, so it can be shared between calls and turns
+        cache_key = (self.game_map.zobrist_hash, "path", start_location[0], start_location[1], target_edge)
+        path = self.transposition_table.get(cache_key)
+        if path is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            path = tuple(tuple(location) for location in path)
+            self.transposition_table.put(cache_key, path)
+        return [list(location) for location in path]
+
+    def __attack_lane_fields(self):
+        """
+        Distance fields for our two attack lanes, keyed by the edge our units spawn on.
+        Rebuilt if the map was changed without going through attempt_spawn.
+        """
+        if self.__lane_fields is None or self.__lane_hash != self.game_map.zobrist_hash:
+            self.__lane_fields = {
+                self.game_map.BOTTOM_LEFT: get_distance_field(self, self.game_map.TOP_RIGHT),
+                self.game_map.BOTTOM_RIGHT: get_distance_field(self, self.game_map.TOP_LEFT)}
+            self.__lane_hash = self.game_map.zobrist_hash
+        return self.__lane_fields
+
+    def __block_attack_lanes(self, location, previous_hash):
+        """
+        Keeps the attack lane fields in step with a structure we just queued.
+        """
+        if self.__lane_fields is not None and self.__lane_hash == previous_hash:
+            for field in self.__lane_fields.values():
+                field.block(location)
+            self.__lane_hash = self.game_map.zobrist_hash
+
+    def __lane_is_open(self, spawn_edge, field):
+        for location in self.game_map.get_edge_locations(spawn_edge):
+            if field.reaches_edge(to_index(location)):
+                return True
+        return False
+
+    def get_open_attack_lanes(self):
+        """Gets the edges our mobile units can still reach the enemy edge from
+
+        Returns:
+            A list containing game_map.BOTTOM_LEFT and/or game_map.BOTTOM_RIGHT. A unit spawned on an open tile of
+            one of these edges can reach the opposite enemy edge instead of self destructing.
+
+        """
+        return [spawn_edge for spawn_edge, field in self.__attack_lane_fields().items() if self.__lane_is_open(spawn_edge, field)]
+
+    def would_block_paths(self, location):
+        """Check if a structure at a location would cut our last route to the enemy edge
+
+        Connectivity is tracked incrementally as structures are queued, so this is cheap to call.
+
+        Args:
+            location: The location of a hypothetical structure
+
+        Returns:
+            True if at least one of our edges can currently reach the enemy edge, and none could with a structure at location
+
+        """
+        if not self.game_map.in_arena_bounds(location):
+            return False
+        index = to_index(location)
+        fields = self.__attack_lane_fields()
+        was_open = False
+        for spawn_edge, field in fields.items():
+            if not self.__lane_is_open(spawn_edge, field):
+                continue
+            was_open = True
+            if field.blocked[index] or field.distances[index] == UNREACHABLE:
+                return False
+            patched = field.copy()
+            patched.block(location)
+            if self.__lane_is_open(spawn_edge, patched):
+                return False
+        return was_open
+
+    def enable_path_guard(self, enabled=True):
+        """Refuse to spawn structures that would block every path to the enemy edge
+
+        While enabled, can_spawn and attempt_spawn reject a structure if would_block_paths is true for its location.
+
+        Args:
+            enabled: If true, enable the guard. If false, disable it.
+
+        """
+        self.path_guard = enabled
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -517,6 +675,36 @@ class GameState:
                 return unit
         return False
 
+    def count_structures(self, player_index, unit_type=None, valid_x=None, valid_y=None):
+        """Counts a player's structures, including any we have placed this turn
+
+        Args:
+            player_index: 0 for you, 1 for the enemy
+            unit_type: Only count this structure type, None for all structures
+            valid_x: Only count structures in these columns, None for all of them
+            valid_y: Only count structures in these rows, None for all of them
+
+        Returns:
+            The number of matching structures. Mobile unit types always count 0
+
+        """
+        if unit_type is not None and not is_stationary(unit_type):
+            return 0
+        type_index = None if unit_type is None else UNIT_TYPE_TO_INDEX[unit_type]
+        return self.game_map.structures.count(player_index, type_index, valid_x, valid_y)
+
+    def get_structures(self, player_index, unit_type=None, valid_x=None, valid_y=None):
+        """Gets a player's structures, taking the same filters as count_structures
+
+        Returns:
+            A list of the matching structures, row by row
+
+        """
+        if unit_type is not None and not is_stationary(unit_type):
+            return []
+        type_index = None if unit_type is None else UNIT_TYPE_TO_INDEX[unit_type]
+        return self.game_map.structures.units(player_index, type_index, valid_x, valid_y)
+
     def warn(self, message):
         """ Used internally by game_state to print warnings
         """
@@ -0,0 +1,181 @@
+"""
+Forecasts of the damage our structures take in the next action phase.
+
+Decisions to remove and rebuild a wall used to look only at its health at the
+start of the turn. A wall that takes a beating every action phase looks fine
+right up to the turn it dies. StructureHealthForecast instead reads the damage
+and death events of every action frame as they arrive, and keeps a few running
+numbers per location:
+
+* An exponentially weighted average of the damage taken per action phase.
+* A decaying peak of the damage taken in a single action phase.
+* The damage taken so far in the current action phase.
+
+Turns that pass without any damage are folded in lazily when a location is next
+touched or queried, so the memory per structure is constant no matter how long
+the game runs, and a frame costs time only for its own events.
+
+Locations are tracked rather than unit ids, because a rebuilt wall stands in
+the same line of fire as the one it replaces. The running numbers of a location
+start over when its structure dies, is removed or is rebuilt, and a rate that
+has decayed below NEGLIGIBLE_DAMAGE counts as no damage at all, so a location
+that was hit once long ago does not look damaged forever.
+"""
+
+# Rates and peaks below this are dropped to 0
+NEGLIGIBLE_DAMAGE = 0.5
+
+
+class StructureHealth:
+    """The damage history of one location
+
+    Attributes :
+        * turn (int): The action phase damage is currently accumulating for
+        * damage (float): Damage taken so far in that action phase
+        * rate (float): Average damage per action phase before it, most recent phases weighted most
+        * peak (float): The most damage taken in one action phase before it, decaying like rate
+        * deaths (int): Structures of ours that were destroyed here, not counting removals
+
+    """
+    __slots__ = ["turn", "damage", "rate", "peak", "deaths"]
+
+    def __init__(self, turn):
+        self.turn = turn
+        self.damage = 0.0
+        self.rate = 0.0
+        self.peak = 0.0
+        self.deaths = 0
+
+    def advance(self, turn, decay):
+        """Folds the damage of every action phase before turn into rate and peak"""
+        if turn <= self.turn:
+            return
+        self.rate = decay * self.rate + (1 - decay) * self.damage
+        self.peak = max(decay * self.peak, self.damage)
+        quiet = decay ** (turn - self.turn - 1)
+        self.rate *= quiet
+        self.peak *= quiet
+        if self.rate < NEGLIGIBLE_DAMAGE:
+            self.rate = 0.0
+        if self.peak < NEGLIGIBLE_DAMAGE:
+            self.peak = 0.0
+        self.turn = turn
+        self.damage = 0.0
+
+    def reset(self):
+        """Forgets the damage history, for when the structure here is replaced"""
+        self.damage = 0.0
+        self.rate = 0.0
+        self.peak = 0.0
+
+    def __repr__(self):
+        return "StructureHealth turn: {} damage: {} rate: {:.1f} peak: {:.1f} deaths: {}".format(
+            self.turn, self.damage, self.rate, self.peak, self.deaths)
+
+
+class StructureHealthForecast:
+    """Tracks the damage each location of one player takes, phase by phase, and forecasts the next phase
+
+    Attributes :
+        * player_index (int): The player whose structures are tracked, 0 for you 1 for the enemy
+        * decay (float): How much of the history each new action phase keeps, between 0 and 1
+
+    """
+    def __init__(self, config, player_index=0, decay=0.5):
+        self.player_index = player_index
+        self.decay = decay
+        self.__structure_types = set(index for index, info in enumerate(config["unitInformation"]) if info.get("unitCategory") == 0)
+        self.__locations = {}
+
+    def __len__(self):
+        return len(self.__locations)
+
+    def __entry(self, location, turn):
+        key = (location[0], location[1])
+        entry = self.__locations.get(key)
+        if entry is None:
+            entry = StructureHealth(turn)
+            self.__locations[key] = entry
+        else:
+            entry.advance(turn, self.decay)
+        return entry
+
+    def observe(self, turn_number, events):
+        """Reads the events of one action frame
+
+        The history of a location is reset when our structure there dies, is removed or is spawned.
+
+        Args:
+            turn_number: The turn the action phase belongs to
+            events: The frame's events in the game engine's format
+
+        """
+        owner = self.player_index + 1
+        structure_types = self.__structure_types
+        for location, damage, type_index, _, player in events.get("damage", ()):
+            if player == owner and type_index in structure_types:
+                self.__entry(location, turn_number).damage += damage
+        for location, type_index, _, player, removed in events.get("death", ()):
+            if player != owner or type_index not in structure_types:
+                continue
+            if removed:
+                entry = self.__locations.get((location[0], location[1]))
+                if entry is not None:
+                    entry.reset()
+                continue
+            entry = self.__entry(location, turn_number)
+            entry.deaths += 1
+            entry.reset()
+        for location, type_index, _, player in events.get("spawn", ()):
+            if player == owner and type_index in structure_types:
+                entry = self.__locations.get((location[0], location[1]))
+                if entry is not None:
+                    entry.reset()
+
+    def observe_frame(self, state):
+        """Reads an action frame as AlgoCore.on_action_frame gets it, already parsed from json"""
+        self.observe(int(state["turnInfo"][1]), state["events"])
+
+    def history(self, location, turn_number):
+        """The StructureHealth of location with every action phase before turn_number folded in, or None if it was never hit"""
+        entry = self.__locations.get((location[0], location[1]))
+        if entry is not None:
+            entry.advance(turn_number, self.decay)
+        return entry
+
+    def expected_damage(self, location, turn_number, pessimistic=False):
+        """The damage a structure at location is expected to take in the action phase of turn_number
+
+        Args:
+            location: The location
+            turn_number: The turn whose action phase is forecast, usually game_state.turn_number
+            pessimistic: Use the decaying peak instead of the average
+
+        """
+        entry = self.history(location, turn_number)
+        if entry is None:
+            return 0.0
+        return entry.peak if pessimistic else entry.rate
+
+    def predicted_health(self, unit, turn_number, pessimistic=False):
+        """The health unit is expected to have after the action phase of turn_number"""
+        return unit.health - self.expected_damage([unit.x, unit.y], turn_number, pessimistic)
+
+    def at_risk(self, game_state, pessimistic=False):
+        """Gets the structures expected to be destroyed in the coming action phase
+
+        Args:
+            game_state: The current GameState
+            pessimistic: Use the decaying peak of each location instead of its average
+
+        Returns:
+            The locations, most damage expected first
+
+        """
+        at_risk = []
+        for unit in game_state.get_structures(self.player_index):
+            damage = self.expected_damage([unit.x, unit.y], game_state.turn_number, pessimistic)
+            if damage >= unit.health:
+                at_risk.append((damage, [unit.x, unit.y]))
+        at_risk.sort(key=lambda item: -item[0])
+        return [location for _, location in at_risk]
@@ -1,7 +1,7 @@
 import heapq
 import math
 import sys
-import queue
+from collections import deque
 from .util import debug_write
 
 class Node:
@@ -84,14 +84,14 @@ class ShortestPathFinder:
         Finds the most ideal tile in our 'pocket' of pathable space. 
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
+        current = deque()
+        current.append(start)
         best_idealness = self._get_idealness(start, end_points)
         self.game_map[start[0]][start[1]].visited_idealness = True
         most_ideal = start
 
-        while not current.empty():
-            search_location = current.get()
+        while current:
+            search_location = current.popleft()
             for neighbor in self._get_neighbors(search_location):
                 if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
                     continue
@@ -105,7 +105,7 @@ class ShortestPathFinder:
 
                 if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
                     self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                    current.append(neighbor)
 
         return most_ideal
 
@@ -164,21 +164,21 @@ class ShortestPathFinder:
         """
         #VALIDATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
+        current = deque()
         if ideal_tile in end_points:
             for location in end_points:
-               current.put(location)
+               current.append(location)
                #Set current pathlength to 0
                self.game_map[location[0]][location[1]].pathlength = 0
                self.game_map[location[0]][location[1]].visited_validate = True
         else:
-            current.put(ideal_tile)
+            current.append(ideal_tile)
             self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
             self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
+        while current:
+            current_location = current.popleft()
             current_node = self.game_map[current_location[0]][current_location[1]]
             for neighbor in self._get_neighbors(current_location):
                 if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
@@ -188,7 +188,7 @@ class ShortestPathFinder:
                 if not neighbor_node.visited_validate and not current_node.blocked:
                     neighbor_node.pathlength = current_node.pathlength + 1
                     neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                    current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
@@ -0,0 +1,180 @@
+"""
+Tested answers to enemy layouts we have seen before.
+
+Our first turns are the same in every game, so what decides a good answer early
+on is mostly the enemy's layout. GameMap keeps a zobrist hash of each player's
+structures, and the enemy's, together with the turn number, names the position.
+An OpeningBook maps those names to responses worked out offline, from replays
+or self-play, by scripts/build_opening_book.py: where to send our mobile units
+and which structures to add. Looking a position up is a single dict access, so
+a known opening costs nothing to answer during the game.
+
+Books are plain JSON, tied to the config they were built with. A missing book,
+or one built for another config, is simply empty.
+"""
+
+import json
+import os
+import tempfile
+
+from .precompute import config_hash
+from .util import debug_write
+
+
+BOOK_VERSION = 1
+BOOK_PATH_VARIABLE = "ALGO_OPENING_BOOK"
+DEFAULT_BOOK_NAME = "opening_book.json"
+
+
+def fingerprint(game_state, player_index=1):
+    """The hash of one player's structures, the enemy's by default. See GameMap.player_hashes"""
+    return game_state.game_map.player_hashes[player_index]
+
+
+def position_key(turn_number, enemy_fingerprint):
+    """The key a position is stored under in a book"""
+    return "{}:{:016x}".format(turn_number, enemy_fingerprint)
+
+
+class BookResponse:
+    """A tested answer to one position
+
+    Attributes :
+        * spawn ([unit_type, [x, y], units] or None): The mobile units to send, or None if the answer does not send any
+        * hold (bool): True if holding beat every wave tested, so nothing should be sent. A response with no
+          spawn that does not hold leaves the attack to the algo
+        * structures (list): [unit_type, [x, y]] structures to add, in order
+        * score (float): How well the answer did when it was tested, higher is better
+        * games (int): The number of times the position was seen while building the book
+
+    """
+    def __init__(self, spawn=None, structures=None, score=0.0, games=1, hold=False):
+        self.spawn = spawn
+        self.hold = hold and spawn is None
+        self.structures = structures or []
+        self.score = score
+        self.games = games
+
+    def to_json(self):
+        return {"spawn": self.spawn, "hold": self.hold, "structures": self.structures, "score": self.score, "games": self.games}
+
+    @classmethod
+    def from_json(cls, entry):
+        return cls(entry.get("spawn"), entry.get("structures"), entry.get("score", 0.0), entry.get("games", 1), entry.get("hold", False))
+
+    def spawn_location(self, unit_type):
+        """Where to send unit_type, or None if the answer sends something else"""
+        if self.spawn is None or self.spawn[0] != unit_type:
+            return None
+        return list(self.spawn[1])
+
+    def deploy(self, game_state):
+        """Queues the mobile units of the answer with attempt_spawn
+
+        Returns:
+            The number of units spawned, 0 if the answer does not send any
+
+        """
+        if self.spawn is None:
+            return 0
+        unit_type, location, units = self.spawn
+        return game_state.attempt_spawn(unit_type, list(location), units) or 0
+
+    def build(self, game_state):
+        """Queues the structures of the answer with attempt_spawn
+
+        Returns:
+            The number of structures placed
+
+        """
+        placed = 0
+        for unit_type, location in self.structures:
+            placed += game_state.attempt_spawn(unit_type, list(location)) or 0
+        return placed
+
+    def __repr__(self):
+        return "BookResponse spawn: {} hold: {} structures: {} score: {} games: {}".format(self.spawn, self.hold, self.structures, self.score, self.games)
+
+
+class OpeningBook:
+    """Responses to known positions, loaded from and saved to a JSON file
+
+    Attributes :
+        * config (JSON): The game config
+        * path (string): The book file. Defaults to the ALGO_OPENING_BOOK environment variable,
+          or opening_book.json in the algo's folder
+        * hits (int): Positions found by lookup
+        * misses (int): Positions lookup did not know
+
+    """
+    def __init__(self, config, path=None):
+        self.config = config
+        if path is None:
+            path = os.environ.get(BOOK_PATH_VARIABLE) or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), DEFAULT_BOOK_NAME)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.__config_hash = config_hash(config)
+        self.__entries = {}
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def load(self):
+        """Reads the book from path. Missing, unreadable or mismatched books leave it empty
+
+        Returns:
+            The book, so it can be chained with the constructor
+
+        """
+        try:
+            with open(self.path) as book_file:
+                book = json.load(book_file)
+        except (OSError, ValueError):
+            return self
+        if book.get("version") != BOOK_VERSION or book.get("config") != self.__config_hash:
+            debug_write("Opening book {} was built for another config or version, ignoring it".format(self.path))
+            return self
+        self.__entries = dict((key, BookResponse.from_json(entry)) for key, entry in book.get("positions", {}).items())
+        return self
+
+    def save(self):
+        """Writes the book to path, replacing any previous file in one step"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        book = {"version": BOOK_VERSION, "config": self.__config_hash,
+                "positions": dict((key, response.to_json()) for key, response in sorted(self.__entries.items()))}
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as book_file:
+            json.dump(book, book_file, indent=1)
+        os.replace(temporary, self.path)
+
+    def lookup(self, game_state):
+        """Gets the response to the current position, or None if the book does not know it"""
+        response = self.__entries.get(position_key(game_state.turn_number, fingerprint(game_state)))
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def add(self, turn_number, enemy_fingerprint, response):
+        """Records a response, keeping the better scored one if the position is already known
+
+        Args:
+            turn_number: The turn of the position
+            enemy_fingerprint: The enemy's fingerprint, see fingerprint
+            response: A BookResponse
+
+        Returns:
+            The response now in the book
+
+        """
+        key = position_key(turn_number, enemy_fingerprint)
+        known = self.__entries.get(key)
+        if known is not None:
+            games = known.games + response.games
+            if known.score >= response.score:
+                response = known
+            response.games = games
+        self.__entries[key] = response
+        return response
@@ -0,0 +1,223 @@
+"""
+What-if analysis of structure placements.
+
+For each candidate location the engine works out how the paths of enemy units
+spawned from every tile of their edges would change if a structure were added
+there. Only paths that ran through the candidate can change, and for those the
+distance field is patched incrementally rather than searched again.
+"""
+
+from .distance_field import (ARENA_SIZE, HALF_ARENA, IN_ARENA, EDGE_INDICES, TOP_LEFT, TOP_RIGHT,
+                             BOTTOM_LEFT, BOTTOM_RIGHT, get_distance_field, to_index, to_location)
+from .threat import get_threat_map, indices_in_range
+from .unit import GameUnit
+
+
+# Enemy units spawned on these edges head to the paired edge on our side
+ENEMY_SPAWN_EDGES = [(TOP_LEFT, BOTTOM_RIGHT), (TOP_RIGHT, BOTTOM_LEFT)]
+
+
+def get_placement_engine(game_state, enemy_unit_type=None):
+    """Gets the PlacementEngine for enemy_unit_type under the current layout of game_state
+
+    Engines are cached in game_state.transposition_table under the layout's zobrist hash,
+    so the returned engine is shared and must not be modified.
+
+    """
+    if enemy_unit_type is None:
+        enemy_unit_type = game_state.config["unitInformation"][3]["shorthand"]
+    key = (game_state.game_map.zobrist_hash, "placement_engine", enemy_unit_type)
+    engine = game_state.transposition_table.get(key)
+    if engine is None:
+        engine = PlacementEngine(game_state, enemy_unit_type)
+        game_state.transposition_table.put(key, engine)
+    return engine
+
+
+class SpawnPath:
+    """The path of one hypothetical enemy unit
+
+    Attributes :
+        * spawn_location ([x, y]): Where the unit spawns
+        * path (list): Flat indices of the tiles the unit walks over
+        * reaches_edge (bool): False if the unit would self destruct instead of breaching
+        * frames_covered (float): Frames the unit spends in range of our turrets
+        * damage (float): Damage our turrets can deal to it along the path
+
+    """
+    def __init__(self, spawn_location, path, reaches_edge, frames_covered, damage):
+        self.spawn_location = spawn_location
+        self.path = path
+        self.reaches_edge = reaches_edge
+        self.frames_covered = frames_covered
+        self.damage = damage
+
+    @property
+    def breach_location(self):
+        """The last tile of the path, where the unit breaches or self destructs"""
+        return to_location(self.path[-1])
+
+    def __repr__(self):
+        return "SpawnPath from {} length: {} breach: {} reaches edge: {} frames covered: {}".format(
+            self.spawn_location, len(self.path), self.breach_location, self.reaches_edge, self.frames_covered)
+
+
+class PlacementEffect:
+    """The effect of adding one structure on every enemy spawn path
+
+    Attributes :
+        * unit_type (string): The structure being placed
+        * location ([x, y]): Where it would be placed
+        * path_length_delta (int): Total change in path length over all enemy spawn tiles
+        * frames_covered_delta (float): Total change in frames enemy units spend in range of our turrets
+        * damage_delta (float): Total change in damage our turrets can deal along the paths
+        * breaches_prevented (int): Spawn tiles whose units could reach our edge before but not after
+        * paths (list): The SpawnPath of every enemy spawn tile with the structure added
+
+    """
+    def __init__(self, unit_type, location):
+        self.unit_type = unit_type
+        self.location = location
+        self.path_length_delta = 0
+        self.frames_covered_delta = 0.0
+        self.damage_delta = 0.0
+        self.breaches_prevented = 0
+        self.paths = []
+
+    def sort_key(self):
+        """Best placements sort first"""
+        return (-self.breaches_prevented, -self.frames_covered_delta, -self.path_length_delta, -self.damage_delta)
+
+    def breach_locations(self):
+        """The distinct tiles where enemy units would breach with the structure added"""
+        breaches = []
+        for spawn_path in self.paths:
+            if spawn_path.reaches_edge and spawn_path.breach_location not in breaches:
+                breaches.append(spawn_path.breach_location)
+        return breaches
+
+    def __repr__(self):
+        return "{} at {}: path length {:+d}, frames covered {:+.1f}, damage {:+.1f}, breaches prevented {}".format(
+            self.unit_type, self.location, self.path_length_delta, self.frames_covered_delta,
+            self.damage_delta, self.breaches_prevented)
+
+
+class PlacementEngine:
+    """Ranks candidate structure placements by their effect on enemy paths
+
+    Attributes :
+        * game_state (:obj: GameState): The state the placements are evaluated against, including anything already queued
+        * speed (float): The speed of the enemy unit the paths are timed for
+        * baseline (list): The SpawnPath of every enemy spawn tile without any new structure
+
+    """
+    def __init__(self, game_state, enemy_unit_type=None):
+        self.game_state = game_state
+        if enemy_unit_type is None:
+            enemy_unit_type = game_state.config["unitInformation"][3]["shorthand"]
+        self.speed = GameUnit(enemy_unit_type, game_state.config).speed or 1
+        self.threat_map = get_threat_map(game_state, 1)
+        self.__fields = {}
+        self.baseline = []
+        self.__baseline_by_edge = {}
+        for spawn_edge, target_edge in ENEMY_SPAWN_EDGES:
+            field = get_distance_field(game_state, target_edge)
+            self.__fields[target_edge] = field
+            spawn_paths = []
+            for start in EDGE_INDICES[spawn_edge]:
+                if field.blocked[start]:
+                    continue
+                spawn_path = self.__spawn_path(field, start, ())
+                spawn_paths.append((spawn_path, frozenset(spawn_path.path)))
+            self.__baseline_by_edge[target_edge] = spawn_paths
+            self.baseline.extend(spawn_path for spawn_path, _ in spawn_paths)
+
+    def __spawn_path(self, field, start, extra_coverage, extra_damage=0):
+        path = field.path_indices(start)
+        return self.__measure(to_location(start), path, field.reaches_edge(start), extra_coverage, extra_damage)
+
+    def __measure(self, spawn_location, path, reaches_edge, extra_coverage, extra_damage):
+        attackers = self.threat_map.attackers
+        damage_map = self.threat_map.damage
+        covered = 0
+        damage = 0.0
+        for index in path:
+            if attackers[index] or index in extra_coverage:
+                covered += 1
+            damage += damage_map[index]
+            if index in extra_coverage:
+                damage += extra_damage
+        return SpawnPath(spawn_location, path, reaches_edge, covered / self.speed, damage / self.speed)
+
+    def is_candidate(self, location):
+        """True if a structure could be placed at location: on our half of the arena and not blocked"""
+        x, y = location
+        if not (0 <= x < ARENA_SIZE and 0 <= y < HALF_ARENA) or not IN_ARENA[to_index(location)]:
+            return False
+        return not self.game_state.contains_stationary_unit(location)
+
+    def evaluate(self, unit_type, location):
+        """Works out the effect of placing one structure
+
+        Args:
+            unit_type: The structure type, WALL, TURRET or SUPPORT
+            location: Where it would be placed
+
+        Returns:
+            A PlacementEffect, or None if the location cannot hold a structure
+
+        """
+        if not self.is_candidate(location):
+            return None
+        index = to_index(location)
+        unit = GameUnit(unit_type, self.game_state.config, 0, None, location[0], location[1])
+        extra_coverage = set()
+        if unit.damage_i > 0:
+            extra_coverage = set(indices_in_range(location, unit.attackRange))
+
+        effect = PlacementEffect(unit_type, location)
+        for target_edge, spawn_paths in self.__baseline_by_edge.items():
+            patched = None
+            for before, tiles in spawn_paths:
+                start = to_index(before.spawn_location)
+                if index in tiles:
+                    if patched is None:
+                        patched = self.__fields[target_edge].copy()
+                        patched.block(location)
+                    after = self.__spawn_path(patched, start, extra_coverage, unit.damage_i)
+                elif extra_coverage:
+                    after = self.__measure(before.spawn_location, before.path, before.reaches_edge, extra_coverage, unit.damage_i)
+                else:
+                    after = before
+                effect.paths.append(after)
+                effect.path_length_delta += len(after.path) - len(before.path)
+                effect.frames_covered_delta += after.frames_covered - before.frames_covered
+                effect.damage_delta += after.damage - before.damage
+                if before.reaches_edge and not after.reaches_edge:
+                    effect.breaches_prevented += 1
+        return effect
+
+    def rank(self, unit_type, locations):
+        """Evaluates every candidate and sorts them best first
+
+        Args:
+            unit_type: The structure type, WALL, TURRET or SUPPORT
+            locations: The candidate locations. Locations that cannot hold a structure are skipped
+
+        Returns:
+            A list of PlacementEffect, best first
+
+        """
+        effects = []
+        for location in locations:
+            effect = self.evaluate(unit_type, location)
+            if effect is not None:
+                effects.append(effect)
+        effects.sort(key=PlacementEffect.sort_key)
+        return effects
+
+    def best_locations(self, unit_type, locations, count=1):
+        """The top ranked locations, ready to be passed to GameState.attempt_spawn
+
+        """
+        return [effect.location for effect in self.rank(unit_type, locations)[:count]]
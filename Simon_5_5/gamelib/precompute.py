@@ -0,0 +1,224 @@
+"""
+On-disk cache of tables that only depend on the game config.
+
+Radius stencils, the distance fields of the empty board and the paths from every
+edge tile for a few known layouts are the same in every game played with the same
+config. They are saved once, in a file named after a hash of the config, and loaded
+by later games so the first turns do not pay to rebuild them.
+
+Layouts are identified by their zobrist hash, the same key GameState uses for its
+transposition table, so installed entries are found by find_path_to_edge and
+get_distance_field whenever the board matches.
+
+The file is plain JSON, kept in the algo's own folder by default, so loading it
+can never run code. Everything read back is checked, and a file that does not
+have the expected shape is treated as missing and rebuilt.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from .distance_field import ARENA_SIZE, EDGE_INDICES, DistanceField, get_target_edge
+from .threat import range_offsets, _RANGE_OFFSETS
+from .transposition import get_zobrist_keys, default_transposition_table
+from .util import debug_write
+
+
+CACHE_VERSION = 1
+CACHE_DIR_VARIABLE = "ALGO_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".precompute")
+
+
+def config_hash(config):
+    """A hash of the parts of the config the cached tables depend on"""
+    relevant = {"version": CACHE_VERSION, "arena_size": ARENA_SIZE,
+                "unitInformation": config.get("unitInformation"),
+                "blockedLocations": config.get("misc", {}).get("blockedLocations")}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def layout_hash(config, structures):
+    """The zobrist hash GameMap would have with exactly these structures
+
+    Args:
+        config: The game config
+        structures: A list of (unit_type, [x, y], player_index, upgraded)
+
+    """
+    keys = get_zobrist_keys(ARENA_SIZE)
+    type_indices = dict((info.get("shorthand"), index) for index, info in enumerate(config["unitInformation"][:3]))
+    value = 0
+    for unit_type, location, player_index, upgraded in structures:
+        value ^= keys.key(location[0], location[1], player_index, type_indices[unit_type], upgraded)
+    return value
+
+
+def _build_layout(structures):
+    blocked = [False] * (ARENA_SIZE * ARENA_SIZE)
+    for _, location, _, _ in structures:
+        blocked[location[0] * ARENA_SIZE + location[1]] = True
+    fields = [DistanceField(blocked, edge) for edge in range(4)]
+    paths = {}
+    for edge_indices in EDGE_INDICES:
+        for start in edge_indices:
+            if blocked[start]:
+                continue
+            target_edge = get_target_edge(start)
+            path = fields[target_edge].path_indices(start)
+            paths[(start // ARENA_SIZE, start % ARENA_SIZE, target_edge)] = tuple(
+                (index // ARENA_SIZE, index % ARENA_SIZE) for index in path)
+    return fields, paths
+
+
+def _tables_to_json(tables):
+    layouts = {}
+    for name, layout in tables["layouts"].items():
+        fields = layout["fields"]
+        layouts[name] = {
+            "hash": layout["hash"],
+            "blocked": [index for index, blocked in enumerate(fields[0].blocked) if blocked],
+            "distances": [field.distances for field in fields],
+            "paths": [[x, y, target_edge, [list(location) for location in path]]
+                      for (x, y, target_edge), path in layout["paths"].items()]}
+    return {"version": tables["version"],
+            "stencils": [[radius, [list(offset) for offset in offsets]] for radius, offsets in tables["stencils"].items()],
+            "layouts": layouts}
+
+
+def _tables_from_json(data):
+    """
+    Rebuilds the tables saved by _tables_to_json, checking every part.
+    Raises ValueError, or the TypeError or KeyError of a missing part, if the data has the wrong shape.
+    """
+    size = ARENA_SIZE * ARENA_SIZE
+
+    def integers(values, count=None):
+        values = list(values)
+        if (count is not None and len(values) != count) or not all(type(value) == int for value in values):
+            raise ValueError("Expected {} integers".format(count or "only"))
+        return values
+
+    if data["version"] != CACHE_VERSION:
+        raise ValueError("Cache version {}".format(data["version"]))
+    stencils = {}
+    for radius, offsets in data["stencils"]:
+        if type(radius) not in (int, float):
+            raise ValueError("Bad radius {!r}".format(radius))
+        stencils[radius] = tuple(tuple(integers(offset, 2)) for offset in offsets)
+    layouts = {}
+    for name, layout in data["layouts"].items():
+        if type(layout["hash"]) != int:
+            raise ValueError("Bad layout hash")
+        blocked = [False] * size
+        for index in integers(layout["blocked"]):
+            blocked[index] = True
+        if len(layout["distances"]) != len(EDGE_INDICES):
+            raise ValueError("Expected a distance field per edge")
+        fields = [DistanceField(blocked, edge, integers(distances, size)) for edge, distances in enumerate(layout["distances"])]
+        paths = {}
+        for x, y, target_edge, path in layout["paths"]:
+            key = tuple(integers([x, y, target_edge], 3))
+            paths[key] = tuple(tuple(integers(location, 2)) for location in path)
+        layouts[name] = {"hash": layout["hash"], "fields": fields, "paths": paths}
+    return {"version": CACHE_VERSION, "stencils": stencils, "layouts": layouts}
+
+
+class PrecomputeCache:
+    """Loads or builds the tables for one config
+
+    Attributes :
+        * config (JSON): The game config
+        * directory (string): Where cache files are kept. Defaults to the ALGO_CACHE_DIR environment variable, or .precompute in the algo's folder
+        * path (string): The cache file for this config
+        * hit (bool): True if the tables were loaded from disk rather than built
+        * tables (dict): The loaded or built tables
+
+    """
+    def __init__(self, config, directory=None):
+        self.config = config
+        if directory is None:
+            directory = os.environ.get(CACHE_DIR_VARIABLE) or DEFAULT_CACHE_DIR
+        self.directory = directory
+        self.path = os.path.join(directory, "precompute-v{}-{}.json".format(CACHE_VERSION, config_hash(config)))
+        self.hit = False
+        self.tables = None
+
+    def load_or_build(self, layouts=()):
+        """Loads the tables, or builds and saves them if they are missing or lack a layout
+
+        Args:
+            layouts: A list of (name, structures) to precompute paths for, see layout_hash. The empty board is always included
+
+        Returns:
+            The tables
+
+        """
+        wanted = [("empty", [])] + list(layouts)
+        hashes = dict((name, layout_hash(self.config, structures)) for name, structures in wanted)
+        tables = self.__load()
+        if tables is not None and all(tables["layouts"].get(name, {}).get("hash") == value for name, value in hashes.items()):
+            self.hit = True
+            self.tables = tables
+            return tables
+
+        radii = set()
+        for info in self.config["unitInformation"]:
+            for source in (info, info.get("upgrade", {})):
+                for key in ("attackRange", "shieldRange", "selfDestructRange"):
+                    if source.get(key):
+                        radii.add(source[key])
+        tables = {"version": CACHE_VERSION, "stencils": dict((radius, range_offsets(radius)) for radius in radii), "layouts": {}}
+        for name, structures in wanted:
+            fields, paths = _build_layout(structures)
+            tables["layouts"][name] = {"hash": hashes[name], "fields": fields, "paths": paths}
+        self.tables = tables
+        self.__save(tables)
+        return tables
+
+    def __load(self):
+        """The saved tables, or None if they are missing or not what this version saves"""
+        try:
+            with open(self.path) as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        try:
+            return _tables_from_json(data)
+        except (KeyError, TypeError, ValueError, IndexError) as error:
+            debug_write("Ignoring the precompute cache {}: {!r}".format(self.path, error))
+            return None
+
+    def __save(self, tables):
+        """
+        Writes to a temporary file first and renames it, so a game starting at the same
+        time never reads a half written cache.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(handle, "w") as cache_file:
+                json.dump(_tables_to_json(tables), cache_file, separators=(",", ":"))
+            os.replace(temporary_path, self.path)
+        except OSError as error:
+            debug_write("Could not save the precompute cache to {}: {}".format(self.path, error))
+
+    def install(self, transposition_table=None):
+        """Puts the tables where gamelib looks for them
+
+        Args:
+            transposition_table: The table to fill, defaults to the one shared by every GameState
+
+        """
+        if self.tables is None:
+            self.load_or_build()
+        if transposition_table is None:
+            transposition_table = default_transposition_table(self.config)
+        _RANGE_OFFSETS.update(self.tables["stencils"])
+        for layout in self.tables["layouts"].values():
+            value = layout["hash"]
+            for edge, field in enumerate(layout["fields"]):
+                transposition_table.put((value, "distance_field", edge), field)
+            for (x, y, target_edge), path in layout["paths"].items():
+                transposition_table.put((value, "path", x, y, target_edge), path)
@@ -0,0 +1,101 @@
+"""
+Recording of the raw traffic between the algo and the game engine.
+
+Every line read by util.get_command and sent by util.send_command is written to a
+gzip compressed file as a length prefixed record, so a game can be fed back through
+an algo later without the engine. The turn loop only puts lines on a queue; a
+background thread does the compression and writing.
+
+Each record is a header packed as RECORD_HEADER, holding the direction, the time the
+line was seen and the length of the line in bytes, followed by the UTF-8 line itself.
+"""
+
+import atexit
+import gzip
+import os
+import queue
+import struct
+import threading
+import time
+
+from .util import ENGINE_TO_ALGO, ALGO_TO_ENGINE
+
+
+RECORD_HEADER = struct.Struct(">cdI")
+
+
+class ReplayRecorder:
+    """Writes engine traffic to a compressed file on a background thread
+
+    Attributes :
+        * path (string): The file being written
+        * records (int): The number of lines recorded so far
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self.__queue = queue.Queue()
+        self.__file = gzip.open(path, "wb", compresslevel=6)
+        self.__closed = False
+        self.__writer = threading.Thread(target=self.__write, daemon=True)
+        self.__writer.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def in_directory(cls, directory):
+        """Creates a recorder writing to a new file in directory, named after the time and process id"""
+        os.makedirs(directory, exist_ok=True)
+        name = "{}-{}.replay.gz".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid())
+        return cls(os.path.join(directory, name))
+
+    def record(self, direction, line):
+        """Queues a line to be written. Cheap enough to call from the turn loop"""
+        if not self.__closed:
+            self.records += 1
+            self.__queue.put((direction, time.time(), line))
+
+    def __write(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            direction, timestamp, line = item
+            data = line.rstrip("\n").encode("utf-8")
+            self.__file.write(RECORD_HEADER.pack(direction, timestamp, len(data)))
+            self.__file.write(data)
+        self.__file.close()
+
+    def close(self):
+        """Writes everything still queued and closes the file"""
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__queue.put(None)
+        self.__writer.join()
+
+
+def read_replay(path):
+    """Reads a recording made by ReplayRecorder
+
+    Args:
+        path: The recording
+
+    Yields:
+        (direction, timestamp, line) for every record, where direction is ENGINE_TO_ALGO or ALGO_TO_ENGINE
+
+    """
+    with gzip.open(path, "rb") as replay_file:
+        while True:
+            try:
+                header = replay_file.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                direction, timestamp, length = RECORD_HEADER.unpack(header)
+                data = replay_file.read(length)
+            except EOFError:
+                # A recording cut short by a crash ends without the gzip trailer
+                return
+            if len(data) < length:
+                return
+            yield direction, timestamp, data.decode("utf-8")
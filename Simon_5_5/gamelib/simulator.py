@@ -0,0 +1,458 @@
+"""
+A stand-in for the game engine's action phase.
+
+The simulator moves mobile units one tile at a time along the same paths the
+engine uses, lets supports shield, has every unit attack using the targeting
+rules of GameState.get_target, and removes the dead, one frame at a time. Frame
+events are produced in the engine's own format so they can be fed to
+AlgoCore.on_action_frame.
+
+It follows the published rules closely but is not the official engine, so use
+it for testing and estimates rather than as ground truth.
+"""
+
+import math
+
+from .distance_field import (ARENA_SIZE, HALF_ARENA, EDGE_MEMBERSHIP, DistanceField,
+                             get_target_edge, to_index, to_location)
+
+
+EVENT_TYPES = ["selfDestruct", "breach", "damage", "shield", "move", "spawn", "death", "attack", "melee"]
+_TARGET_OFFSETS = {}
+
+
+def _target_offsets(radius):
+    """
+    Offsets a unit with the given range can attack, with their distances, using the same
+    rule as GameMap.get_locations_in_range.
+    """
+    offsets = _TARGET_OFFSETS.get(radius)
+    if offsets is None:
+        search_radius = int(math.ceil(radius))
+        offsets = []
+        for dx in range(-search_radius, search_radius + 1):
+            for dy in range(-search_radius, search_radius + 1):
+                distance = math.sqrt(dx ** 2 + dy ** 2)
+                if distance < radius:
+                    offsets.append((dx, dy, distance))
+        _TARGET_OFFSETS[radius] = offsets
+    return offsets
+
+
+def unit_stats(config, type_index, upgraded=False):
+    """Gets the stats the simulator needs for a unit type from the config
+
+    Args:
+        config: The game config
+        type_index: The index of the type in config["unitInformation"]
+        upgraded: If true, apply the type's upgrade block the way GameUnit.upgrade does
+
+    Returns:
+        A dict of stats
+
+    """
+    type_config = config["unitInformation"][type_index]
+    stats = {
+        "stationary": type_config.get("unitCategory", 1) == 0,
+        "speed": type_config.get("speed", 0),
+        "damage_f": type_config.get("attackDamageTower", 0),
+        "damage_i": type_config.get("attackDamageWalker", 0),
+        "attack_range": type_config.get("attackRange", 0),
+        "shield_range": type_config.get("shieldRange", 0),
+        "shield_per_unit": type_config.get("shieldPerUnit", 0),
+        "shield_bonus_per_y": type_config.get("shieldBonusPerY", 0),
+        "max_health": type_config.get("startHealth", 0),
+        "cost": [type_config.get("cost1", 0), type_config.get("cost2", 0)],
+        "refund": type_config.get("refundPercentage", 0),
+        "hit_radius": type_config.get("getHitRadius", 0),
+        "breach_damage": type_config.get("playerBreachDamage", 1),
+        "self_destruct_damage_f": type_config.get("selfDestructDamageTower", 0),
+        "self_destruct_damage_i": type_config.get("selfDestructDamageWalker", 0),
+        "self_destruct_range": type_config.get("selfDestructRange", 0),
+        "self_destruct_steps": type_config.get("selfDestructStepsRequired", 0)}
+    if upgraded:
+        upgrade = type_config.get("upgrade", {})
+        for key, config_key in [("speed", "speed"), ("damage_f", "attackDamageTower"), ("damage_i", "attackDamageWalker"),
+                                ("attack_range", "attackRange"), ("shield_range", "shieldRange"),
+                                ("shield_per_unit", "shieldPerUnit"), ("shield_bonus_per_y", "shieldBonusPerY"),
+                                ("max_health", "startHealth")]:
+            stats[key] = upgrade.get(config_key, stats[key])
+        stats["cost"] = [stats["cost"][0] + upgrade.get("cost1", 0), stats["cost"][1] + upgrade.get("cost2", 0)]
+    return stats
+
+
+class SimulatedUnit:
+    """A unit taking part in a simulation
+
+    Attributes :
+        * unit_id (string): A unique id, as used in frame events
+        * unit_type (string): The unit's type shorthand
+        * type_index (int): The index of the type in unitInformation
+        * player_index (int): 0 for the player at the bottom, 1 for the player at the top
+        * x, y (int): The unit's location
+        * health (float): Current health
+        * stats (dict): The unit's stats, see unit_stats
+        * upgraded (bool): If the unit is upgraded
+        * pending_removal (bool): If the unit's owner has asked for it to be removed
+        * target_edge (int): For mobile units, the edge they are heading to
+        * steps (int): For mobile units, the number of tiles moved so far
+
+    """
+    __slots__ = ["unit_id", "unit_type", "type_index", "player_index", "x", "y", "health", "stats", "upgraded",
+                 "pending_removal", "target_edge", "steps", "move_direction", "move_timer", "shielded_by"]
+
+    def __init__(self, unit_id, unit_type, type_index, player_index, x, y, stats, health=None):
+        self.unit_id = unit_id
+        self.unit_type = unit_type
+        self.type_index = type_index
+        self.player_index = player_index
+        self.x = x
+        self.y = y
+        self.stats = stats
+        self.health = stats["max_health"] if health is None else health
+        self.upgraded = False
+        self.pending_removal = False
+        self.target_edge = None
+        self.steps = 0
+        self.move_direction = 0
+        self.move_timer = 0
+        self.shielded_by = None
+
+    @property
+    def stationary(self):
+        return self.stats["stationary"]
+
+    def __repr__(self):
+        return "Simulated {} of player {} at {} health: {}".format(self.unit_type, self.player_index, [self.x, self.y], self.health)
+
+
+class SimulationResult:
+    """Summary of a simulated action phase
+
+    Attributes :
+        * frames (int): The number of frames simulated, including the spawn frame
+        * breach_damage ([float, float]): Damage dealt to the enemy's health by each player's breaching units
+        * breaches ([[x, y, player_index]]): Every breach, with the index of the player whose unit breached
+        * structures_destroyed ([int, int]): The number of each player's structures destroyed
+        * mobile_units_lost ([int, int]): The number of each player's mobile units destroyed or self destructed
+
+    """
+    def __init__(self):
+        self.frames = 0
+        self.breach_damage = [0.0, 0.0]
+        self.breaches = []
+        self.structures_destroyed = [0, 0]
+        self.mobile_units_lost = [0, 0]
+
+    def __repr__(self):
+        return "SimulationResult frames: {} breach damage: {} structures destroyed: {} mobile units lost: {}".format(
+            self.frames, self.breach_damage, self.structures_destroyed, self.mobile_units_lost)
+
+
+class ActionPhaseSimulator:
+    """Simulates the action phase on a copy of the board
+
+    Player 0 is at the bottom of the board and player 1 at the top, as seen by player 0.
+
+    Attributes :
+        * config (JSON): The game config
+        * structures (dict): Structures keyed by flat index
+        * mobile_units (list): Mobile units still in play
+        * frame (int): The number of frames simulated so far
+
+    """
+    def __init__(self, config):
+        self.config = config
+        self.structures = {}
+        self.mobile_units = []
+        self.frame = 0
+        self.result = SimulationResult()
+        self.__type_index = {}
+        for index, unit_info in enumerate(config["unitInformation"][:6]):
+            self.__type_index[unit_info.get("shorthand")] = index
+        self.__stats = {}
+        self.__fields = {}
+        self.__pending_spawns = []
+        self.__next_id = 1
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        """Creates a simulator from a GameState, including the units we have queued to deploy
+
+        """
+        simulator = cls(game_state.config)
+        for location in game_state.game_map:
+            for unit in game_state.game_map[location]:
+                if unit.stationary:
+                    structure = simulator.add_structure(unit.unit_type, location, unit.player_index, unit.health)
+                    if unit.upgraded:
+                        simulator.upgrade_structure(location)
+                        structure.health = unit.health
+                    structure.pending_removal = unit.pending_removal
+        for unit_type, x, y in game_state._deploy_stack:
+            simulator.spawn(unit_type, [x, y], 0)
+        return simulator
+
+    def stats(self, unit_type, upgraded=False):
+        """The stats of a unit type, see unit_stats"""
+        key = (unit_type, upgraded)
+        stats = self.__stats.get(key)
+        if stats is None:
+            stats = unit_stats(self.config, self.__type_index[unit_type], upgraded)
+            self.__stats[key] = stats
+        return stats
+
+    def __new_unit(self, unit_type, location, player_index, health=None, unit_id=None):
+        if unit_id is None:
+            unit_id = str(self.__next_id)
+            self.__next_id += 1
+        return SimulatedUnit(unit_id, unit_type, self.__type_index[unit_type], player_index,
+                             location[0], location[1], self.stats(unit_type), health)
+
+    def __field(self, target_edge):
+        field = self.__fields.get(target_edge)
+        if field is None:
+            blocked = [False] * (ARENA_SIZE * ARENA_SIZE)
+            for index in self.structures:
+                blocked[index] = True
+            field = DistanceField(blocked, target_edge)
+            self.__fields[target_edge] = field
+        return field
+
+    def add_structure(self, unit_type, location, player_index, health=None, unit_id=None):
+        """Places a structure, replacing anything already at the location
+
+        Returns:
+            The new SimulatedUnit
+
+        """
+        unit = self.__new_unit(unit_type, location, player_index, health, unit_id)
+        index = to_index(location)
+        self.structures[index] = unit
+        for field in self.__fields.values():
+            field.block(location)
+        return unit
+
+    def remove_structure(self, location):
+        """Removes the structure at a location, returning it or None"""
+        unit = self.structures.pop(to_index(location), None)
+        if unit is not None:
+            for field in self.__fields.values():
+                field.unblock(location)
+        return unit
+
+    def upgrade_structure(self, location):
+        """Upgrades the structure at a location, returning it or None"""
+        unit = self.structures.get(to_index(location))
+        if unit is not None and not unit.upgraded:
+            unit.stats = self.stats(unit.unit_type, True)
+            unit.upgraded = True
+            unit.health = unit.stats["max_health"]
+        return unit
+
+    def structure_at(self, location):
+        """The structure at a location, or None"""
+        return self.structures.get(to_index(location))
+
+    def spawn(self, unit_type, location, player_index, num=1):
+        """Adds mobile units that will enter play on the next frame
+
+        Returns:
+            The new SimulatedUnits
+
+        """
+        units = []
+        for _ in range(num):
+            unit = self.__new_unit(unit_type, location, player_index)
+            unit.target_edge = get_target_edge(to_index(location))
+            speed = unit.stats["speed"]
+            unit.move_timer = 1 / speed if speed > 0 else float("inf")
+            unit.shielded_by = set()
+            units.append(unit)
+        self.__pending_spawns.extend(units)
+        return units
+
+    def new_round(self):
+        """Starts a new action phase on the same board, resetting the frame count and result"""
+        self.frame = 0
+        self.result = SimulationResult()
+
+    def is_finished(self):
+        """True once every mobile unit has breached or died"""
+        return not self.mobile_units and not self.__pending_spawns
+
+    def run(self, max_frames=1000, on_frame=None):
+        """Simulates frames until no mobile units are left
+
+        Args:
+            max_frames: A limit on the number of frames, in case units never finish
+            on_frame: Called with (frame_number, events) after each frame
+
+        Returns:
+            The SimulationResult
+
+        """
+        while not self.is_finished() and self.frame < max_frames:
+            events = self.step()
+            if on_frame is not None:
+                on_frame(self.frame - 1, events)
+        return self.result
+
+    def step(self):
+        """Simulates a single frame
+
+        New units spawn in a frame of their own. After that each frame supports shield,
+        mobile units move, every unit attacks, and then the dead are removed.
+
+        Returns:
+            The frame's events in the game engine's format, with player 1 at the bottom and player 2 at the top
+
+        """
+        events = dict((event_type, []) for event_type in EVENT_TYPES)
+        if self.__pending_spawns:
+            for unit in self.__pending_spawns:
+                self.mobile_units.append(unit)
+                events["spawn"].append([[unit.x, unit.y], unit.type_index, unit.unit_id, unit.player_index + 1])
+            self.__pending_spawns = []
+        else:
+            self.__shield(events)
+            self.__move(events)
+            self.__attack(events)
+            self.__remove_dead(events)
+        self.frame += 1
+        self.result.frames = self.frame
+        return events
+
+    def __shield(self, events):
+        for support in self.structures.values():
+            stats = support.stats
+            if stats["shield_per_unit"] <= 0 or stats["shield_range"] <= 0:
+                continue
+            # Supports further up their owner's side of the board give bigger shields
+            height = support.y if support.player_index == 0 else ARENA_SIZE - 1 - support.y
+            amount = stats["shield_per_unit"] + stats["shield_bonus_per_y"] * height
+            for unit in self.mobile_units:
+                if unit.player_index != support.player_index or support.unit_id in unit.shielded_by:
+                    continue
+                if math.sqrt((unit.x - support.x) ** 2 + (unit.y - support.y) ** 2) <= stats["shield_range"]:
+                    unit.shielded_by.add(support.unit_id)
+                    unit.health += amount
+                    events["shield"].append([[support.x, support.y], [unit.x, unit.y], amount, support.type_index,
+                                             support.unit_id, unit.unit_id, support.player_index + 1])
+
+    def __move(self, events):
+        remaining = []
+        for unit in self.mobile_units:
+            unit.move_timer -= 1
+            if unit.move_timer > 0:
+                remaining.append(unit)
+                continue
+            unit.move_timer += 1 / unit.stats["speed"]
+            field = self.__field(unit.target_edge)
+            index = to_index([unit.x, unit.y])
+            step = field.next_step(index, unit.move_direction)
+            if step is None:
+                self.__self_destruct(unit, events)
+                continue
+            next_index, unit.move_direction = step
+            unit.x, unit.y = to_location(next_index)
+            unit.steps += 1
+            events["move"].append([to_location(index), [unit.x, unit.y], [0, 0], unit.type_index, unit.unit_id, unit.player_index + 1])
+            if next_index in EDGE_MEMBERSHIP[unit.target_edge]:
+                damage = unit.stats["breach_damage"]
+                events["breach"].append([[unit.x, unit.y], damage, unit.type_index, unit.unit_id, unit.player_index + 1])
+                self.result.breach_damage[unit.player_index] += damage
+                self.result.breaches.append([unit.x, unit.y, unit.player_index])
+                continue
+            remaining.append(unit)
+        self.mobile_units = remaining
+
+    def __self_destruct(self, unit, events):
+        """
+        A unit with nowhere left to go explodes, damaging nearby enemies if it travelled far enough.
+        """
+        stats = unit.stats
+        targets = []
+        damage = 0
+        if unit.steps >= stats["self_destruct_steps"]:
+            radius = stats["self_destruct_range"]
+            for other in list(self.structures.values()) + self.mobile_units:
+                if other.player_index == unit.player_index:
+                    continue
+                if math.sqrt((other.x - unit.x) ** 2 + (other.y - unit.y) ** 2) <= radius:
+                    damage = stats["self_destruct_damage_f"] if other.stationary else stats["self_destruct_damage_i"]
+                    other.health -= damage
+                    targets.append([other.x, other.y])
+        events["selfDestruct"].append([[unit.x, unit.y], targets, damage, unit.type_index, unit.unit_id, unit.player_index + 1])
+        events["death"].append([[unit.x, unit.y], unit.type_index, unit.unit_id, unit.player_index + 1, False])
+        self.result.mobile_units_lost[unit.player_index] += 1
+
+    def __attack(self, events):
+        occupancy = {}
+        for index, structure in self.structures.items():
+            occupancy[index] = [structure]
+        for unit in self.mobile_units:
+            occupancy.setdefault(unit.x * ARENA_SIZE + unit.y, []).append(unit)
+        attackers = self.mobile_units + [structure for structure in self.structures.values()
+                                         if structure.stats["damage_i"] + structure.stats["damage_f"] > 0]
+        for attacker in attackers:
+            target = self.find_target(attacker, occupancy)
+            if target is None:
+                continue
+            damage = attacker.stats["damage_f"] if target.stationary else attacker.stats["damage_i"]
+            target.health -= damage
+            events["attack"].append([[attacker.x, attacker.y], [target.x, target.y], damage, attacker.type_index,
+                                     attacker.unit_id, target.unit_id, attacker.player_index + 1])
+            events["damage"].append([[target.x, target.y], damage, target.type_index, target.unit_id, target.player_index + 1])
+
+    def find_target(self, attacker, occupancy):
+        """Gets the unit an attacker would attack
+
+        Same priorities as GameState.get_target: mobile units, then nearest, then lowest health,
+        then closest to the attacker's side, then furthest from the middle.
+
+        Args:
+            attacker: A SimulatedUnit
+            occupancy: A dict of flat index to the list of SimulatedUnits on that tile
+
+        Returns:
+            The SimulatedUnit to attack, or None
+
+        """
+        stats = attacker.stats
+        can_hit_structures = stats["damage_f"] > 0
+        can_hit_mobile = stats["damage_i"] > 0
+        best = None
+        best_key = None
+        for dx, dy, distance in _target_offsets(stats["attack_range"] + stats["hit_radius"]):
+            x, y = attacker.x + dx, attacker.y + dy
+            if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE):
+                continue
+            units = occupancy.get(x * ARENA_SIZE + y)
+            if not units:
+                continue
+            for unit in units:
+                if unit.player_index == attacker.player_index or unit.health <= 0:
+                    continue
+                if (unit.stationary and not can_hit_structures) or (not unit.stationary and not can_hit_mobile):
+                    continue
+                key = (unit.stationary, distance, unit.health, y if attacker.player_index == 0 else -y,
+                       -abs(HALF_ARENA - 0.5 - x))
+                if best_key is None or key < best_key:
+                    best = unit
+                    best_key = key
+        return best
+
+    def __remove_dead(self, events):
+        alive = []
+        for unit in self.mobile_units:
+            if unit.health > 0:
+                alive.append(unit)
+            else:
+                events["death"].append([[unit.x, unit.y], unit.type_index, unit.unit_id, unit.player_index + 1, False])
+                self.result.mobile_units_lost[unit.player_index] += 1
+        self.mobile_units = alive
+        for index in [index for index, structure in self.structures.items() if structure.health <= 0]:
+            structure = self.remove_structure(to_location(index))
+            events["death"].append([[structure.x, structure.y], structure.type_index, structure.unit_id, structure.player_index + 1, False])
+            self.result.structures_destroyed[structure.player_index] += 1
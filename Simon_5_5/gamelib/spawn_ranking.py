@@ -0,0 +1,113 @@
+"""
+Ranking of every tile we can spawn mobile units on.
+
+Each open tile of our two edges is scored in one pass: the path from it is
+walked on the distance field shared by every tile heading to the same edge, and
+the damage along it is read from the threat map of the enemy structures, which
+already uses the upgraded damage of upgraded turrets. Both are cached under the
+layout's zobrist hash, so ranking again for the same layout costs nothing.
+"""
+
+from .distance_field import (EDGE_INDICES, TOP_LEFT, TOP_RIGHT, BOTTOM_LEFT, BOTTOM_RIGHT,
+                             get_distance_field, to_index, to_location)
+from .placement import SpawnPath
+from .threat import get_threat_map
+from .unit import GameUnit
+
+
+# Our units spawned on these edges head to the paired enemy edge
+OUR_SPAWN_EDGES = [(BOTTOM_LEFT, TOP_RIGHT), (BOTTOM_RIGHT, TOP_LEFT)]
+
+
+def get_spawn_ranking(game_state, unit_type=None):
+    """Gets the spawn ranking for unit_type under the current layout of game_state
+
+    Rankings are cached in game_state.transposition_table under the layout's zobrist hash,
+    so the returned ranking is shared and must not be modified.
+
+    """
+    if unit_type is None:
+        unit_type = game_state.config["unitInformation"][3]["shorthand"]
+    key = (game_state.game_map.zobrist_hash, "spawn_ranking", unit_type)
+    ranking = game_state.transposition_table.get(key)
+    if ranking is None:
+        ranking = SpawnRanking(game_state, unit_type)
+        game_state.transposition_table.put(key, ranking)
+    return ranking
+
+
+class SpawnRanking:
+    """Every open tile of our edges, safest first
+
+    Attributes :
+        * unit_type (string): The mobile unit the paths are timed for
+        * speed (float): Its speed
+        * ranked (list): A SpawnPath for every open spawn tile. Paths that reach the enemy edge come first,
+          then less damage, fewer frames in range of enemy turrets and shorter paths
+
+    """
+    def __init__(self, game_state, unit_type=None):
+        config = game_state.config
+        if unit_type is None:
+            unit_type = config["unitInformation"][3]["shorthand"]
+        self.unit_type = unit_type
+        self.speed = GameUnit(unit_type, config).speed or 1
+        threat_map = get_threat_map(game_state, 0)
+        attackers = threat_map.attackers
+        damage_map = threat_map.damage
+        self.__by_index = {}
+        for spawn_edge, target_edge in OUR_SPAWN_EDGES:
+            field = get_distance_field(game_state, target_edge)
+            for start in EDGE_INDICES[spawn_edge]:
+                if field.blocked[start]:
+                    continue
+                path = field.path_indices(start)
+                covered = 0
+                damage = 0.0
+                for index in path:
+                    if attackers[index]:
+                        covered += 1
+                    damage += damage_map[index]
+                self.__by_index[start] = SpawnPath(to_location(start), path, field.reaches_edge(start),
+                                                   covered / self.speed, damage / self.speed)
+        self.ranked = sorted(self.__by_index.values(), key=self.sort_key)
+
+    @staticmethod
+    def sort_key(spawn_path):
+        """Safest spawns sort first"""
+        return (not spawn_path.reaches_edge, spawn_path.damage, spawn_path.frames_covered, len(spawn_path.path))
+
+    def get(self, location):
+        """The SpawnPath from location, or None if it is not an open tile of our edges"""
+        return self.__by_index.get(to_index(location))
+
+    def least_damage(self, locations=None):
+        """Gets the spawn location whose path takes the least damage
+
+        Args:
+            locations: The locations to choose from, every open spawn tile if None. Ties go to the earliest one
+
+        Returns:
+            The location, or None if none of them is an open spawn tile
+
+        """
+        if locations is None:
+            return self.ranked[0].spawn_location if self.ranked else None
+        best = None
+        for location in locations:
+            spawn_path = self.get(location)
+            if spawn_path is not None and (best is None or spawn_path.damage < best.damage):
+                best = spawn_path
+        return None if best is None else best.spawn_location
+
+    def table(self, count=None):
+        """The ranking as rows of [spawn location, breach location, reaches edge, damage, frames exposed, path]
+
+        Args:
+            count: The number of rows to return, all of them if None
+
+        """
+        rows = [[spawn_path.spawn_location, spawn_path.breach_location, spawn_path.reaches_edge, spawn_path.damage,
+                 spawn_path.frames_covered, [to_location(index) for index in spawn_path.path]]
+                for spawn_path in self.ranked]
+        return rows if count is None else rows[:count]
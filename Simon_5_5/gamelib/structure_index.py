@@ -0,0 +1,105 @@
+"""
+Structures grouped by owner, type, row and column.
+
+Counting the enemy structures in a few rows used to mean visiting all 420 tiles
+and every unit on them. GameMap keeps a StructureIndex next to its zobrist hash,
+toggling each structure in and out of it at the same points, so the index always
+matches the map. That includes structures we place with attempt_spawn during the
+turn. Counts by row or column are kept up to date as structures come and go, so
+most queries add up a handful of numbers instead of scanning the board.
+"""
+
+
+class StructureIndex:
+    """The structures on a GameMap, by owner, type, row and column
+
+    Attributes :
+        * counts (list): counts[player_index][type_index] is how many structures of that type the player has
+        * upgraded_counts (list): The same, counting only upgraded structures
+
+    """
+    def __init__(self, arena_size, type_count=3):
+        self.arena_size = arena_size
+        self.type_count = type_count
+        self.counts = [[0] * type_count for _ in range(2)]
+        self.upgraded_counts = [[0] * type_count for _ in range(2)]
+        self.__entries = {}
+        # Units by player and row
+        self.__rows = [[{} for _ in range(arena_size)] for _ in range(2)]
+        self.__row_counts = [[[0] * arena_size for _ in range(type_count)] for _ in range(2)]
+        self.__column_counts = [[[0] * arena_size for _ in range(type_count)] for _ in range(2)]
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def toggle(self, unit, type_index):
+        """Adds a structure to the index, or removes it if it is already there
+
+        Args:
+            unit: The structure
+            type_index: Its index in unitInformation
+
+        The entry remembers where the unit was and whether it was upgraded when it was added,
+        so removing it undoes exactly what adding it did.
+
+        """
+        entry = self.__entries.pop(unit, None)
+        if entry is None:
+            entry = (unit.player_index or 0, type_index, unit.x, unit.y, unit.upgraded)
+            self.__entries[unit] = entry
+            self.__rows[entry[0]][entry[3]][unit] = entry
+            change = 1
+        else:
+            del self.__rows[entry[0]][entry[3]][unit]
+            change = -1
+        player_index, type_index, x, y, upgraded = entry
+        self.counts[player_index][type_index] += change
+        if upgraded:
+            self.upgraded_counts[player_index][type_index] += change
+        self.__row_counts[player_index][type_index][y] += change
+        self.__column_counts[player_index][type_index][x] += change
+
+    def __types(self, type_index):
+        return range(self.type_count) if type_index is None else [type_index]
+
+    def __lines(self, values):
+        return [value for value in set(values) if 0 <= value < self.arena_size]
+
+    def count(self, player_index, type_index=None, xs=None, ys=None):
+        """Counts a player's structures
+
+        Args:
+            player_index: 0 for us, 1 for the enemy
+            type_index: Only count this structure type, None for all of them
+            xs: Only count structures in these columns, None for all of them
+            ys: Only count structures in these rows, None for all of them
+
+        Returns:
+            The number of matching structures
+
+        """
+        types = self.__types(type_index)
+        if xs is None and ys is None:
+            return sum(self.counts[player_index][index] for index in types)
+        if xs is None:
+            return sum(self.__row_counts[player_index][index][y] for index in types for y in self.__lines(ys))
+        if ys is None:
+            return sum(self.__column_counts[player_index][index][x] for index in types for x in self.__lines(xs))
+        return len(self.units(player_index, type_index, xs, ys))
+
+    def units(self, player_index, type_index=None, xs=None, ys=None):
+        """Gets a player's structures, taking the same filters as count
+
+        Returns:
+            The matching units, in the order GameMap iterates the board: row by row, left to right
+
+        """
+        rows = range(self.arena_size) if ys is None else sorted(self.__lines(ys))
+        columns = None if xs is None else set(xs)
+        matching = []
+        for y in rows:
+            row = [(entry[2], unit) for unit, entry in self.__rows[player_index][y].items()
+                   if (type_index is None or entry[1] == type_index) and (columns is None or entry[2] in columns)]
+            row.sort(key=lambda item: item[0])
+            matching.extend(unit for _, unit in row)
+        return matching
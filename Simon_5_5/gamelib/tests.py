@@ -1,7 +1,31 @@
 import unittest
+import unittest.mock
 import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
 from .game_state import GameState
 from .unit import GameUnit
+from .transposition import TranspositionTable, default_transposition_table
+from .distance_field import DistanceField
+from .placement import PlacementEngine, get_placement_engine
+from .chokepoints import ChokepointAnalysis
+from .forecast import AttackForecast
+from .simulator import ActionPhaseSimulator
+from .replay import ReplayRecorder, read_replay, ENGINE_TO_ALGO, ALGO_TO_ENGINE
+from .precompute import PrecomputeCache, layout_hash
+from .spawn_ranking import SpawnRanking, get_spawn_ranking
+from .waves import WaveEstimator
+from .firing_positions import FiringPositionOptimizer
+from .upgrade_priority import UpgradePrioritizer
+from .build_plan import BuildPlan
+from .health_forecast import StructureHealthForecast
+from .frame_events import FrameEventAggregator
+from .opening_book import OpeningBook, BookResponse, fingerprint
+from .attack_planner import AttackPlanner
+from .threat import get_threat_map
 
 class BasicTests(unittest.TestCase):
 
@@ -275,3 +299,599 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_zobrist_hash(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(0, game.game_map.zobrist_hash, "An empty board should hash to 0")
+        game.game_map.add_unit("FF", [13,13], 0)
+        one_wall = game.game_map.zobrist_hash
+        game.game_map.add_unit("DF", [14,13], 1)
+        both = game.game_map.zobrist_hash
+        game.game_map.add_unit("EI", [14,13], 1)
+        self.assertEqual(both, game.game_map.zobrist_hash, "Mobile units should not change the hash")
+        game.game_map.upgrade_unit([14,13])
+        self.assertNotEqual(both, game.game_map.zobrist_hash, "Upgrading should change the hash")
+        game.game_map.remove_unit([14,13])
+        self.assertEqual(one_wall, game.game_map.zobrist_hash, "Removing a unit should undo its hash")
+
+        other = self.make_turn_0_map()
+        other.game_map.add_unit("FF", [13,13], 0)
+        self.assertEqual(one_wall, other.game_map.zobrist_hash, "The same board should always hash the same")
+
+    def test_transposition_table(self):
+        table = TranspositionTable(capacity=2)
+        table.put("a", 1)
+        table.put("b", 2)
+        self.assertEqual(1, table.get("a"))
+        table.put("c", 3)
+        self.assertFalse("b" in table, "The least recently used entry should be evicted")
+        self.assertEqual(3, table.lookup("c", lambda: 0))
+        self.assertEqual(4, table.lookup("d", lambda: 4))
+        self.assertEqual(2, table.evictions, "The table should never hold more than its capacity")
+        self.assertAlmostEqual(2 / 3, table.hit_rate())
+
+        game = self.make_turn_0_map()
+        self.assertIs(default_transposition_table(), game.transposition_table)
+        game.transposition_table.put("a", 1)
+        self.assertTrue("a" in default_transposition_table(json.loads(json.dumps(game.config))), "A copy of the same config keeps the table")
+        other_config = json.loads(json.dumps(game.config))
+        other_config["unitInformation"][2]["cost1"] += 1
+        self.assertFalse("a" in default_transposition_table(other_config), "Another config clears the table")
+
+    def test_cached_path(self):
+        game = self.make_turn_0_map()
+        first = game.find_path_to_edge([13, 0])
+        expected = [list(location) for location in first]
+        first[0][0] = 99
+        first.append([0, 0])
+        self.assertEqual(expected, game.find_path_to_edge([13, 0]), "Cached paths should not be shared with callers")
+        game.attempt_spawn("FF", [[13, 1]])
+        self.assertNotEqual([13, 1], game.find_path_to_edge([13, 0])[1], "Paths should update after a structure is placed")
+
+    def test_distance_field_paths(self):
+        game = self.make_turn_0_map()
+        for x in range(4, 24):
+            game.game_map.add_unit("FF", [x, 12], 0)
+        mask = game.game_map.get_blocked_mask()
+        for start in [[13, 0], [3, 10], [24, 10], [13, 27], [20, 20]]:
+            field = DistanceField(mask, game.get_target_edge(start))
+            self.assertEqual(game.find_path_to_edge(start), field.path_from(start), "Distance field path from {} differs".format(start))
+
+        # Seal the bottom half so units have to self destruct
+        for x in [1, 2, 3, 24, 25, 26]:
+            game.game_map.add_unit("FF", [x, 12], 0)
+        for x in [0, 27]:
+            game.game_map.add_unit("FF", [x, 13], 0)
+        mask = game.game_map.get_blocked_mask()
+        field = DistanceField(mask, game.get_target_edge([13, 0]))
+        self.assertEqual(game.find_path_to_edge([13, 0]), field.path_from([13, 0]), "Self destruct paths differ")
+
+    def test_distance_field_incremental(self):
+        game = self.make_turn_0_map()
+        field = DistanceField(game.game_map.get_blocked_mask(), game.game_map.TOP_RIGHT)
+        for location in [[13, 12], [14, 12], [12, 12], [14, 13], [13, 13]]:
+            field.block(location)
+            self.assertEqual(DistanceField(field.blocked, field.target_edge).distances, field.distances, "Blocking {} left a stale field".format(location))
+        for location in [[14, 12], [13, 13]]:
+            field.unblock(location)
+            self.assertEqual(DistanceField(field.blocked, field.target_edge).distances, field.distances, "Unblocking {} left a stale field".format(location))
+
+    def test_placement_engine(self):
+        game = self.make_turn_0_map()
+        for x in range(0, 28):
+            if x != 13:
+                game.game_map.add_unit("FF", [x, 13], 0)
+        engine = PlacementEngine(game)
+        effects = engine.rank("FF", [[3, 10], [13, 13], [5, 10]])
+        self.assertEqual([13, 13], effects[0].location, "Plugging the only gap should rank first")
+        self.assertEqual(len(engine.baseline), effects[0].breaches_prevented, "Plugging the only gap should stop every breach")
+        self.assertEqual(0, effects[-1].path_length_delta, "A wall off every path should not change them")
+        self.assertEqual(None, engine.evaluate("FF", [13, 20]), "Structures cannot be placed in enemy territory")
+
+        for effect in engine.rank("DF", [[13, 11], [14, 10], [3, 10]]):
+            for spawn_path in effect.paths:
+                game.game_map.add_unit("DF", effect.location, 0)
+                expected = game.find_path_to_edge(spawn_path.spawn_location)
+                game.game_map.remove_unit(effect.location)
+                self.assertEqual(expected[-1], spawn_path.breach_location, "Breach location is wrong")
+
+    def test_articulation_cells(self):
+        game = self.make_turn_0_map()
+        self.assertEqual([], ChokepointAnalysis(game).articulation_cells(), "An empty board has no choke points")
+        for x in range(0, 28):
+            if x != 13:
+                game.game_map.add_unit("FF", [x, 13], 0)
+        for y in range(14, 20):
+            game.game_map.add_unit("FF", [12, y], 1)
+            game.game_map.add_unit("FF", [14, y], 1)
+        analysis = ChokepointAnalysis(game)
+        self.assertTrue([13, 13] in analysis.articulation_cells(), "The only gap should be a choke point")
+        for location in analysis.articulation_cells():
+            self.assertFalse(analysis.is_connected([location]), "{} does not cut every route".format(location))
+
+    def test_min_cut(self):
+        game = self.make_turn_0_map()
+        for x in range(3, 25):
+            game.game_map.add_unit("FF", [x, 10], 0)
+        analysis = ChokepointAnalysis(game)
+        cut = analysis.min_cut()
+        self.assertEqual(6, cut.size, "The gaps beside the wall should be the cheapest cut")
+        region = [[13, 5]]
+        cut = analysis.min_cut(region=region)
+        for cells in [cut.source_side, cut.sink_side]:
+            self.assertEqual(cut.size, len(cells))
+            self.assertFalse(analysis.is_connected(cells + region), "Routes avoiding the region were not cut")
+            for location in cells:
+                self.assertTrue(location[1] < game.HALF_ARENA, "Cuts should only use cells we can build on")
+
+    def test_path_guard(self):
+        game = self.make_turn_0_map()
+        self.assertEqual([game.game_map.BOTTOM_LEFT, game.game_map.BOTTOM_RIGHT], game.get_open_attack_lanes())
+        # A wall across the middle with gaps at [13, 13] and [14, 13]
+        for x in range(0, 28):
+            if x not in [13, 14]:
+                game.game_map.add_unit("FF", [x, 13], 0)
+        self.assertEqual(2, len(game.get_open_attack_lanes()), "The gaps should keep both lanes open")
+        self.assertFalse(game.would_block_paths([13, 13]), "One gap is still left")
+        game.attempt_spawn("FF", [13, 13])
+        self.assertTrue(game.would_block_paths([14, 13]), "Filling the last gap blocks every path")
+        self.assertFalse(game.would_block_paths([13, 9]), "A tile off the wall does not block anything")
+
+        game.enable_path_guard(True)
+        self.assertFalse(game.can_spawn("FF", [14, 13]), "The guard should refuse to close the last gap")
+        self.assertEqual(0, game.attempt_spawn("FF", [14, 13]))
+        game.enable_path_guard(False)
+        self.assertEqual(1, game.attempt_spawn("FF", [14, 13]))
+        self.assertEqual([], game.get_open_attack_lanes(), "Every lane should now be closed")
+
+    def test_attack_forecast(self):
+        game = self.make_turn_0_map()
+        forecast = AttackForecast(game)
+        self.assertEqual(5, forecast.spawns[0].units, "The enemy can afford 5 pings with 5 MP")
+        self.assertEqual(28, len(forecast.spawns), "Every enemy edge tile should be forecast")
+        self.assertEqual(5, forecast.worst_spawn().survivors, "Nothing defends an empty board")
+        breach = forecast.worst_spawn().breach_location
+        self.assertEqual(5, forecast.risk_at(breach))
+
+        for x in range(14, 28):
+            game.game_map.add_unit("DF", [x, x - 14], 0)
+        defended = AttackForecast(game)
+        for location, risk in defended.riskiest_breaches():
+            self.assertTrue(risk <= 5)
+        self.assertTrue(sum(defended.breach_risk) < sum(forecast.breach_risk), "Turrets should lower the breach risk")
+        self.assertEqual(game.project_future_MP(1, player_index=1), AttackForecast(game, turns_in_future=1).enemy_MP)
+
+    def test_simulator_breach(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("PI", [13, 0], 5)
+        simulator = ActionPhaseSimulator.from_game_state(game)
+        frames = []
+        result = simulator.run(on_frame=lambda frame, events: frames.append(events))
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual(5, len(frames[0]["spawn"]), "Units should spawn on the first frame")
+        self.assertEqual(len(path), result.frames, "Pings move one tile a frame after spawning")
+        self.assertEqual([5.0, 0.0], result.breach_damage)
+        self.assertEqual(path[-1], result.breaches[0][:2], "Units should breach where find_path_to_edge ends")
+
+    def test_simulator_combat(self):
+        game = self.make_turn_0_map()
+        simulator = ActionPhaseSimulator(game.config)
+        simulator.add_structure("DF", [24, 15], 1)
+        simulator.add_structure("DF", [23, 14], 1)
+        simulator.spawn("PI", [13, 0], 0, 5)
+        result = simulator.run()
+        self.assertEqual(1, result.mobile_units_lost[0], "Turrets on the path should kill a ping")
+        self.assertEqual(4.0, result.breach_damage[0])
+        self.assertTrue(simulator.structure_at([23, 14]).health < 90, "Pings should fire back at the turrets")
+
+        # A wall across the top half leaves nowhere to breach, so pings self destruct against it
+        simulator = ActionPhaseSimulator(game.config)
+        for x in range(28):
+            if game.game_map.in_arena_bounds([x, 14]):
+                simulator.add_structure("FF", [x, 14], 1)
+        simulator.spawn("PI", [13, 0], 0, 3)
+        result = simulator.run()
+        self.assertEqual([0.0, 0.0], result.breach_damage)
+        self.assertEqual(3, result.mobile_units_lost[0])
+        self.assertTrue(simulator.structure_at([27, 14]).health < 75, "Self destructs should damage the wall")
+
+    def test_replay_recorder(self):
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = ReplayRecorder.in_directory(directory)
+            recorder.record(ENGINE_TO_ALGO, '{"turnInfo": [0, 0, -1]}\n')
+            recorder.record(ALGO_TO_ENGINE, '[["FF", 0, 13]]')
+            recorder.close()
+            recorder.record(ALGO_TO_ENGINE, "[]")
+            records = list(read_replay(recorder.path))
+            self.assertEqual(2, len(records), "Nothing should be recorded after closing")
+            self.assertEqual((ENGINE_TO_ALGO, '{"turnInfo": [0, 0, -1]}'), (records[0][0], records[0][2]))
+            self.assertEqual((ALGO_TO_ENGINE, '[["FF", 0, 13]]'), (records[1][0], records[1][2]))
+            self.assertTrue(records[0][1] <= records[1][1], "Records should be in order")
+            self.assertEqual(1, len(os.listdir(directory)))
+
+    def test_precompute_cache(self):
+        game = self.make_turn_0_map()
+        with tempfile.TemporaryDirectory() as directory:
+            opening = [("FF", [13, 12], 0, False), ("DF", [14, 12], 0, True)]
+            cache = PrecomputeCache(game.config, directory)
+            cache.load_or_build(layouts=[("opening", opening)])
+            self.assertFalse(cache.hit)
+            self.assertTrue(os.path.exists(cache.path), "The tables should be saved")
+            loaded = PrecomputeCache(game.config, directory)
+            loaded.load_or_build(layouts=[("opening", opening)])
+            self.assertTrue(loaded.hit, "The second game should load the saved tables")
+            rebuilt = PrecomputeCache(game.config, directory)
+            rebuilt.load_or_build(layouts=[("opening", opening[:1])])
+            self.assertFalse(rebuilt.hit, "A different layout should rebuild the tables")
+            for broken in ['{"version": 1}', '{"version": 1, "stencils": [], "layouts": {"empty": {"hash": "x"}}}', "not json"]:
+                with open(cache.path, "w") as cache_file:
+                    cache_file.write(broken)
+                damaged = PrecomputeCache(game.config, directory)
+                damaged.load_or_build(layouts=[("opening", opening)])
+                self.assertFalse(damaged.hit, "A cache file with the wrong shape should be rebuilt")
+            again = PrecomputeCache(game.config, directory)
+            again.load_or_build(layouts=[("opening", opening)])
+            self.assertTrue(again.hit, "The rebuilt tables should be saved over the damaged file")
+
+            expected = game.find_path_to_edge([13, 0])
+            table = TranspositionTable()
+            loaded.install(table)
+            game.transposition_table = table
+            self.assertEqual(expected, game.find_path_to_edge([13, 0]))
+            self.assertEqual(1, table.hits, "The empty board path should come from the cache")
+
+            game.game_map.add_unit("FF", [13, 12], 0)
+            game.game_map.add_unit("DF", [14, 12], 0)
+            game.game_map.upgrade_unit([14, 12])
+            self.assertEqual(layout_hash(game.config, opening), game.game_map.zobrist_hash)
+            game.find_path_to_edge([14, 27])
+            self.assertEqual(2, table.hits, "The opening path should come from the cache")
+
+    def test_lazy_imports(self):
+        script = ("import sys, gamelib; gamelib.GameState; gamelib.debug_write; "
+                  "print(sorted(name for name in ['threading', 'gamelib.replay', 'gamelib.simulator', 'gamelib.placement'] if name in sys.modules))")
+        algo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", script], cwd=algo_dir, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        self.assertEqual("[]", output.strip(), "Importing gamelib should not load modules the game has not used")
+        import gamelib
+        self.assertIs(ActionPhaseSimulator, gamelib.simulator.ActionPhaseSimulator)
+        self.assertIs(PrecomputeCache, gamelib.PrecomputeCache)
+        with self.assertRaises(AttributeError):
+            gamelib.NotAName
+
+    def test_replay_bench_percentile(self):
+        scripts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "scripts")
+        if not os.path.exists(os.path.join(scripts_dir, "replay_bench.py")):
+            self.skipTest("The scripts folder is not shipped with the algo")
+        if scripts_dir not in sys.path:
+            sys.path.insert(0, scripts_dir)
+        from replay_bench import percentile
+        values = list(range(1, 101))
+        self.assertEqual([1, 50, 93, 95, 99, 100], [percentile(values, fraction) for fraction in (0.0, 0.5, 0.93, 0.95, 0.99, 1.0)])
+        self.assertEqual([1, 5, 10], [percentile(list(range(1, 11)), fraction) for fraction in (0.05, 0.5, 0.95)])
+        self.assertEqual(7, percentile(values, 0.07), "0.07 * 100 is not quite 7 in floating point")
+        self.assertTrue(math.isnan(percentile([], 0.5)))
+
+    def test_module_docstrings(self):
+        import importlib
+        for name in ["transposition", "distance_field", "threat", "placement", "chokepoints", "forecast", "simulator",
+                     "replay", "precompute", "structure_index", "spawn_ranking", "waves", "firing_positions",
+                     "upgrade_priority", "build_plan", "health_forecast", "frame_events", "opening_book", "attack_planner"]:
+            module = importlib.import_module("." + name, __package__)
+            self.assertTrue(module.__doc__, "gamelib.{} should open with its docstring so the docs show it".format(name))
+
+    def test_structure_index(self):
+        game = self.make_turn_0_map()
+        game.suppress_warnings(True)
+        game.game_map.add_unit("FF", [13, 17], 1)
+        game.game_map.add_unit("DF", [14, 18], 1)
+        game.game_map.add_unit("DF", [10, 18], 1)
+        game.game_map.add_unit("EF", [20, 20], 1)
+        game.game_map.add_unit("FF", [13, 10], 0)
+        game.game_map.upgrade_unit([14, 18])
+        game.game_map.add_unit("FF", [10, 18], 1)
+        game.game_map.remove_unit([20, 20])
+        game._player_resources[0]["SP"] = 10
+        game.attempt_spawn("DF", [[12, 12]])
+
+        def scan(player_index, unit_type=None, valid_x=None, valid_y=None):
+            total = 0
+            for location in game.game_map:
+                for unit in game.game_map[location]:
+                    if unit.stationary and unit.player_index == player_index and (unit_type is None or unit.unit_type == unit_type) and \
+                            (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
+                        total += 1
+            return total
+        for query in [(1,), (0,), (1, "DF"), (1, None, None, [17, 18]), (1, "FF", None, [18, 18]), (1, None, [13, 14]),
+                      (1, "DF", [14], [18]), (0, "DF", None, [12]), (1, "EF"), (1, "PI")]:
+            self.assertEqual(scan(*query), game.count_structures(*query), "Counts differ for {}".format(query))
+        self.assertEqual(1, game.game_map.structures.upgraded_counts[1][2])
+        self.assertEqual([[13, 17], [10, 18], [14, 18]], [[unit.x, unit.y] for unit in game.get_structures(1)], "Structures should come in board order")
+
+    def test_spawn_ranking(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [6, 15], 1)
+        game.game_map.add_unit("DF", [21, 15], 1)
+        game.game_map.upgrade_unit([21, 15])
+        game.game_map.add_unit("FF", [5, 8], 0)
+        ranking = get_spawn_ranking(game, "PI")
+        self.assertIs(ranking, get_spawn_ranking(game, "PI"), "The ranking should be cached for the layout")
+        self.assertEqual(27, len(ranking.ranked), "Every open tile of our edges should be ranked")
+        for location in [[13, 0], [14, 0], [8, 5], [19, 5], [0, 13]]:
+            spawn_path = ranking.get(location)
+            path = game.find_path_to_edge(location)
+            expected = 0
+            for path_location in path:
+                expected += sum(unit.damage_i for unit in game.get_attackers(path_location, 0))
+            self.assertEqual(path, [[index // 28, index % 28] for index in spawn_path.path])
+            self.assertAlmostEqual(expected / ranking.speed, spawn_path.damage)
+        self.assertIsNone(ranking.get([5, 8]), "Blocked tiles cannot be spawned on")
+        keys = [SpawnRanking.sort_key(spawn_path) for spawn_path in ranking.ranked]
+        self.assertEqual(sorted(keys), keys)
+        self.assertEqual(ranking.ranked[0].spawn_location, ranking.least_damage())
+        self.assertIsNone(ranking.least_damage([[5, 8]]))
+
+    def test_wave_estimator(self):
+        game = self.make_turn_0_map()
+        game.config["unitInformation"][1].update({"shieldRange": 3.0, "shieldPerUnit": 4.0, "shieldBonusPerY": 0.5})
+        game.game_map.add_unit("DF", [25, 15], 1)
+        game.game_map.add_unit("DF", [23, 15], 1)
+        game.game_map.upgrade_unit([23, 15])
+        profile = WaveEstimator(game).profile([13, 0], "PI")
+        self.assertEqual([27, 14], profile.breach_location)
+        damage = sum(get_threat_map(game, 0).damage[index] for index in profile.path)
+        self.assertEqual(int(damage // 15), profile.kills, "Focused damage should kill whole scouts in turn")
+        self.assertEqual([0, 0, 6], [row[0] for row in profile.evaluate([1, profile.kills, profile.kills + 6])])
+        self.assertEqual(6, profile.damage_to_health(profile.kills + 6))
+
+        game.game_map.add_unit("EF", [17, 2], 0)
+        shielded = WaveEstimator(game).profile([13, 0], "PI")
+        self.assertEqual(profile.path, shielded.path)
+        self.assertEqual(15 + 4 + 0.5 * 2, shielded.health, "Scouts should pick up the support's shield")
+        self.assertEqual(int(damage // shielded.health), shielded.kills)
+        self.assertGreater(shielded.damage_to_structures(10), 0)
+        self.assertIsNone(WaveEstimator(game).profile([17, 2], "PI"), "Blocked tiles cannot be spawned on")
+
+    def test_firing_positions(self):
+        game = self.make_turn_0_map()
+        self.assertIsNone(FiringPositionOptimizer(game, "EI", 3).best(), "Nothing to hit without enemy structures")
+
+        game.game_map.add_unit("DF", [25, 15], 1)
+        game.game_map.add_unit("DF", [23, 15], 1)
+        game.game_map.add_unit("FF", [20, 14], 1)
+        optimizer = FiringPositionOptimizer(game, "EI", 3)
+        keys = [(-position.damage_per_MP, -position.damage) for position in optimizer.ranked]
+        self.assertEqual(sorted(keys), keys)
+        best = optimizer.best()
+        self.assertIsNotNone(best)
+        total_health = sum(unit.health for unit in game.get_structures(1))
+        self.assertLessEqual(best.damage, total_health)
+        self.assertEqual(best.damage / best.MP, best.damage_per_MP)
+        for location in best.destroyed:
+            self.assertIn(tuple(location), best.exposure)
+        position = optimizer.position([13, 0])
+        self.assertIn((25, 15), position.exposure, "The path from [13, 0] passes the turret at [25, 15]")
+        self.assertIsNone(optimizer.position([17, 2]))
+
+    def test_upgrade_priority(self):
+        import itertools
+        game = self.make_turn_0_map()
+        for unit_type, location in [("DF", [12, 10]), ("DF", [16, 10]), ("FF", [13, 12]), ("FF", [0, 13]), ("FF", [5, 5])]:
+            game.game_map.add_unit(unit_type, location, 0)
+        game.game_map.add_unit("FF", [14, 12], 0)
+        game.game_map.upgrade_unit([14, 12])
+        prioritizer = UpgradePrioritizer(game)
+        self.assertEqual(5, len(prioritizer.options), "Upgraded structures cannot be upgraded again")
+        turret = [option for option in prioritizer.options if option.location == [12, 10]][0]
+        self.assertEqual(game.type_cost("DF", True)[game.SP], turret.cost)
+        self.assertGreater(turret.coverage_gain, 0)
+        self.assertIs(get_placement_engine(game), get_placement_engine(game), "The engine is cached for the layout")
+        fresh = UpgradePrioritizer(game, engine=PlacementEngine(game))
+        self.assertEqual([option.value for option in prioritizer.options], [option.value for option in fresh.options])
+
+        for SP in [0, 3, 5, 9]:
+            selected = prioritizer.select(SP)
+            self.assertLessEqual(sum(option.cost for option in selected), SP)
+            best = max(sum(option.value for option in subset)
+                       for count in range(len(prioritizer.options) + 1)
+                       for subset in itertools.combinations(prioritizer.options, count)
+                       if sum(option.cost for option in subset) <= SP)
+            self.assertAlmostEqual(best, sum(option.value for option in selected))
+
+        walls = UpgradePrioritizer(game, [[13, 12], [0, 13]])
+        self.assertEqual([[0, 13], [13, 12]], sorted(option.location for option in walls.options))
+        SP = game.get_resource(game.SP)
+        self.assertEqual(2, walls.attempt())
+        self.assertEqual(SP - 2 * game.type_cost("FF", True)[game.SP], game.get_resource(game.SP))
+
+    def test_build_plan(self):
+        game = self.make_turn_0_map()
+        game.suppress_warnings(True)
+        plan = BuildPlan(game.config)
+        plan.spawn("FF", [[0, 13], [1, 13], [27, 13]]).spawn("DF", [5, 8]).upgrade("DF", [5, 8])
+        plan.spawn("FF", [[13, 20], [0, 0]]).spawn("PI", [13, 0])
+        plan.spawn("FF", [6, 8])
+        steps = plan.compile()
+        self.assertEqual(6, len(steps), "Enemy territory, out of bounds and mobile units are dropped")
+        self.assertEqual([1, 2, 3, 5, 9, 10], [step.cumulative_cost for step in steps])
+        self.assertEqual(10, plan.total_cost)
+
+        game.game_map.add_unit("FF", [0, 13], 0)
+        game._player_resources[0]["SP"] = 7
+        self.assertEqual(3, game.attempt_build_plan(plan), "The wall at [0, 13] is already built")
+        self.assertEqual([("FF", 1, 13), ("FF", 27, 13), ("DF", 5, 8)], game._build_stack)
+        self.assertEqual(3, game.get_resource(game.SP), "The plan stops at the upgrade it cannot afford")
+        self.assertFalse(game.contains_stationary_unit([6, 8]), "Later steps do not use SP an earlier one was waiting for")
+
+        game._player_resources[0]["SP"] = 5
+        self.assertEqual(2, game.attempt_build_plan(plan))
+        self.assertTrue(game.game_map[5, 8][0].upgraded)
+        self.assertEqual([("UP", 5, 8), ("FF", 6, 8)], game._build_stack[-2:])
+        self.assertEqual(0, game.attempt_build_plan(plan), "Everything is built")
+
+    def test_strategy_upgrades(self):
+        algo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if algo_dir not in sys.path:
+            sys.path.insert(0, algo_dir)
+        from algo_strategy import AlgoStrategy
+        config = self.make_turn_0_map().config
+        with tempfile.TemporaryDirectory() as directory:
+            environment = dict(os.environ, ALGO_CACHE_DIR=directory, ALGO_OPENING_BOOK=os.path.join(directory, "book.json"))
+            with unittest.mock.patch.dict(os.environ, environment):
+                strategy = AlgoStrategy()
+                strategy.on_game_start(config)
+        plan, locations = strategy.defence_plan, strategy.defence_upgrade_locations
+
+        def turn(SP):
+            game = self.make_turn_0_map()
+            game.suppress_warnings(True)
+            game.enable_path_guard(True)
+            game._player_resources[0]["SP"] = SP
+            return game
+
+        def upgraded(game):
+            return [[x, y] for action, x, y in game._build_stack if action == "UP" and [x, y] in locations]
+
+        game = turn(plan.total_cost - 1)
+        strategy.build_defences(game)
+        self.assertFalse(game.build_plan_finished(plan))
+        self.assertEqual([], upgraded(game), "SP the plan is waiting for is not spent on optional upgrades")
+
+        expected = turn(plan.total_cost + 10)
+        expected.attempt_build_plan(plan)
+        self.assertTrue(expected.build_plan_finished(plan))
+        chosen = [option.location for option in UpgradePrioritizer(expected, locations).select()]
+        self.assertTrue(chosen, "The SP left should afford an upgrade")
+        game = turn(plan.total_cost + 10)
+        strategy.build_defences(game)
+        self.assertEqual(sorted(chosen), sorted(upgraded(game)), "The SP left goes to the upgrades the prioritizer picks")
+
+    def test_health_forecast(self):
+        game = self.make_turn_0_map()
+        forecast = StructureHealthForecast(game.config)
+        frames = [{"damage": [[[0, 13], 25.0, 0, "1", 1], [[0, 13], 9.0, 0, "2", 2], [[3, 10], 2.0, 3, "3", 1]], "death": []},
+                  {"damage": [[[0, 13], 15.0, 0, "1", 1]],
+                   "death": [[[5, 10], 0, "4", 1, True], [[3, 10], 3, "3", 1, False]]}]
+        for events in frames:
+            forecast.observe_frame({"turnInfo": [1, 1, 0], "events": events})
+        self.assertEqual(1, len(forecast), "Only our structures are tracked, and removals are not deaths")
+        self.assertEqual(0, forecast.history([0, 13], 1).deaths)
+        self.assertEqual(0, forecast.expected_damage([0, 13], 1), "The phase in progress is not folded in yet")
+        self.assertEqual(20, forecast.expected_damage([0, 13], 2))
+        self.assertEqual(40, forecast.expected_damage([0, 13], 2, pessimistic=True))
+        self.assertEqual(0, forecast.expected_damage([5, 10], 2))
+
+        game.game_map.add_unit("FF", [0, 13], 0)
+        game.game_map.add_unit("FF", [27, 13], 0)
+        game.turn_number = 2
+        wall = game.game_map[0, 13][0]
+        wall.health = 30
+        self.assertEqual(10, forecast.predicted_health(wall, 2))
+        self.assertEqual([], forecast.at_risk(game))
+        self.assertEqual([[0, 13]], forecast.at_risk(game, pessimistic=True))
+
+        forecast.observe(4, {"damage": [[[0, 13], 8.0, 0, "5", 1]]})
+        self.assertEqual(20 * 0.25, forecast.expected_damage([0, 13], 4), "Quiet turns decay the rate")
+        self.assertEqual(0.5 * 20 * 0.25 + 0.5 * 8, forecast.expected_damage([0, 13], 5))
+        forecast.observe(5, {"death": [[[0, 13], 0, "1", 1, False]]})
+        self.assertEqual(1, forecast.history([0, 13], 6).deaths)
+        self.assertEqual(0, forecast.expected_damage([0, 13], 6, pessimistic=True), "A destroyed structure's history is dropped")
+
+        forecast.observe(4, {"damage": [[[3, 12], 6.0, 0, "6", 1]]})
+        self.assertEqual(3, forecast.expected_damage([3, 12], 5))
+        self.assertEqual(0, forecast.expected_damage([3, 12], 21, pessimistic=True), "Old damage decays to nothing")
+        forecast.observe(22, {"damage": [[[27, 13], 6.0, 0, "7", 1]]})
+        forecast.observe(23, {"spawn": [[[27, 13], 0, "8", 1]]})
+        self.assertEqual(0, forecast.expected_damage([27, 13], 24), "A rebuilt structure starts over")
+
+    def test_frame_events(self):
+        game = self.make_turn_0_map()
+        simulator = ActionPhaseSimulator(game.config)
+        simulator.add_structure("EF", [13, 20], 1)
+        simulator.spawn("PI", [13, 27], 1, 4)
+        aggregator = FrameEventAggregator(window=3, decay=0.5)
+        result = simulator.run(on_frame=lambda frame, events: aggregator.observe(1, events))
+        breach = result.breaches[0][:2]
+        self.assertEqual(4, aggregator.total("breach", 1))
+        self.assertEqual(4, aggregator.total("spawn", 1, valid_x=[13], valid_y=[27]))
+        self.assertEqual(0, aggregator.total("breach", 0))
+        self.assertEqual([breach], aggregator.locations("breach", 1))
+        self.assertEqual(4, aggregator.total("breach", 1, valid_x=[breach[0]], valid_y=range(breach[1], 28), turns=5))
+
+        aggregator.observe(2, {"breach": [[[1, 12], 1, 3, "9", 2]], "death": [[[5, 5], 0, "8", 1, True]]})
+        self.assertEqual(0, aggregator.total("death", 0), "Removals are not deaths")
+        self.assertEqual(1, aggregator.total("breach", 1, turns=1))
+        self.assertEqual(4 * 0.5 + 1, aggregator.total("breach", 1), "Whole-game totals decay each turn")
+        self.assertEqual(2.5, aggregator.frequency("breach", 1, turns=2))
+        self.assertEqual(1, aggregator.total("breach", 1, valid_x=range(14), valid_y=range(11, 28)))
+
+        aggregator.observe(4, {"breach": [[[26, 12], 1, 3, "10", 2]]})
+        self.assertEqual(2, aggregator.total("breach", 1, turns=5), "Only the last window turns are kept")
+        aggregator.observe(3, {"breach": [[[26, 12], 1, 3, "11", 2]]})
+        self.assertEqual(1, aggregator.total("breach", 1, turns=1), "Frames of older turns are ignored")
+
+    def test_opening_book(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13, 20], 1)
+        game.game_map.add_unit("DF", [10, 15], 1)
+        enemy = fingerprint(game)
+        self.assertEqual(game.game_map.zobrist_hash, game.game_map.player_hashes[0] ^ game.game_map.player_hashes[1])
+        game.game_map.add_unit("DF", [3, 12], 0)
+        self.assertEqual(enemy, fingerprint(game), "Our own structures do not change the enemy's fingerprint")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.json")
+            self.assertEqual(0, len(OpeningBook(game.config, path).load()), "A missing book is empty")
+            book = OpeningBook(game.config, path)
+            book.add(game.turn_number, enemy, BookResponse(["PI", [13, 0], 5], [["DF", [4, 12]]], 3.0))
+            kept = book.add(game.turn_number, enemy, BookResponse(["EI", [14, 0], 1], [], 1.0))
+            self.assertEqual(["PI", [13, 0], 5], kept.spawn, "The better scored response is kept")
+            self.assertEqual(2, kept.games)
+            book.save()
+
+            loaded = OpeningBook(game.config, path).load()
+            response = loaded.lookup(game)
+            self.assertEqual([13, 0], response.spawn_location("PI"))
+            self.assertIsNone(response.spawn_location("EI"))
+            self.assertEqual(1, response.build(game))
+            self.assertTrue(game.contains_stationary_unit([4, 12]))
+            self.assertEqual(0, BookResponse(None, hold=True).deploy(game), "An answer that holds sends nothing")
+            self.assertTrue(BookResponse.from_json(BookResponse(None, hold=True).to_json()).hold)
+            self.assertFalse(BookResponse(None).hold, "An answer without a wave only holds if holding beat a tested wave")
+            self.assertFalse(BookResponse(["PI", [13, 0], 5], hold=True).hold)
+            self.assertEqual(1, BookResponse(["EI", [14, 0], 1]).deploy(game))
+            self.assertEqual([("EI", 14, 0)], game._deploy_stack, "The answer's demolishers are deployed as they are")
+            game.game_map.remove_unit([10, 15])
+            self.assertIsNone(loaded.lookup(game))
+            self.assertEqual((1, 1), (loaded.hits, loaded.misses))
+
+            other_config = json.loads(json.dumps(game.config))
+            other_config["unitInformation"][2]["cost1"] += 1
+            self.assertEqual(0, len(OpeningBook(other_config, path).load()), "A book built for another config is ignored")
+
+    def test_attack_planner(self):
+        game = self.make_turn_0_map()
+        plan = AttackPlanner(game).plan()
+        self.assertEqual([["PI", 5]], [[wave.unit_type, wave.units] for wave in plan.waves], "With nothing to stop them every scout breaches")
+        self.assertEqual(5, plan.breach_damage)
+
+        game.game_map.add_unit("DF", [25, 15], 1)
+        game.game_map.add_unit("DF", [23, 15], 1)
+        game.game_map.add_unit("FF", [20, 14], 1)
+        planner = AttackPlanner(game)
+        plan = planner.plan(time_budget=10)
+        self.assertLessEqual(plan.MP, game.get_resource(game.MP))
+        self.assertEqual(plan.breach_damage + planner.structure_weight * plan.structure_damage, plan.score)
+        self.assertGreater(planner.evaluated + planner.pruned, 1, "Demolishers and scouts should both be tried")
+        for wave in plan.waves:
+            alone = planner.evaluate([wave])
+            self.assertGreaterEqual(alone[0], wave.profile.damage_to_health(wave.units), "Turrets the wave destroys stop firing")
+        self.assertLessEqual(plan.structure_damage, sum(unit.health for unit in game.get_structures(1)))
+        timed_out = AttackPlanner(game)
+        timed_out.plan(time_budget=0)
+        self.assertEqual(1, timed_out.evaluated, "One mix is always played out")
+
+        game._player_resources[0]["MP"] = 0
+        self.assertIsNone(AttackPlanner(game).plan())
+        plan = AttackPlanner(game).plan(lookahead=1)
+        self.assertEqual(1, plan.turn, "With no MP now the best plan waits for next turn's")
+        self.assertEqual(0, plan.attempt(game))
@@ -0,0 +1,112 @@
+"""
+Per-tile threat from structures, built once per layout.
+
+get_attackers searches the neighbourhood of a single location and has to be
+called for every tile of every path. A ThreatMap does the same work the other
+way round, stamping each structure's attack range onto the board once, so any
+number of tiles can then be looked up in constant time.
+"""
+
+import math
+
+from .distance_field import ARENA_SIZE, IN_ARENA, to_index
+
+
+_RANGE_OFFSETS = {}
+
+
+def range_offsets(radius):
+    """Gets the (dx, dy) offsets whose distance from the origin is at most radius
+
+    Stencils are computed once per radius and shared.
+
+    """
+    offsets = _RANGE_OFFSETS.get(radius)
+    if offsets is None:
+        search_radius = int(math.ceil(radius))
+        offsets = tuple(
+            (dx, dy)
+            for dx in range(-search_radius, search_radius + 1)
+            for dy in range(-search_radius, search_radius + 1)
+            if math.sqrt(dx ** 2 + dy ** 2) <= radius)
+        _RANGE_OFFSETS[radius] = offsets
+    return offsets
+
+
+def indices_in_range(location, radius):
+    """Gets the flat indices of every arena tile at most radius away from location"""
+    x, y = location
+    indices = []
+    for dx, dy in range_offsets(radius):
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and IN_ARENA[nx * ARENA_SIZE + ny]:
+            indices.append(nx * ARENA_SIZE + ny)
+    return indices
+
+
+def get_threat_map(game_state, player_index):
+    """Gets the threat map for units of player_index under the current layout of game_state
+
+    Maps are cached in game_state.transposition_table under the layout's zobrist hash,
+    so the returned map is shared and must not be modified. Use ThreatMap.copy() first.
+
+    """
+    key = (game_state.game_map.zobrist_hash, "threat_map", player_index)
+    threat_map = game_state.transposition_table.get(key)
+    if threat_map is None:
+        threat_map = ThreatMap(game_state, player_index)
+        game_state.transposition_table.put(key, threat_map)
+    return threat_map
+
+
+class ThreatMap:
+    """The structures that can attack a unit of one player on each tile
+
+    Matches GameState.get_attackers restricted to structures: a tile is threatened by a
+    structure of the other player that deals damage and is within its attackRange.
+
+    Attributes :
+        * player_index (int): The player whose units are being threatened, 0 for you 1 for the enemy
+        * attackers (list): Flat list of the number of structures that can attack each tile
+        * damage (list): Flat list of the damage per attack those structures deal to mobile units, using their upgraded stats
+
+    """
+    def __init__(self, game_state=None, player_index=0):
+        self.player_index = player_index
+        self.attackers = [0] * (ARENA_SIZE * ARENA_SIZE)
+        self.damage = [0.0] * (ARENA_SIZE * ARENA_SIZE)
+        if game_state is not None:
+            for location in game_state.game_map:
+                for unit in game_state.game_map[location]:
+                    if unit.stationary and unit.player_index != player_index and unit.damage_i + unit.damage_f > 0:
+                        self.add(location, unit.attackRange, unit.damage_i)
+
+    def copy(self):
+        """A copy that can be modified without affecting this map"""
+        threat_map = ThreatMap(None, self.player_index)
+        threat_map.attackers = list(self.attackers)
+        threat_map.damage = list(self.damage)
+        return threat_map
+
+    def add(self, location, attack_range, damage):
+        """Adds a hypothetical attacker
+
+        Args:
+            location: The location of the attacker
+            attack_range: Its attackRange
+            damage: The damage it deals to mobile units each attack
+
+        """
+        attackers = self.attackers
+        damage_map = self.damage
+        for index in indices_in_range(location, attack_range):
+            attackers[index] += 1
+            damage_map[index] += damage
+
+    def attackers_at(self, location):
+        """The number of structures that can attack a unit at location"""
+        return self.attackers[to_index(location)]
+
+    def damage_at(self, location):
+        """The damage per attack a unit at location can receive"""
+        return self.damage[to_index(location)]
@@ -0,0 +1,208 @@
+"""
+Zobrist hashing of the structure layout and a bounded transposition table.
+
+The same board is often evaluated many times, within a turn and across turns
+(the enemy layout is frequently unchanged). GameMap keeps an incremental hash
+of its structures so results that depend only on the layout can be cached and
+looked up instead of recomputed.
+"""
+
+import hashlib
+import json
+import random
+from collections import OrderedDict
+
+
+# Fixed seed so hashes are stable across processes, which lets them be used
+# as keys in on-disk caches.
+ZOBRIST_SEED = 0x5EED5EED
+_KEY_CACHE = {}
+
+
+class ZobristKeys:
+    """Random 64 bit keys for every (cell, owner, structure type, upgraded) combination
+
+    Attributes :
+        * arena_size (int): The size of the arena the keys were generated for
+        * num_types (int): The number of structure types that can be hashed
+
+    """
+    def __init__(self, arena_size=28, num_types=3, seed=ZOBRIST_SEED):
+        self.arena_size = arena_size
+        self.num_types = num_types
+        rng = random.Random(seed)
+        self.__keys = [rng.getrandbits(64) for _ in range(arena_size * arena_size * 2 * num_types * 2)]
+
+    def key(self, x, y, player_index, type_index, upgraded):
+        """Gets the key for a single structure
+
+        Args:
+            x, y: The location of the structure
+            player_index: The index of the player owning the structure, 0 for you 1 for the enemy
+            type_index: The index of the structure type in unitInformation
+            upgraded: Whether the structure is upgraded
+
+        Returns:
+            A 64 bit integer
+
+        """
+        index = (((x * self.arena_size + y) * 2 + player_index) * self.num_types + type_index) * 2 + int(bool(upgraded))
+        return self.__keys[index]
+
+
+def get_zobrist_keys(arena_size=28, num_types=3):
+    """Gets the shared key set for the given arena, generating it on first use
+
+    """
+    cache_key = (arena_size, num_types)
+    keys = _KEY_CACHE.get(cache_key)
+    if keys is None:
+        keys = ZobristKeys(arena_size, num_types)
+        _KEY_CACHE[cache_key] = keys
+    return keys
+
+
+class TranspositionTable:
+    """A bounded least recently used cache for board evaluations
+
+    Keys are usually a tuple of (game_map.zobrist_hash, query...), values are whatever the
+    query computed. Values are returned as stored, so callers should store immutable
+    values or copy them on the way out.
+
+    Attributes :
+        * capacity (int): The maximum number of entries kept before the least recently used is evicted
+        * hits (int): The number of successful lookups
+        * misses (int): The number of failed lookups
+        * evictions (int): The number of entries dropped to stay within capacity
+
+    """
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return key in self.__entries
+
+    def get(self, key, default=None):
+        """Looks up a key, marking it as recently used
+
+        Args:
+            key: A hashable key
+            default: The value returned on a miss
+
+        Returns:
+            The stored value, or default if the key is not in the table
+
+        """
+        entries = self.__entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Stores a value, evicting the least recently used entry if the table is full
+
+        """
+        entries = self.__entries
+        if key in entries:
+            entries.move_to_end(key)
+        entries[key] = value
+        while len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, key, compute):
+        """Gets the value for a key, computing and storing it on a miss
+
+        Args:
+            key: A hashable key
+            compute: A function taking no arguments that produces the value
+
+        Returns:
+            The cached or freshly computed value
+
+        """
+        entries = self.__entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drops every entry and resets the statistics
+
+        """
+        self.__entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit_rate(self):
+        """The fraction of lookups that were hits, 0 if there have been no lookups
+
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Gets the table statistics
+
+        Returns:
+            A dict with the size, capacity, hits, misses, evictions and hit rate
+
+        """
+        return {
+            "size": len(self.__entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate()}
+
+
+_DEFAULT_TABLE = None
+_DEFAULT_CONFIG = None
+_DEFAULT_FINGERPRINT = None
+
+
+def config_fingerprint(config):
+    """A hash of the whole config, so results cached under one config are never used with another"""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def default_transposition_table(config=None):
+    """Gets the process wide table shared by every GameState
+
+    GameState is rebuilt every turn, so the table lives here to let
+    cached results survive from one turn to the next. Keys only describe
+    the board, so the table is cleared when it is asked for with a config
+    that differs from the one it was last used with, as in scripts that
+    go through games played with several configs.
+
+    Args:
+        config: The config the caller works with, None to leave the table as it is
+
+    """
+    global _DEFAULT_TABLE, _DEFAULT_CONFIG, _DEFAULT_FINGERPRINT
+    if _DEFAULT_TABLE is None:
+        _DEFAULT_TABLE = TranspositionTable()
+    if config is not None and config is not _DEFAULT_CONFIG:
+        fingerprint = config_fingerprint(config)
+        if _DEFAULT_FINGERPRINT is not None and fingerprint != _DEFAULT_FINGERPRINT:
+            _DEFAULT_TABLE.clear()
+        _DEFAULT_CONFIG = config
+        _DEFAULT_FINGERPRINT = fingerprint
+    return _DEFAULT_TABLE
@@ -0,0 +1,190 @@
+"""
+Which of our structures to upgrade with the SP we have.
+
+Every structure we could upgrade is scored by what the upgrade stats in the
+config add, measured on the paths units take under the current layout:
+
+* Turrets add coverage: the extra damage they deal to an enemy unit, averaged
+  over the paths from every enemy spawn tile.
+* Supports add coverage too: the extra shield they give one of our units,
+  averaged over the paths from every one of our spawn tiles.
+* Every structure adds durability: the extra health, weighted by the share of
+  enemy paths that pass close enough for enemy units to shoot at it.
+
+The best set of upgrades for the SP is then picked as a 0/1 knapsack, so a
+cheap upgrade is never blocked by an expensive one earlier in a list.
+"""
+
+from .placement import get_placement_engine
+from .simulator import unit_stats
+from .spawn_ranking import get_spawn_ranking
+from .threat import indices_in_range
+
+
+class UpgradeOption:
+    """One structure we could upgrade
+
+    Attributes :
+        * unit_type (string): The structure's type
+        * location ([x, y]): Where it is
+        * cost (float): The SP the upgrade costs
+        * coverage_gain (float): Extra damage per enemy unit for turrets, extra shield per friendly unit for supports
+        * durability_gain (float): Extra health, weighted by how exposed the structure is
+        * value (float): The weighted sum of both gains
+        * value_per_SP (float): value divided by cost
+
+    """
+    def __init__(self, unit_type, location, cost):
+        self.unit_type = unit_type
+        self.location = location
+        self.cost = cost
+        self.coverage_gain = 0.0
+        self.durability_gain = 0.0
+        self.value = 0.0
+        self.value_per_SP = 0.0
+
+    def __repr__(self):
+        return "Upgrade {} at {} for {} SP: coverage {:+.1f}, durability {:+.1f}, value per SP {:.2f}".format(
+            self.unit_type, self.location, self.cost, self.coverage_gain, self.durability_gain, self.value_per_SP)
+
+
+class UpgradePrioritizer:
+    """Scores the upgrades of our structures and picks the best set we can afford
+
+    Attributes :
+        * game_state (:obj: GameState): The state the upgrades are scored against, including anything already queued
+        * options (list): An UpgradeOption for every structure that can still be upgraded, most value per SP first
+
+    """
+    def __init__(self, game_state, locations=None, enemy_unit_type=None, coverage_weight=1.0, durability_weight=1.0, engine=None):
+        """Scores every upgrade
+
+        Args:
+            game_state: The current GameState
+            locations: Only consider structures at these locations, all of our structures if None
+            enemy_unit_type: The enemy unit whose paths and attackRange are used. Defaults to SCOUT
+            coverage_weight: How much coverage_gain counts towards value
+            durability_weight: How much durability_gain counts towards value
+            engine: A PlacementEngine for game_state and enemy_unit_type to share. The one cached for the layout is used if None
+
+        """
+        self.game_state = game_state
+        config = game_state.config
+        if enemy_unit_type is None:
+            enemy_unit_type = config["unitInformation"][3]["shorthand"]
+        type_indices = dict((info.get("shorthand"), index) for index, info in enumerate(config["unitInformation"]))
+        if engine is None:
+            engine = get_placement_engine(game_state, enemy_unit_type)
+        enemy_stats = unit_stats(config, type_indices[enemy_unit_type])
+        self.__enemy_paths = [spawn_path.path for spawn_path in engine.baseline]
+        self.__enemy_path_sets = [frozenset(path) for path in self.__enemy_paths]
+        self.__frames_per_tile = 1 / engine.speed
+        self.__enemy_range = enemy_stats["attack_range"]
+        self.__visits = None
+        self.__our_paths = None
+        self.__in_range = {}
+        upgraded_stats = {}
+
+        wanted = None if locations is None else set((x, y) for x, y in locations)
+        self.options = []
+        for unit in game_state.get_structures(0):
+            if unit.upgraded or unit.pending_removal or (wanted is not None and (unit.x, unit.y) not in wanted):
+                continue
+            type_index = type_indices[unit.unit_type]
+            if config["unitInformation"][type_index].get("upgrade") is None:
+                continue
+            costs = game_state.type_cost(unit.unit_type, True)
+            if costs[game_state.MP] > 0:
+                continue
+            if type_index not in upgraded_stats:
+                upgraded_stats[type_index] = unit_stats(config, type_index, True)
+            option = UpgradeOption(unit.unit_type, [unit.x, unit.y], costs[game_state.SP])
+            self.__score(option, unit, upgraded_stats[type_index])
+            option.value = coverage_weight * option.coverage_gain + durability_weight * option.durability_gain
+            option.value_per_SP = option.value / option.cost if option.cost > 0 else option.value
+            self.options.append(option)
+        self.options.sort(key=lambda option: (-option.value_per_SP, -option.value))
+
+    def __score(self, option, unit, upgraded):
+        location = option.location
+        if upgraded["damage_i"] > 0 or unit.damage_i > 0:
+            option.coverage_gain = (self.__coverage(location, upgraded["attack_range"], upgraded["damage_i"])
+                                    - self.__coverage(location, unit.attackRange, unit.damage_i))
+        if upgraded["shield_per_unit"] > 0 or unit.shieldPerUnit > 0:
+            option.coverage_gain = (self.__shielding(location, upgraded["shield_range"], upgraded["shield_per_unit"] + upgraded["shield_bonus_per_y"] * unit.y)
+                                    - self.__shielding(location, unit.shieldRange, unit.shieldPerUnit + unit.shieldBonusPerY * unit.y))
+        in_range = self.__tiles_in_range(location, self.__enemy_range)
+        exposed = sum(1 for path_set in self.__enemy_path_sets if not in_range.isdisjoint(path_set))
+        exposure = exposed / len(self.__enemy_path_sets) if self.__enemy_path_sets else 0.0
+        option.durability_gain = max(0.0, upgraded["max_health"] - unit.max_health) * exposure
+
+    def __tiles_in_range(self, location, radius):
+        key = (location[0], location[1], radius)
+        tiles = self.__in_range.get(key)
+        if tiles is None:
+            tiles = frozenset(indices_in_range(location, radius))
+            self.__in_range[key] = tiles
+        return tiles
+
+    def __coverage(self, location, attack_range, damage):
+        """The damage a turret at location deals to an enemy unit, averaged over the enemy paths"""
+        if damage <= 0 or not self.__enemy_paths:
+            return 0.0
+        if self.__visits is None:
+            self.__visits = {}
+            for path in self.__enemy_paths:
+                for index in path:
+                    self.__visits[index] = self.__visits.get(index, 0) + 1
+        visits = sum(self.__visits.get(index, 0) for index in self.__tiles_in_range(location, attack_range))
+        return visits * self.__frames_per_tile * damage / len(self.__enemy_paths)
+
+    def __shielding(self, location, shield_range, amount):
+        """The shield a support at location gives one of our units, averaged over our paths"""
+        if amount <= 0:
+            return 0.0
+        if self.__our_paths is None:
+            self.__our_paths = [frozenset(spawn_path.path) for spawn_path in get_spawn_ranking(self.game_state).ranked]
+        if not self.__our_paths:
+            return 0.0
+        in_range = self.__tiles_in_range(location, shield_range)
+        return amount * sum(1 for path_set in self.__our_paths if not in_range.isdisjoint(path_set)) / len(self.__our_paths)
+
+    def select(self, SP=None):
+        """Picks the set of upgrades with the most value that fits the SP
+
+        Args:
+            SP: The SP to spend, what we have now if None
+
+        Returns:
+            The chosen UpgradeOptions, most value per SP first
+
+        """
+        if SP is None:
+            SP = self.game_state.get_resource(self.game_state.SP)
+        # The best set for each total cost reachable so far. Costs are few and small, so this stays tiny
+        best = {0.0: (0.0, ())}
+        for option_index, option in enumerate(self.options):
+            if option.value <= 0:
+                continue
+            for spent, (value, chosen) in list(best.items()):
+                total = round(spent + option.cost, 6)
+                if total > SP:
+                    continue
+                current = best.get(total)
+                if current is None or value + option.value > current[0]:
+                    best[total] = (value + option.value, chosen + (option_index,))
+        # Ties go to the cheaper set
+        _, chosen = max(best.items(), key=lambda item: (item[1][0], -item[0]))[1]
+        return [self.options[option_index] for option_index in sorted(chosen)]
+
+    def attempt(self, SP=None):
+        """Queues the upgrades chosen by select
+
+        Returns:
+            The number of structures upgraded
+
+        """
+        selected = self.select(SP)
+        if not selected:
+            return 0
+        return self.game_state.attempt_upgrade([option.location for option in selected])
@@ -2,6 +2,22 @@ import sys
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
+# Directions of recorded lines, see replay.py. Kept here so util does not import the recorder
+ENGINE_TO_ALGO = b"<"
+ALGO_TO_ENGINE = b">"
+
+_recorder = None
+
+
+def set_recorder(recorder):
+    """Tees every line read by get_command and sent by send_command to a ReplayRecorder
+
+    Args:
+        recorder: The ReplayRecorder, or None to stop recording
+
+    """
+    global _recorder
+    _recorder = recorder
 
 
 def get_command():
@@ -19,6 +35,8 @@ def get_command():
         # Don't change or starter-algo process won't exit even though the game has closed
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
+    if _recorder is not None:
+        _recorder.record(ENGINE_TO_ALGO, ret)
     return ret
 
 def send_command(cmd):
@@ -28,6 +46,8 @@ def send_command(cmd):
     """
     sys.stdout.write(cmd.strip() + "\n")
     sys.stdout.flush()
+    if _recorder is not None:
+        _recorder.record(ALGO_TO_ENGINE, cmd.strip())
 
 def debug_write(*msg):
     """Prints a message to the games debug output
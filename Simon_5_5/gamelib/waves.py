@@ -0,0 +1,229 @@
+"""
+Analytic estimate of how a wave of our mobile units fares along its path.
+
+The wave is walked tile by tile at the unit's speed. On each tile it picks up the
+shields of our supports in range, then takes the damage of every enemy turret in
+range for the frames it spends there. Turrets focus on one unit at a time, so the
+damage removes whole units in turn, and damage that kills a unit carries over to
+the next. Shields reach every unit still alive, so the units that die, and the
+tile each one dies on, do not depend on the size of the wave as long as units
+remain. One walk therefore gives a WaveProfile that answers for any number of units.
+"""
+
+from .distance_field import ARENA_SIZE, to_index
+from .simulator import unit_stats
+from .spawn_ranking import get_spawn_ranking
+from .threat import get_threat_map, indices_in_range, range_offsets
+
+
+class WaveProfile:
+    """How a wave of one unit type does along one path, for any number of units
+
+    Attributes :
+        * unit_type (string): The mobile unit sent
+        * spawn_location ([x, y]): Where the wave spawns
+        * breach_location ([x, y]): Where it breaches, or self destructs if reaches_edge is False
+        * reaches_edge (bool): False if the path ends in a self destruct
+        * path (list): Flat indices of the tiles walked
+        * kills (int): The number of units the enemy kills along the whole path, with enough units sent
+        * killed_before (list): For each tile of the path, the number of units killed before the wave fires from it
+        * health (float): The health of a fresh unit at the end of the path, shields included
+        * breach_damage (float): Damage each unit that breaches does to the enemy
+        * structure_hits (list): (units killed before the tile, damage per living unit) for every tile where the wave can hit an enemy structure
+        * self_destruct_damage (float): Damage each unit left at the end does to enemy structures by self destructing
+
+    """
+    def __init__(self, unit_type, spawn_path, breach_damage):
+        self.unit_type = unit_type
+        self.spawn_location = spawn_path.spawn_location
+        self.breach_location = spawn_path.breach_location
+        self.reaches_edge = spawn_path.reaches_edge
+        self.path = spawn_path.path
+        self.kills = 0
+        self.killed_before = []
+        self.health = 0.0
+        self.breach_damage = breach_damage
+        self.structure_hits = []
+        self.self_destruct_damage = 0.0
+
+    def alive(self, units, step):
+        """The number of units left to fire from the tile at position step of the path"""
+        return max(0, units - self.killed_before[step])
+
+    def survivors(self, units):
+        """The number of units left at the end of the path"""
+        return max(0, units - self.kills)
+
+    def breaching(self, units):
+        """The number of units that reach the enemy edge"""
+        return self.survivors(units) if self.reaches_edge else 0
+
+    def damage_to_structures(self, units):
+        """The damage the wave does to enemy structures on its way, ignoring structures it destroys"""
+        damage = 0.0
+        for killed, per_unit in self.structure_hits:
+            if units > killed:
+                damage += (units - killed) * per_unit
+        return damage + self.survivors(units) * self.self_destruct_damage
+
+    def damage_to_health(self, units):
+        """The damage the wave does to the enemy's health by breaching"""
+        return self.breaching(units) * self.breach_damage
+
+    def evaluate(self, unit_counts):
+        """Survivors, breach damage and structure damage for each wave size
+
+        Args:
+            unit_counts: A list of wave sizes
+
+        Returns:
+            A list of [survivors, damage to health, damage to structures], one per wave size
+
+        """
+        return [[self.survivors(units), self.damage_to_health(units), self.damage_to_structures(units)] for units in unit_counts]
+
+    def __repr__(self):
+        return "{} wave from {} breach: {} reaches edge: {} kills: {}".format(
+            self.unit_type, self.spawn_location, self.breach_location, self.reaches_edge, self.kills)
+
+
+class WaveEstimator:
+    """Builds WaveProfiles for our spawn tiles under one layout
+
+    Attributes :
+        * game_state (:obj: GameState): The state the waves are estimated against, including anything already queued
+        * enemy_structures (list): The enemy structures, in the order targets_in_range refers to them
+
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.__type_indices = dict((info.get("shorthand"), index) for index, info in enumerate(game_state.config["unitInformation"]))
+        self.__threat_damage = get_threat_map(game_state, 0).damage
+        # Our supports in range of each tile, as (support index, shield) pairs
+        self.__shields = [()] * (ARENA_SIZE * ARENA_SIZE)
+        structures = game_state.get_structures(0)
+        for support, unit in enumerate(structures):
+            if unit.shieldPerUnit <= 0 or unit.shieldRange <= 0:
+                continue
+            amount = unit.shieldPerUnit + unit.shieldBonusPerY * unit.y
+            for index in indices_in_range([unit.x, unit.y], unit.shieldRange):
+                self.__shields[index] = self.__shields[index] + ((support, amount),)
+        self.enemy_structures = game_state.get_structures(1)
+        self.__targets = {}
+        self.__profiles = {}
+
+    def targets_in_range(self, radius):
+        """Gets the enemy structures within radius of each tile
+
+        Returns:
+            A list with an entry per flat index: None if nothing is in range, otherwise
+            the indices into enemy_structures of the structures in range, nearest first
+
+        """
+        targets = self.__targets.get(radius)
+        if targets is None:
+            targets = [None] * (ARENA_SIZE * ARENA_SIZE)
+            locations = [(unit.x, unit.y) for unit in self.enemy_structures]
+            # Stamping the nearest offsets first leaves every tile's list sorted by distance
+            for dx, dy in sorted(range_offsets(radius), key=lambda offset: offset[0] ** 2 + offset[1] ** 2):
+                for structure, (x, y) in enumerate(locations):
+                    x, y = x - dx, y - dy
+                    if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+                        index = x * ARENA_SIZE + y
+                        if targets[index] is None:
+                            targets[index] = [structure]
+                        else:
+                            targets[index].append(structure)
+            self.__targets[radius] = targets
+        return targets
+
+    def profile(self, location, unit_type=None):
+        """Gets the profile of a wave spawned at location
+
+        Args:
+            location: An open tile of our edges
+            unit_type: The mobile unit sent. Defaults to SCOUT
+
+        Returns:
+            A WaveProfile, or None if location is not an open spawn tile
+
+        """
+        if unit_type is None:
+            unit_type = self.game_state.config["unitInformation"][3]["shorthand"]
+        key = (to_index(location), unit_type)
+        if key not in self.__profiles:
+            spawn_path = get_spawn_ranking(self.game_state, unit_type).get(location)
+            self.__profiles[key] = None if spawn_path is None else self.__walk(unit_type, spawn_path)
+        return self.__profiles[key]
+
+    def profiles(self, unit_type=None):
+        """Gets the profile of a wave from every open spawn tile, in the order of the spawn ranking"""
+        if unit_type is None:
+            unit_type = self.game_state.config["unitInformation"][3]["shorthand"]
+        return [self.profile(spawn_path.spawn_location, unit_type) for spawn_path in get_spawn_ranking(self.game_state, unit_type).ranked]
+
+    def __walk(self, unit_type, spawn_path):
+        stats = unit_stats(self.game_state.config, self.__type_indices[unit_type])
+        profile = WaveProfile(unit_type, spawn_path, stats["breach_damage"])
+        frames = 1 / stats["speed"] if stats["speed"] > 0 else 1
+        targets = self.targets_in_range(stats["attack_range"]) if stats["damage_f"] > 0 else None
+        threat_damage = self.__threat_damage
+        shields = self.__shields
+        health = stats["max_health"]
+        remaining = health
+        killed = 0
+        shielded = set()
+        for index in spawn_path.path:
+            for support, amount in shields[index]:
+                if support not in shielded:
+                    shielded.add(support)
+                    health += amount
+                    remaining += amount
+            profile.killed_before.append(killed)
+            if targets is not None and targets[index]:
+                profile.structure_hits.append((killed, stats["damage_f"] * frames))
+            damage = threat_damage[index] * frames
+            if damage < remaining or health <= 0:
+                remaining -= damage
+                continue
+            damage -= remaining
+            killed += 1
+            whole = int(damage // health)
+            killed += whole
+            remaining = health - (damage - whole * health)
+        profile.kills = killed
+        profile.health = health
+        steps = len(spawn_path.path) - 1
+        if not spawn_path.reaches_edge and steps >= stats["self_destruct_steps"] and stats["self_destruct_range"] > 0:
+            in_range = self.targets_in_range(stats["self_destruct_range"])[spawn_path.path[-1]]
+            profile.self_destruct_damage = stats["self_destruct_damage_f"] * (len(in_range) if in_range else 0)
+        return profile
+
+    def best_wave(self, unit_types=None, MP=None):
+        """Gets the spawn tile and unit type that do the most damage with the MP available
+
+        Args:
+            unit_types: The mobile units to consider. Defaults to SCOUT and DEMOLISHER
+            MP: The MP to spend. Defaults to what we have now; pass game_state.project_future_MP() to weigh waiting a turn
+
+        Returns:
+            A (WaveProfile, units) pair, or None if nothing can be afforded. Breach damage counts first, then structure damage
+
+        """
+        config = self.game_state.config
+        if unit_types is None:
+            unit_types = [config["unitInformation"][3]["shorthand"], config["unitInformation"][4]["shorthand"]]
+        if MP is None:
+            MP = self.game_state.get_resource(self.game_state.MP)
+        best = None
+        best_key = None
+        for unit_type in unit_types:
+            cost = unit_stats(config, self.__type_indices[unit_type])["cost"][self.game_state.MP]
+            units = int(MP // cost) if cost > 0 else 0
+            if units < 1:
+                continue
+            for profile in self.profiles(unit_type):
+                key = (profile.damage_to_health(units), profile.damage_to_structures(units))
+                if best_key is None or key > best_key:
+                    best, best_key = (profile, units), key
+        return best
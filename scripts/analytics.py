@@ -0,0 +1,155 @@
+"""
+Aggregate breach and damage statistics over many recorded games.
+
+Recordings made with ALGO_REPLAY_DIR (see gamelib.replay) are fanned out over a
+process pool. Each worker streams one recording record by record, never holding
+a whole game in memory, and adds its frame events into per-tile accumulators.
+The accumulators of all games are summed and saved as a .npz file, and the hottest
+tiles are printed as coordinate lists ready to paste into AlgoStrategy.
+
+All coordinates are from our side of the board, as the recordings are.
+
+Usage:
+    python scripts/analytics.py "replays/*.replay.gz" --output analytics.npz --top 10
+    python scripts/analytics.py "replays/*.replay.gz" --stages 0 12 36 100
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Simon_5_5"))
+
+from gamelib.replay import read_replay, ENGINE_TO_ALGO
+
+ARENA_SIZE = 28
+STRUCTURE_TYPES = 3
+# Turn ranges match AlgoStrategy.stage_1 and stage_2
+DEFAULT_STAGES = [0, 12, 36, 1000]
+
+
+def empty_accumulators(stages):
+    buckets = len(stages) - 1
+    grid = (ARENA_SIZE, ARENA_SIZE)
+    return {
+        "breached_at": np.zeros((buckets,) + grid, np.float64),
+        "scored_at": np.zeros((buckets,) + grid, np.float64),
+        "our_structure_deaths": np.zeros((STRUCTURE_TYPES,) + grid, np.float64),
+        "enemy_structure_deaths": np.zeros((STRUCTURE_TYPES,) + grid, np.float64),
+        "our_structure_damage": np.zeros(grid, np.float64),
+        "enemy_layout_when_lost": np.zeros(grid, np.float64),
+        "enemy_layout_when_won": np.zeros(grid, np.float64),
+        "games": np.zeros(3, np.int64),
+    }
+
+
+def analyze(job):
+    """Reads one recording and returns its accumulators
+
+    games counts [won, lost, drawn] for this recording.
+    """
+    path, stages = job
+    totals = empty_accumulators(stages)
+    enemy_layout = np.zeros((ARENA_SIZE, ARENA_SIZE), np.float64)
+    turns = 0
+    health = None
+    bucket = 0
+    try:
+        for direction, _, line in read_replay(path):
+            if direction != ENGINE_TO_ALGO or "turnInfo" not in line:
+                continue
+            state = json.loads(line)
+            state_type, turn = int(state["turnInfo"][0]), int(state["turnInfo"][1])
+            health = (float(state["p1Stats"][0]), float(state["p2Stats"][0]))
+            if state_type == 0:
+                turns += 1
+                bucket = max(0, min(len(stages) - 2, int(np.searchsorted(stages, turn, side="right")) - 1))
+                for type_index, units in enumerate(state["p2Units"][:STRUCTURE_TYPES]):
+                    for unit in units:
+                        enemy_layout[int(unit[0]), int(unit[1])] += 1
+            elif state_type == 1:
+                events = state["events"]
+                for breach in events.get("breach", []):
+                    x, y = breach[0]
+                    if int(breach[4]) == 2:
+                        totals["breached_at"][bucket, x, y] += breach[1]
+                    else:
+                        totals["scored_at"][bucket, x, y] += breach[1]
+                for death in events.get("death", []):
+                    (x, y), type_index, player = death[0], int(death[1]), int(death[3])
+                    removed_by_owner = len(death) > 4 and death[4]
+                    if type_index < STRUCTURE_TYPES and not removed_by_owner:
+                        key = "our_structure_deaths" if player == 1 else "enemy_structure_deaths"
+                        totals[key][type_index, x, y] += 1
+                for damage in events.get("damage", []):
+                    (x, y), amount, type_index, player = damage[0], damage[1], int(damage[2]), int(damage[4])
+                    if player == 1 and type_index < STRUCTURE_TYPES:
+                        totals["our_structure_damage"][x, y] += amount
+    except (ValueError, KeyError, IndexError) as error:
+        sys.stderr.write("Skipping the rest of {}: {!r}\n".format(path, error))
+    if health is None:
+        return totals
+    if turns:
+        enemy_layout /= turns
+    if health[0] > health[1]:
+        totals["games"][0] += 1
+        totals["enemy_layout_when_won"] += enemy_layout
+    elif health[0] < health[1]:
+        totals["games"][1] += 1
+        totals["enemy_layout_when_lost"] += enemy_layout
+    else:
+        totals["games"][2] += 1
+    return totals
+
+
+def top_tiles(grid, count):
+    """The count tiles with the highest values, as [x, y] lists"""
+    order = np.argsort(grid, axis=None)[::-1][:count]
+    return [[int(x), int(y)] for x, y in zip(*np.unravel_index(order, grid.shape)) if grid[x, y] > 0]
+
+
+def report(totals, stages, count):
+    won, lost, drawn = (int(value) for value in totals["games"])
+    print("Games: {} won, {} lost, {} drawn".format(won, lost, drawn))
+    for bucket in range(len(stages) - 1):
+        print("Breached at, turns {}-{}: {}".format(stages[bucket], stages[bucket + 1] - 1,
+                                                  top_tiles(totals["breached_at"][bucket], count)))
+    print("Breached at, all turns: {}".format(top_tiles(totals["breached_at"].sum(axis=0), count)))
+    names = ["walls", "supports", "turrets"]
+    for type_index, name in enumerate(names):
+        print("Our {} destroyed most: {}".format(name, top_tiles(totals["our_structure_deaths"][type_index], count)))
+    print("Our structures damaged most: {}".format(top_tiles(totals["our_structure_damage"], count)))
+    if lost and won:
+        # Enemy tiles held more often in games we lost than in games we won
+        difference = totals["enemy_layout_when_lost"] / lost - totals["enemy_layout_when_won"] / won
+        print("Enemy structures that go with our losses: {}".format(top_tiles(difference, count)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate breach and damage heatmaps over recorded games")
+    parser.add_argument("replays", nargs="+", help="Recordings made with ALGO_REPLAY_DIR, globs allowed")
+    parser.add_argument("--stages", type=int, nargs="+", default=DEFAULT_STAGES, help="Turn range boundaries")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--top", type=int, default=10, help="Tiles to list for each statistic")
+    parser.add_argument("--output", help="Save the accumulators as .npz here")
+    args = parser.parse_args()
+
+    replays = sorted(set(path for pattern in args.replays for path in (glob.glob(pattern) or [pattern])))
+    stages = sorted(args.stages)
+    totals = empty_accumulators(stages)
+    with multiprocessing.Pool(args.workers) as pool:
+        for partial in pool.imap_unordered(analyze, [(path, stages) for path in replays], chunksize=4):
+            for key, value in partial.items():
+                totals[key] += value
+    report(totals, stages, args.top)
+    if args.output:
+        np.savez_compressed(args.output, stages=np.asarray(stages), **totals)
+
+
+if __name__ == "__main__":
+    main()
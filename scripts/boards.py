@@ -0,0 +1,100 @@
+"""
+Synthetic boards for benchmarks and equivalence checks.
+
+generate_board lays out structures for both players at a chosen density with a
+seeded random generator, weighted towards the front rows the way real defences
+are, and returns a turn string in the engine's format that GameState can parse.
+"""
+import json
+import os
+import random
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Simon_5_5"))
+
+from gamelib.distance_field import ARENA_SIZE, HALF_ARENA, ARENA_INDICES, to_location
+
+DEFAULT_CONFIG = os.path.join(REPO_DIR, "scripts", "game-configs.json")
+WALL, SUPPORT, TURRET = 0, 1, 2
+# Share of each structure type on a generated board
+STRUCTURE_MIX = [(WALL, 0.6), (TURRET, 0.3), (SUPPORT, 0.1)]
+EMPTY_EVENTS = {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [],
+                "death": [], "attack": [], "melee": []}
+
+
+def load_config(path=DEFAULT_CONFIG):
+    with open(path) as config_file:
+        return json.load(config_file)
+
+
+def _front_weight(y):
+    """Rows near the middle of the board are more likely to hold structures"""
+    distance_from_front = HALF_ARENA - 1 - y if y < HALF_ARENA else y - HALF_ARENA
+    return 1.0 / (1 + 0.35 * distance_from_front)
+
+
+def generate_layout(density, seed, upgraded_share=0.2):
+    """Picks structure locations for both players
+
+    Args:
+        density: The share of each player's half covered by structures, between 0 and 1
+        seed: Seed for the random generator, the same seed always gives the same layout
+        upgraded_share: The share of structures that are upgraded
+
+    Returns:
+        A list of (x, y, player_index, type_index, upgraded) with the player at the bottom as player 0
+
+    """
+    generator = random.Random(seed)
+    layout = []
+    for player_index in range(2):
+        half = [to_location(index) for index in ARENA_INDICES
+                if (index % ARENA_SIZE < HALF_ARENA) == (player_index == 0)]
+        count = int(round(density * len(half)))
+        chosen = set()
+        weights = [_front_weight(location[1]) for location in half]
+        while len(chosen) < count:
+            chosen.add(tuple(generator.choices(half, weights)[0]))
+        for x, y in sorted(chosen):
+            roll = generator.random()
+            for type_index, share in STRUCTURE_MIX:
+                roll -= share
+                if roll <= 0:
+                    break
+            layout.append((x, y, player_index, type_index, generator.random() < upgraded_share))
+    return layout
+
+
+def layout_to_turn_string(config, layout, turn=10, resources=None, state_type=0):
+    """Serializes a layout as a turn string, with player 0 as p1
+
+    Args:
+        config: The game config
+        layout: As returned by generate_layout
+        turn: The turn number to report
+        resources: [[health, SP, MP], [health, SP, MP]] for both players, defaults to a mid game amount
+
+    Returns:
+        The turn string, in the same unit list format GameState parses
+
+    """
+    if resources is None:
+        resources = [[30.0, 30.0, 10.0], [30.0, 30.0, 10.0]]
+    type_count = len(config["unitInformation"])
+    units = [[[] for _ in range(type_count)], [[] for _ in range(type_count)]]
+    for unit_id, (x, y, player_index, type_index, upgraded) in enumerate(layout):
+        type_info = config["unitInformation"][type_index]
+        health = type_info.get("upgrade", {}).get("startHealth", type_info["startHealth"]) if upgraded else type_info["startHealth"]
+        entry = [x, y, health, str(unit_id)]
+        units[player_index][type_index].append(entry)
+        if upgraded:
+            units[player_index][7].append(entry)
+    state = {"p1Units": units[0], "p2Units": units[1], "turnInfo": [state_type, turn, -1],
+             "p1Stats": list(resources[0]) + [0], "p2Stats": list(resources[1]) + [0], "events": EMPTY_EVENTS}
+    return json.dumps(state)
+
+
+def generate_board(config, density, seed, turn=10):
+    """A turn string for a random board, see generate_layout"""
+    return layout_to_turn_string(config, generate_layout(density, seed), turn)
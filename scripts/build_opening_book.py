@@ -0,0 +1,164 @@
+"""
+Build an opening book from recorded games.
+
+Recordings made with ALGO_REPLAY_DIR (see gamelib.replay), from ranked games or
+from self-play with local_engine.py, are read turn by turn up to --max-turn.
+Every turn state is rebuilt as a GameState, and the enemy's layout is answered
+the slow way, with time to spare. The answer is tested on the board it is
+played on: an AlgoStrategy that has seen the recording's action frames first
+builds our side the way it does in play.
+
+* AlgoStrategy.build_base replaces worn walls, guards corners and builds the
+  basic defences. The best --structures turrets are then picked with
+  PlacementEngine, and AlgoStrategy.reinforce_base finishes our side.
+* Waves of scouts and demolishers are sent from the least damaged spawn tiles
+  with all the MP we have, and each is played out with ActionPhaseSimulator.
+  A wave scores the health it takes plus half a point per enemy structure it
+  destroys, so waves that never reach an edge are scored too. If waves were
+  played out and none scored, the answer holds. If none could be played out,
+  the answer leaves the attack to the algo.
+
+Answers are keyed by turn and enemy fingerprint (see gamelib.opening_book), so a
+layout seen in many games is only worked out once. The book is merged into any
+book already at --output that was built for the same config.
+
+Usage:
+    python scripts/build_opening_book.py "replays/*.replay.gz" --output Simon_5_5/opening_book.json
+    python scripts/build_opening_book.py "replays/*.replay.gz" --max-turn 5 --candidates 6 --structures 2
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Simon_5_5"))
+
+import gamelib
+from gamelib.opening_book import BookResponse, fingerprint, position_key
+from gamelib.precompute import config_hash
+from gamelib.replay import read_replay, ENGINE_TO_ALGO
+from gamelib.simulator import ActionPhaseSimulator
+from algo_strategy import AlgoStrategy
+
+
+def read_positions(path, max_turn):
+    """Yields (config, state string, is_turn) for every turn state and action frame of a recording up to max_turn"""
+    config = None
+    for direction, _, line in read_replay(path):
+        if direction != ENGINE_TO_ALGO:
+            continue
+        if "replaySave" in line:
+            config = json.loads(line)
+            continue
+        if config is None or "turnInfo" not in line:
+            continue
+        turn_info = json.loads(line)["turnInfo"]
+        if int(turn_info[1]) > max_turn:
+            return
+        if int(turn_info[0]) in (0, 1):
+            yield config, line, int(turn_info[0]) == 0
+
+
+def make_strategy(config):
+    """An AlgoStrategy set up for a game, to build our side of the board the way it does in play"""
+    strategy = AlgoStrategy()
+    strategy.on_game_start(config)
+    return strategy
+
+
+def open_tiles(game_state):
+    """The tiles of our half a structure could be placed on"""
+    game_map = game_state.game_map
+    return [[x, y] for x in range(game_map.ARENA_SIZE) for y in range(game_map.HALF_ARENA)
+            if game_map.in_arena_bounds([x, y]) and not game_state.contains_stationary_unit([x, y])]
+
+
+def wave_score(game_state, unit_type, location, units):
+    """Plays out one wave against the current board and scores it"""
+    simulator = ActionPhaseSimulator.from_game_state(game_state)
+    simulator.spawn(unit_type, location, 0, units)
+    result = simulator.run()
+    return result.breach_damage[0] + 0.5 * result.structures_destroyed[1]
+
+
+def answer(strategy, game_state, candidates, structures):
+    """Works out the BookResponse for one position, on our side of the board as strategy builds it"""
+    config = game_state.config
+    strategy.build_base(game_state)
+    turret = config["unitInformation"][2]["shorthand"]
+    placed = []
+    for location in gamelib.PlacementEngine(game_state).best_locations(turret, open_tiles(game_state), structures):
+        if game_state.attempt_spawn(turret, location):
+            placed.append([turret, location])
+    strategy.reinforce_base(game_state)
+
+    best_score, best_spawn, tested = 0.0, None, False
+    estimator = gamelib.WaveEstimator(game_state)
+    for type_index in (3, 4):
+        unit_type = config["unitInformation"][type_index]["shorthand"]
+        units = game_state.number_affordable(unit_type)
+        if units <= 0:
+            continue
+        for profile in estimator.profiles(unit_type)[:candidates]:
+            if profile is None:
+                continue
+            score = wave_score(game_state, unit_type, profile.spawn_location, units)
+            tested = True
+            if score > best_score:
+                best_score, best_spawn = score, [unit_type, list(profile.spawn_location), units]
+    return BookResponse(best_spawn, placed, best_score, hold=tested and best_spawn is None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book from recorded games")
+    parser.add_argument("replays", nargs="+", help="Recordings made with ALGO_REPLAY_DIR, globs allowed")
+    parser.add_argument("--output", default=os.path.join(REPO_DIR, "Simon_5_5", "opening_book.json"))
+    parser.add_argument("--max-turn", type=int, default=5, help="The last turn to answer")
+    parser.add_argument("--candidates", type=int, default=4, help="Spawn tiles to simulate for each mobile unit type")
+    parser.add_argument("--structures", type=int, default=2, help="Turrets to add to each answer")
+    args = parser.parse_args()
+
+    replays = sorted(set(path for pattern in args.replays for path in (glob.glob(pattern) or [pattern])))
+    book = None
+    answers = {}
+    start = time.perf_counter()
+    for path in replays:
+        strategy = None
+        try:
+            for config, state_string, is_turn in read_positions(path, args.max_turn):
+                if book is None:
+                    book = gamelib.OpeningBook(config, args.output).load()
+                    book_config = config_hash(config)
+                    print("Merging into {} with {} positions".format(args.output, len(book)))
+                if config_hash(config) != book_config:
+                    sys.stderr.write("Skipping {}: it was played with another config\n".format(path))
+                    break
+                if strategy is None:
+                    strategy = make_strategy(config)
+                if not is_turn:
+                    strategy.on_action_frame(state_string)
+                    continue
+                game_state = gamelib.GameState(config, state_string)
+                game_state.suppress_warnings(True)
+                game_state.enable_path_guard(True)
+                turn, enemy = game_state.turn_number, fingerprint(game_state)
+                key = position_key(turn, enemy)
+                if key not in answers:
+                    answers[key] = answer(strategy, game_state, args.candidates, args.structures)
+                known = answers[key]
+                book.add(turn, enemy, BookResponse(known.spawn, known.structures, known.score, hold=known.hold))
+        except (ValueError, KeyError, IndexError) as error:
+            sys.stderr.write("Skipping the rest of {}: {!r}\n".format(path, error))
+    if book is None:
+        print("No positions found")
+        return
+    book.save()
+    print("Answered {} positions from {} recordings in {:.1f}s, the book now has {}".format(
+        len(answers), len(replays), time.perf_counter() - start, len(book)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Differential equivalence checks between the reference gamelib functions and the
+faster implementations that stand in for them.
+
+Each check runs the reference and the candidate on the same randomized boards
+and queries and compares the results exactly. When they differ, the board is
+minimized by removing structures one at a time for as long as the difference
+remains, and the smallest board found is reported and saved. The time spent in
+each implementation is recorded so the speedup can be weighed against the risk.
+
+Usage:
+    python scripts/equivalence.py --boards 200
+    python scripts/equivalence.py --only path target --boards 50 --failures failures/
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from boards import load_config, generate_layout, layout_to_turn_string, DEFAULT_CONFIG
+
+import gamelib
+from gamelib.distance_field import DistanceField, ARENA_INDICES, get_blocked_mask, to_index, to_location
+from gamelib.simulator import ActionPhaseSimulator, SimulatedUnit
+from gamelib.threat import ThreatMap, indices_in_range
+
+CHECKS = {}
+MOBILE_TYPES = [3, 4, 5]
+
+
+def check(function):
+    CHECKS[function.__name__] = function
+    return function
+
+
+def build_state(config, layout):
+    state = gamelib.GameState(config, layout_to_turn_string(config, layout))
+    state.suppress_warnings(True)
+    return state
+
+
+def open_tiles(state):
+    return [to_location(index) for index in ARENA_INDICES if not state.contains_stationary_unit(to_location(index))]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+@check
+def path(config, layout, rng, queries):
+    """ShortestPathFinder.navigate_multiple_endpoints against DistanceField.path_from"""
+    state = build_state(config, layout)
+    starts = queries or rng.sample(open_tiles(state), min(20, len(open_tiles(state))))
+    finder = state._shortest_path_finder
+
+    def reference():
+        return [finder.navigate_multiple_endpoints(start, state.game_map.get_edge_locations(state.get_target_edge(start)), state)
+                for start in starts]
+
+    def candidate():
+        blocked = get_blocked_mask(state)
+        fields = {}
+        paths = []
+        for start in starts:
+            edge = state.get_target_edge(start)
+            if edge not in fields:
+                fields[edge] = DistanceField(blocked, edge)
+            paths.append(fields[edge].path_from(start))
+        return paths
+    return starts, reference, candidate
+
+
+@check
+def path_patch(config, layout, rng, queries):
+    """DistanceField rebuilt from scratch against one patched with block and unblock"""
+    state = build_state(config, layout)
+    changes = queries or [(to_location(rng.choice(ARENA_INDICES)), rng.random() < 0.6) for _ in range(10)]
+    blocked = get_blocked_mask(state)
+    fields = [DistanceField(blocked, edge) for edge in range(4)]
+
+    def reference():
+        mask = list(blocked)
+        results = []
+        for location, block in changes:
+            mask[to_index(location)] = block
+            results.append([DistanceField(mask, edge).distances for edge in range(4)])
+        return results
+
+    def candidate():
+        patched = [field.copy() for field in fields]
+        results = []
+        for location, block in changes:
+            for field in patched:
+                if block:
+                    field.block(location)
+                else:
+                    field.unblock(location)
+            results.append([list(field.distances) for field in patched])
+        return results
+    return changes, reference, candidate
+
+
+@check
+def locations_in_range(config, layout, rng, queries):
+    """GameMap.get_locations_in_range against threat.indices_in_range"""
+    state = build_state(config, layout)
+    radii = sorted(set(info.get("attackRange", 0) for info in config["unitInformation"] if info.get("attackRange")))
+    radii += [info["upgrade"]["attackRange"] for info in config["unitInformation"] if "attackRange" in info.get("upgrade", {})]
+    cases = queries or [(to_location(rng.choice(ARENA_INDICES)), rng.choice(radii + [1, 2, 3])) for _ in range(50)]
+    game_map = state.game_map
+
+    def reference():
+        return [game_map.get_locations_in_range(location, radius) for location, radius in cases]
+
+    def candidate():
+        return [[to_location(index) for index in indices_in_range(location, radius)] for location, radius in cases]
+    return cases, reference, candidate
+
+
+@check
+def attackers(config, layout, rng, queries):
+    """The number of GameState.get_attackers against ThreatMap.attackers"""
+    state = build_state(config, layout)
+    cases = queries or [(to_location(rng.choice(ARENA_INDICES)), rng.randrange(2)) for _ in range(50)]
+
+    def reference():
+        return [len(state.get_attackers(location, player_index)) for location, player_index in cases]
+
+    def candidate():
+        maps = [ThreatMap(state, 0), ThreatMap(state, 1)]
+        return [maps[player_index].attackers[to_index(location)] for location, player_index in cases]
+    return cases, reference, candidate
+
+
+@check
+def target(config, layout, rng, queries):
+    """GameState.get_target against ActionPhaseSimulator.find_target"""
+    state = build_state(config, layout)
+    tiles = open_tiles(state)
+    if queries:
+        mobile = queries
+    else:
+        mobile = []
+        for _ in range(min(30, len(tiles))):
+            location = rng.choice(tiles)
+            type_index = rng.choice(MOBILE_TYPES)
+            health = config["unitInformation"][type_index]["startHealth"] * rng.choice([1, 1, 0.5, 0.2])
+            mobile.append((location, type_index, rng.randrange(2), health))
+    types = [info.get("shorthand") for info in config["unitInformation"]]
+    reference_units = []
+    for location, type_index, player_index, health in mobile:
+        unit = gamelib.GameUnit(types[type_index], config, player_index, health, location[0], location[1])
+        state.game_map[location[0], location[1]].append(unit)
+        reference_units.append(unit)
+
+    simulator = ActionPhaseSimulator(config)
+    occupancy = {}
+    for location in state.game_map:
+        for unit in state.game_map[location]:
+            if unit.stationary:
+                simulated = simulator.add_structure(unit.unit_type, location, unit.player_index, unit.health)
+                if unit.upgraded:
+                    simulator.upgrade_structure(location)
+                    simulated.health = unit.health
+                occupancy[to_index(location)] = [simulated]
+    candidate_units = []
+    for (location, type_index, player_index, health), unit in zip(mobile, reference_units):
+        simulated = SimulatedUnit(str(len(candidate_units)), types[type_index], type_index, player_index,
+                                  location[0], location[1], simulator.stats(types[type_index]), health)
+        occupancy.setdefault(to_index(location), []).append(simulated)
+        candidate_units.append(simulated)
+
+    def describe(unit):
+        return None if unit is None else [unit.x, unit.y, unit.unit_type, unit.player_index, unit.health]
+
+    def reference():
+        return [describe(state.get_target(unit)) for unit in reference_units]
+
+    def candidate():
+        return [describe(simulator.find_target(unit, occupancy)) for unit in candidate_units]
+    return mobile, reference, candidate
+
+
+@check
+def structure_count(config, layout, rng, queries):
+    """A scan of every tile, as AlgoStrategy.detect_enemy_unit did, against GameState.count_structures"""
+    state = build_state(config, layout)
+    types = [None] + [info.get("shorthand") for info in config["unitInformation"][:3]]
+
+    def lines():
+        return None if rng.random() < 0.4 else sorted(rng.sample(range(28), rng.randint(1, 4)))
+    cases = queries or [(rng.randrange(2), rng.choice(types), lines(), lines()) for _ in range(30)]
+
+    def reference():
+        totals = []
+        for player_index, unit_type, valid_x, valid_y in cases:
+            total = 0
+            for location in state.game_map:
+                if state.contains_stationary_unit(location):
+                    for unit in state.game_map[location]:
+                        if unit.player_index == player_index and (unit_type is None or unit.unit_type == unit_type) and \
+                                (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
+                            total += 1
+            totals.append(total)
+        return totals
+
+    def candidate():
+        return [state.count_structures(*case) for case in cases]
+    return cases, reference, candidate
+
+
+def diverges(name, config, layout, queries):
+    _, reference, candidate = CHECKS[name](config, layout, random.Random(0), queries)
+    return reference() != candidate()
+
+
+def minimize(name, config, layout, queries):
+    """Removes structures from the layout while the results still differ"""
+    layout = list(layout)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for index in range(len(layout)):
+            smaller = layout[:index] + layout[index + 1:]
+            if diverges(name, config, smaller, queries):
+                layout = smaller
+                shrunk = True
+                break
+    return layout
+
+
+def first_difference(queries, reference, candidate):
+    for query, expected, actual in zip(queries, reference, candidate):
+        if expected != actual:
+            return query, expected, actual
+    return None, reference, candidate
+
+
+def run_check(name, config, boards, seed, failures_dir):
+    rng = random.Random(seed)
+    reference_time = candidate_time = 0.0
+    failures = 0
+    for board in range(boards):
+        density = rng.choice([0.0, 0.05, 0.15, 0.3, 0.45, 0.6])
+        layout = generate_layout(density, rng.randrange(1 << 30))
+        queries, reference, candidate = CHECKS[name](config, layout, rng, None)
+        expected, seconds = timed(reference)
+        reference_time += seconds
+        actual, seconds = timed(candidate)
+        candidate_time += seconds
+        if expected == actual:
+            continue
+        failures += 1
+        query, expected, actual = first_difference(queries, expected, actual)
+        # The other queries may be needed to reproduce, as with mobile units being targeted
+        reproducing = [query] if diverges(name, config, layout, [query]) else queries
+        small = minimize(name, config, layout, reproducing)
+        print("  {} diverges on board {} (density {}), query {}, minimized to {} structures: {}".format(
+            name, board, density, query, len(small), small))
+        if failures_dir:
+            os.makedirs(failures_dir, exist_ok=True)
+            path = os.path.join(failures_dir, "{}-{}-{}.json".format(name, seed, board))
+            with open(path, "w") as failure_file:
+                json.dump({"check": name, "queries": reproducing, "layout": small, "expected": expected, "actual": actual,
+                           "turn_string": layout_to_turn_string(config, small)}, failure_file)
+    return {"check": name, "boards": boards, "failures": failures, "reference_seconds": reference_time,
+            "candidate_seconds": candidate_time,
+            "speedup": reference_time / candidate_time if candidate_time > 0 else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check fast implementations against the reference gamelib functions")
+    parser.add_argument("--boards", type=int, default=100, help="Random boards per check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(CHECKS), help="Run only these checks")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--failures", help="Save each minimized divergence as JSON in this folder")
+    parser.add_argument("--output", help="Write a JSON summary here")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    summaries = []
+    for name in args.only or sorted(CHECKS):
+        print("{}: {}".format(name, CHECKS[name].__doc__))
+        summary = run_check(name, config, args.boards, args.seed, args.failures)
+        summaries.append(summary)
+        speedup = "{:.1f}x".format(summary["speedup"]) if summary["speedup"] else "n/a"
+        print("  {} boards, {} diverged, reference {:.3f}s, candidate {:.3f}s, speedup {}".format(
+            summary["boards"], summary["failures"], summary["reference_seconds"], summary["candidate_seconds"], speedup))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(summaries, output_file, indent=1)
+    sys.exit(1 if any(summary["failures"] for summary in summaries) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Converts recorded games into a columnar NumPy dataset for offline analytics.
+
+Recordings made with ALGO_REPLAY_DIR (see gamelib.replay) are read turn by turn.
+Every turn string is parsed from the same unit lists GameState reads, and games
+are grouped into shards. Each shard is a folder with one .npy file per column,
+so np.load(path, mmap_mode="r") can read any column without loading the rest.
+Pass --npz to also pack every shard into a single compressed .npz file.
+
+Per turn columns, one row per turn of every game in the shard:
+    game, turn                       int32
+    health, SP, MP, time             float32 (turns, 2), our values first
+    structure_type                   int8 (turns, 28, 28), 0 when empty, otherwise unitInformation index + 1
+    structure_owner                  int8 (turns, 28, 28), -1 when empty, 0 for us, 1 for the enemy
+    structure_health                 float32 (turns, 28, 28)
+    structure_upgraded, structure_removing   bool (turns, 28, 28)
+    breach_count, breach_damage      float32 (turns, 2), breaches scored by each player in that turn's action phase
+    reply_seconds                    float32, time from receiving the turn to sending our deploy command
+
+Event tables, one row per event:
+    breach_game, breach_turn, breach_x, breach_y, breach_player, breach_event_damage
+    command_game, command_turn, command_phase (0 build, 1 deploy), command_type, command_x, command_y
+
+Usage:
+    python scripts/export_dataset.py "replays/*.replay.gz" --output dataset --games-per-shard 500
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Simon_5_5"))
+
+from gamelib.replay import read_replay, ALGO_TO_ENGINE
+
+ARENA_SIZE = 28
+REMOVE_INDEX = 6
+UPGRADE_INDEX = 7
+TURN_COLUMNS = ["game", "turn", "health", "SP", "MP", "time", "structure_type", "structure_owner", "structure_health",
+                "structure_upgraded", "structure_removing", "breach_count", "breach_damage", "reply_seconds"]
+BREACH_COLUMNS = ["breach_game", "breach_turn", "breach_x", "breach_y", "breach_player", "breach_event_damage"]
+COMMAND_COLUMNS = ["command_game", "command_turn", "command_phase", "command_type", "command_x", "command_y"]
+# Trailing shape of each column, used when a shard has no rows
+SHAPES = {"health": (2,), "SP": (2,), "MP": (2,), "time": (2,), "breach_count": (2,), "breach_damage": (2,),
+          "structure_type": (ARENA_SIZE, ARENA_SIZE), "structure_owner": (ARENA_SIZE, ARENA_SIZE),
+          "structure_health": (ARENA_SIZE, ARENA_SIZE), "structure_upgraded": (ARENA_SIZE, ARENA_SIZE),
+          "structure_removing": (ARENA_SIZE, ARENA_SIZE)}
+DTYPES = {"game": np.int32, "turn": np.int32, "health": np.float32, "SP": np.float32, "MP": np.float32,
+          "time": np.float32, "structure_type": np.int8, "structure_owner": np.int8, "structure_health": np.float32,
+          "structure_upgraded": np.bool_, "structure_removing": np.bool_, "breach_count": np.float32,
+          "breach_damage": np.float32, "reply_seconds": np.float32,
+          "breach_game": np.int32, "breach_turn": np.int32, "breach_x": np.int8, "breach_y": np.int8,
+          "breach_player": np.int8, "breach_event_damage": np.float32,
+          "command_game": np.int32, "command_turn": np.int32, "command_phase": np.int8, "command_type": np.int8,
+          "command_x": np.int8, "command_y": np.int8}
+
+
+class ShardBuilder:
+    """Collects rows for one shard and writes them as .npy columns"""
+    def __init__(self):
+        self.columns = dict((name, []) for name in TURN_COLUMNS + BREACH_COLUMNS + COMMAND_COLUMNS)
+        self.games = []
+        self.type_indices = {}
+
+    def add_turn(self, game, state):
+        """Adds a row for a turn string, parsed the way GameState.__create_parsed_units does"""
+        structure_type = np.zeros((ARENA_SIZE, ARENA_SIZE), np.int8)
+        structure_owner = np.full((ARENA_SIZE, ARENA_SIZE), -1, np.int8)
+        structure_health = np.zeros((ARENA_SIZE, ARENA_SIZE), np.float32)
+        upgraded = np.zeros((ARENA_SIZE, ARENA_SIZE), np.bool_)
+        removing = np.zeros((ARENA_SIZE, ARENA_SIZE), np.bool_)
+        for player_index, key in enumerate(["p1Units", "p2Units"]):
+            for type_index, units in enumerate(state[key]):
+                for unit in units:
+                    x, y = int(unit[0]), int(unit[1])
+                    if type_index == REMOVE_INDEX:
+                        removing[x, y] = True
+                    elif type_index == UPGRADE_INDEX:
+                        upgraded[x, y] = True
+                    else:
+                        structure_type[x, y] = type_index + 1
+                        structure_owner[x, y] = player_index
+                        structure_health[x, y] = float(unit[2])
+        columns = self.columns
+        columns["game"].append(game)
+        columns["turn"].append(int(state["turnInfo"][1]))
+        stats = [state["p1Stats"], state["p2Stats"]]
+        for position, name in enumerate(["health", "SP", "MP", "time"]):
+            columns[name].append([float(stats[0][position]), float(stats[1][position])])
+        columns["structure_type"].append(structure_type)
+        columns["structure_owner"].append(structure_owner)
+        columns["structure_health"].append(structure_health)
+        columns["structure_upgraded"].append(upgraded)
+        columns["structure_removing"].append(removing)
+        columns["breach_count"].append([0.0, 0.0])
+        columns["breach_damage"].append([0.0, 0.0])
+        columns["reply_seconds"].append(np.nan)
+
+    def add_frame(self, game, state):
+        """Adds the breaches of an action frame to the last turn row and the breach table"""
+        if not self.columns["turn"]:
+            return
+        turn = int(state["turnInfo"][1])
+        for breach in state["events"].get("breach", []):
+            player_index = int(breach[4]) - 1
+            self.columns["breach_count"][-1][player_index] += 1
+            self.columns["breach_damage"][-1][player_index] += float(breach[1])
+            for name, value in zip(BREACH_COLUMNS, [game, turn, breach[0][0], breach[0][1], player_index, breach[1]]):
+                self.columns[name].append(value)
+
+    def add_commands(self, game, phase, line):
+        if not self.columns["turn"]:
+            return
+        try:
+            commands = json.loads(line)
+        except ValueError:
+            return
+        turn = self.columns["turn"][-1]
+        for command in commands:
+            if len(command) < 3:
+                continue
+            type_index = self.type_indices.get(command[0], -1)
+            for name, value in zip(COMMAND_COLUMNS, [game, turn, phase, type_index, command[1], command[2]]):
+                self.columns[name].append(value)
+
+    def add_game(self, game, path):
+        """Reads one recording, returns the number of turns it held"""
+        turns = 0
+        commands_seen = 0
+        turn_received = None
+        self.type_indices = {}
+        for direction, timestamp, line in read_replay(path):
+            if direction == ALGO_TO_ENGINE:
+                if commands_seen < 2:
+                    self.add_commands(game, commands_seen, line)
+                commands_seen += 1
+                if commands_seen == 2 and turn_received is not None:
+                    self.columns["reply_seconds"][-1] = timestamp - turn_received
+                continue
+            if "replaySave" in line:
+                config = json.loads(line)
+                self.type_indices = dict((info.get("shorthand"), index) for index, info in enumerate(config["unitInformation"]))
+                continue
+            if "turnInfo" not in line:
+                continue
+            state = json.loads(line)
+            state_type = int(state["turnInfo"][0])
+            if state_type == 0:
+                self.add_turn(game, state)
+                turns += 1
+                commands_seen = 0
+                turn_received = timestamp
+            elif state_type == 1:
+                self.add_frame(game, state)
+        self.games.append({"game": game, "source": os.path.abspath(path), "turns": turns})
+        return turns
+
+    def write(self, directory, npz=False):
+        os.makedirs(directory, exist_ok=True)
+        arrays = {}
+        for name, values in self.columns.items():
+            if values:
+                arrays[name] = np.asarray(values, dtype=DTYPES[name])
+            else:
+                arrays[name] = np.zeros((0,) + SHAPES.get(name, ()), dtype=DTYPES[name])
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, name + ".npy"), array)
+        if npz:
+            np.savez_compressed(directory + ".npz", **arrays)
+        with open(os.path.join(directory, "games.json"), "w") as games_file:
+            json.dump(self.games, games_file)
+        return arrays
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert recorded games into a columnar NumPy dataset")
+    parser.add_argument("replays", nargs="+", help="Recordings made with ALGO_REPLAY_DIR, globs allowed")
+    parser.add_argument("--output", default="dataset", help="Folder the shards are written to")
+    parser.add_argument("--games-per-shard", type=int, default=500)
+    parser.add_argument("--npz", action="store_true", help="Also write each shard as a compressed .npz file")
+    args = parser.parse_args()
+
+    replays = sorted(set(path for pattern in args.replays for path in (glob.glob(pattern) or [pattern])))
+    os.makedirs(args.output, exist_ok=True)
+    manifest = {"columns": TURN_COLUMNS + BREACH_COLUMNS + COMMAND_COLUMNS, "shards": []}
+    for shard_index, first in enumerate(range(0, len(replays), args.games_per_shard)):
+        builder = ShardBuilder()
+        for game, path in enumerate(replays[first:first + args.games_per_shard], first):
+            builder.add_game(game, path)
+        name = "shard_{:04d}".format(shard_index)
+        arrays = builder.write(os.path.join(args.output, name), args.npz)
+        manifest["shards"].append({"name": name, "games": len(builder.games), "turns": len(arrays["turn"]),
+                                   "breaches": len(arrays["breach_game"]), "commands": len(arrays["command_game"])})
+        print("{}: {} games, {} turns".format(name, len(builder.games), len(arrays["turn"])))
+    with open(os.path.join(args.output, "manifest.json"), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
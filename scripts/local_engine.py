@@ -0,0 +1,365 @@
+"""
+A local stand-in for the game engine, for headless self-play.
+
+Launches two algos through their run.sh, speaks the same line protocol as the
+official engine (see AlgoCore.start) and plays the action phase with
+gamelib.simulator. The simulation follows the published rules but is not the
+official engine, so treat results as estimates.
+
+Usage:
+    python scripts/local_engine.py Simon_5_5 Simon_5_5 --games 4 --output summary.json
+"""
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Simon_5_5"))
+
+from gamelib.distance_field import (ARENA_SIZE, HALF_ARENA, IN_ARENA, EDGE_MEMBERSHIP, TOP_LEFT, TOP_RIGHT,
+                                    BOTTOM_LEFT, BOTTOM_RIGHT, to_index)
+from gamelib.simulator import ActionPhaseSimulator, EVENT_TYPES
+
+DEFAULT_CONFIG = os.path.join(REPO_DIR, "scripts", "game-configs.json")
+SPAWN_EDGES = [(BOTTOM_LEFT, BOTTOM_RIGHT), (TOP_LEFT, TOP_RIGHT)]
+REMOVE_INDEX = 6
+UPGRADE_INDEX = 7
+# Positions of locations inside each event, used to show player 2 the board from their side
+EVENT_LOCATIONS = {"selfDestruct": (0,), "breach": (0,), "damage": (0,), "shield": (0, 1), "move": (0, 1),
+                   "spawn": (0,), "death": (0,), "attack": (0, 1), "melee": (0, 1)}
+EVENT_PLAYER = {"death": 3}
+
+
+def flip_location(location):
+    return [ARENA_SIZE - 1 - location[0], ARENA_SIZE - 1 - location[1]]
+
+
+class AlgoProcess:
+    """One algo, running as a child process
+
+    Lines the algo prints are collected by a reader thread so reads can time out.
+
+    """
+    def __init__(self, algo_dir, name, log_file=None):
+        self.name = name
+        env = dict(os.environ, PYTHON_CMD=os.environ.get("PYTHON_CMD", sys.executable))
+        self.process = subprocess.Popen(["bash", os.path.join(algo_dir, "run.sh")], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=log_file or subprocess.DEVNULL,
+                                        universal_newlines=True, bufsize=1, env=env)
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self.__read, daemon=True)
+        self.reader.start()
+
+    def __read(self):
+        # Each line is queued with the time it arrived, so a slow reader does not add to the algo's latency
+        for line in self.process.stdout:
+            self.lines.put((line, time.perf_counter()))
+        self.lines.put((None, time.perf_counter()))
+
+    def send(self, line):
+        try:
+            self.process.stdin.write(line + "\n")
+            self.process.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError):
+            return False
+
+    def read_line(self, timeout):
+        """The next line the algo printed and the perf_counter time it arrived, or (None, None) if it timed out or exited"""
+        try:
+            return self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+
+    def close(self, timeout=5):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class LocalMatch:
+    """A single game between two algos
+
+    Attributes :
+        * health, SP, MP ([float, float]): Each player's stats, player 0 at the bottom
+        * turn (int): The current turn
+        * latency ([[float]]): Seconds each algo took to reply on each turn
+        * timeouts ([int, int]): Turns each algo failed to reply to in time
+
+    """
+    def __init__(self, config, algos, turn_timeout=None, max_turns=100, max_frames=1000):
+        self.config = config
+        self.algos = algos
+        resources = config["resources"]
+        self.health = [resources["startingHP"]] * 2
+        self.SP = [resources["startingCores"]] * 2
+        self.MP = [resources["startingBits"]] * 2
+        self.turn = 0
+        self.max_turns = max_turns
+        self.max_frames = max_frames
+        if turn_timeout is None:
+            turn_timeout = config.get("timingAndReplay", {}).get("waitTimeBotMax", 35000) / 1000
+        self.turn_timeout = turn_timeout
+        self.latency = [[], []]
+        self.timeouts = [0, 0]
+        self.simulator = ActionPhaseSimulator(config)
+        self.unit_types = [unit_info.get("shorthand") for unit_info in config["unitInformation"]]
+        self.remove_type = self.unit_types[REMOVE_INDEX]
+        self.upgrade_type = self.unit_types[UPGRADE_INDEX]
+
+    def play(self):
+        """Plays until a player runs out of health or max_turns is reached
+
+        Returns:
+            The index of the winner, or None for a draw
+
+        """
+        config_line = json.dumps(self.config)
+        for algo in self.algos:
+            algo.send(config_line)
+        while True:
+            commands = self.__collect_turn()
+            for player_index in range(2):
+                build, deploy = commands[player_index]
+                self.__apply_build(player_index, build)
+                self.__apply_deploy(player_index, deploy)
+            self.__action_phase()
+            if min(self.health) <= 0 or self.turn + 1 >= self.max_turns:
+                break
+            self.__end_turn()
+        self.__send_state(2, -1, None)
+        if self.health[0] == self.health[1]:
+            return None
+        return 0 if self.health[0] > self.health[1] else 1
+
+    def __collect_turn(self):
+        commands = []
+        started = []
+        for player_index, algo in enumerate(self.algos):
+            started.append(time.perf_counter())
+            algo.send(self.__state_string(player_index, 0, -1, None))
+        for player_index, algo in enumerate(self.algos):
+            lines = []
+            arrived = None
+            deadline = started[player_index] + self.turn_timeout
+            while len(lines) < 2:
+                line, arrived = algo.read_line(max(0, deadline - time.perf_counter()))
+                if line is None or arrived > deadline:
+                    break
+                line = line.strip()
+                if line.startswith("["):
+                    lines.append(line)
+            if len(lines) < 2:
+                self.timeouts[player_index] += 1
+                lines = ["[]", "[]"]
+            else:
+                self.latency[player_index].append(arrived - started[player_index])
+            commands.append([self.__parse_stack(player_index, line) for line in lines])
+        return commands
+
+    def __parse_stack(self, player_index, line):
+        try:
+            stack = json.loads(line)
+        except ValueError:
+            return []
+        parsed = []
+        for entry in stack:
+            if len(entry) < 3:
+                continue
+            unit_type, x, y = entry[0], int(entry[1]), int(entry[2])
+            if player_index == 1:
+                x, y = flip_location([x, y])
+            parsed.append((unit_type, x, y))
+        return parsed
+
+    def __on_own_half(self, player_index, x, y):
+        if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE) or not IN_ARENA[to_index([x, y])]:
+            return False
+        return y < HALF_ARENA if player_index == 0 else y >= HALF_ARENA
+
+    def __apply_build(self, player_index, build):
+        simulator = self.simulator
+        for unit_type, x, y in build:
+            if not self.__on_own_half(player_index, x, y):
+                continue
+            existing = simulator.structure_at([x, y])
+            if unit_type == self.remove_type:
+                if existing is not None and existing.player_index == player_index:
+                    existing.pending_removal = True
+            elif unit_type == self.upgrade_type:
+                if existing is not None and existing.player_index == player_index and not existing.upgraded:
+                    type_config = self.config["unitInformation"][existing.type_index]
+                    if "upgrade" not in type_config:
+                        continue
+                    cost = type_config["upgrade"].get("cost1", type_config.get("cost1", 0))
+                    if self.SP[player_index] >= cost:
+                        self.SP[player_index] -= cost
+                        simulator.upgrade_structure([x, y])
+            elif unit_type in self.unit_types[:REMOVE_INDEX] and existing is None:
+                stats = simulator.stats(unit_type)
+                if stats["stationary"] and self.SP[player_index] >= stats["cost"][0]:
+                    self.SP[player_index] -= stats["cost"][0]
+                    simulator.add_structure(unit_type, [x, y], player_index)
+
+    def __apply_deploy(self, player_index, deploy):
+        simulator = self.simulator
+        edges = SPAWN_EDGES[player_index]
+        for unit_type, x, y in deploy:
+            if unit_type not in self.unit_types[:REMOVE_INDEX] or not self.__on_own_half(player_index, x, y):
+                continue
+            index = to_index([x, y])
+            if not any(index in EDGE_MEMBERSHIP[edge] for edge in edges) or simulator.structure_at([x, y]) is not None:
+                continue
+            stats = simulator.stats(unit_type)
+            if not stats["stationary"] and self.MP[player_index] >= stats["cost"][1]:
+                self.MP[player_index] -= stats["cost"][1]
+                simulator.spawn(unit_type, [x, y], player_index)
+
+    def __action_phase(self):
+        simulator = self.simulator
+        simulator.new_round()
+
+        def on_frame(frame, events):
+            self.__send_state(1, frame, events)
+        result = simulator.run(self.max_frames, on_frame)
+        # Units left on the board when the frame limit is hit do not carry over
+        simulator.mobile_units = []
+        breach_reward = self.config["resources"]["coresForPlayerDamage"]
+        for x, y, player_index in result.breaches:
+            self.SP[player_index] += breach_reward
+        for player_index in range(2):
+            self.health[1 - player_index] -= result.breach_damage[player_index]
+
+    def __end_turn(self):
+        simulator = self.simulator
+        for index, structure in list(simulator.structures.items()):
+            if structure.pending_removal:
+                stats = structure.stats
+                refund = stats["refund"] * stats["cost"][0] * structure.health / stats["max_health"]
+                self.SP[structure.player_index] += refund
+                simulator.remove_structure([structure.x, structure.y])
+        self.turn += 1
+        resources = self.config["resources"]
+        for player_index in range(2):
+            # Same schedule as GameState.project_future_MP
+            MP = self.MP[player_index] * (1 - resources["bitDecayPerRound"])
+            MP += resources["bitsPerRound"] + resources["bitGrowthRate"] * (self.turn // resources["turnIntervalForBitSchedule"])
+            self.MP[player_index] = round(MP, 1)
+            self.SP[player_index] += resources["coresPerRound"]
+
+    def __send_state(self, state_type, frame, events):
+        for player_index, algo in enumerate(self.algos):
+            algo.send(self.__state_string(player_index, state_type, frame, events))
+
+    def __state_string(self, player_index, state_type, frame, events):
+        """The game state as player_index sees it, with their units as p1 at the bottom of the board"""
+        units = [[[] for _ in self.unit_types], [[] for _ in self.unit_types]]
+        everything = list(self.simulator.structures.values()) + self.simulator.mobile_units
+        for unit in everything:
+            location = [unit.x, unit.y] if player_index == 0 else flip_location([unit.x, unit.y])
+            owner = unit.player_index if player_index == 0 else 1 - unit.player_index
+            entry = location + [unit.health, unit.unit_id]
+            units[owner][unit.type_index].append(entry)
+            if unit.pending_removal:
+                units[owner][REMOVE_INDEX].append(entry)
+            if unit.upgraded:
+                units[owner][UPGRADE_INDEX].append(entry)
+        stats = [[self.health[index], self.SP[index], self.MP[index], 0] for index in range(2)]
+        if player_index == 1:
+            stats.reverse()
+        if events is None:
+            events = dict((event_type, []) for event_type in EVENT_TYPES)
+        elif player_index == 1:
+            events = self.__flip_events(events)
+        state = {"p1Units": units[0], "p2Units": units[1], "turnInfo": [state_type, self.turn, frame],
+                 "p1Stats": stats[0], "p2Stats": stats[1], "events": events}
+        return json.dumps(state)
+
+    def __flip_events(self, events):
+        flipped = {}
+        for event_type, entries in events.items():
+            flipped_entries = []
+            for entry in entries:
+                entry = list(entry)
+                for position in EVENT_LOCATIONS.get(event_type, ()):
+                    entry[position] = flip_location(entry[position])
+                if event_type == "selfDestruct":
+                    entry[1] = [flip_location(target) for target in entry[1]]
+                player_position = EVENT_PLAYER.get(event_type, len(entry) - 1)
+                entry[player_position] = 3 - entry[player_position]
+                flipped_entries.append(entry)
+            flipped[event_type] = flipped_entries
+        return flipped
+
+
+def summarize(values):
+    if not values:
+        return {"mean": None, "max": None}
+    return {"mean": sum(values) / len(values), "max": max(values)}
+
+
+def run_game(config, algo_dirs, seat_swap=False, **kwargs):
+    """Plays one game and returns a summary dict
+
+    With seat_swap the second algo plays as player 0. "replies" holds the seconds
+    each algo took on every turn it replied to in time, "latency" their mean and max.
+
+    """
+    order = [1, 0] if seat_swap else [0, 1]
+    log_file = kwargs.pop("log_file", None)
+    algos = [AlgoProcess(algo_dirs[index], "algo{}".format(index + 1), log_file) for index in order]
+    started = time.perf_counter()
+    try:
+        match = LocalMatch(config, algos, **kwargs)
+        winner = match.play()
+    finally:
+        for algo in algos:
+            algo.close()
+    return {"winner": None if winner is None else order[winner], "turns": match.turn + 1, "health": [match.health[order.index(index)] for index in range(2)],
+            "seconds": time.perf_counter() - started,
+            "latency": [summarize(match.latency[order.index(index)]) for index in range(2)],
+            "replies": [match.latency[order.index(index)] for index in range(2)],
+            "timeouts": [match.timeouts[order.index(index)] for index in range(2)]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games between two algos on a local stand-in engine")
+    parser.add_argument("algo1", help="Folder containing the first algo's run.sh")
+    parser.add_argument("algo2", help="Folder containing the second algo's run.sh")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Game config JSON")
+    parser.add_argument("--games", type=int, default=1, help="Number of games, alternating who plays at the bottom")
+    parser.add_argument("--turn-timeout", type=float, default=None, help="Seconds an algo has to reply each turn")
+    parser.add_argument("--max-turns", type=int, default=100)
+    parser.add_argument("--output", help="Write a JSON summary here")
+    parser.add_argument("--debug", action="store_true", help="Show the algos' debug output")
+    args = parser.parse_args()
+
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+    games = []
+    for game in range(args.games):
+        summary = run_game(config, [args.algo1, args.algo2], seat_swap=game % 2 == 1, turn_timeout=args.turn_timeout,
+                           max_turns=args.max_turns, log_file=sys.stderr if args.debug else None)
+        games.append(summary)
+        outcome = "draw" if summary["winner"] is None else "algo{} won".format(summary["winner"] + 1)
+        print("Game {}: {} in {} turns, health {}, {:.1f}s".format(
+            game + 1, outcome, summary["turns"], summary["health"], summary["seconds"]))
+    wins = [sum(1 for game in games if game["winner"] == index) for index in range(2)]
+    print("Wins: algo1 {} algo2 {}".format(*wins))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"algos": [args.algo1, args.algo2], "wins": wins, "games": games}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Microbenchmarks of the gamelib hot paths on synthetic boards.
+
+Every benchmark runs on boards from scripts/boards.py at each requested density
+and seed. Results are written as JSON so runs can be compared over time.
+
+Usage:
+    python scripts/microbench.py --densities 0 0.1 0.2 0.3 --seeds 3 --output bench.json
+    python scripts/microbench.py --only find_path_to_edge get_target
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from boards import load_config, generate_board, DEFAULT_CONFIG
+
+import gamelib
+from gamelib.transposition import default_transposition_table
+
+BENCHMARKS = {}
+
+
+def benchmark(function):
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def new_state(config, turn_string):
+    state = gamelib.GameState(config, turn_string)
+    state.suppress_warnings(True)
+    return state
+
+
+def edge_locations(state):
+    game_map = state.game_map
+    return [location for edge in range(4) for location in game_map.get_edge_locations(edge)
+            if not state.contains_stationary_unit(location)]
+
+
+@benchmark
+def game_state_construction(config, turn_string):
+    """Parses the turn string into a GameState"""
+    new_state(config, turn_string)
+    return 1
+
+
+@benchmark
+def find_path_to_edge(config, turn_string):
+    """Paths from every open edge tile, with an empty cache so every path is searched"""
+    state = new_state(config, turn_string)
+    locations = edge_locations(state)
+    default_transposition_table().clear()
+    for location in locations:
+        state.find_path_to_edge(location)
+    return len(locations)
+
+
+@benchmark
+def find_path_to_edge_cached(config, turn_string):
+    """Paths from every open edge tile after they have been cached for this layout"""
+    state = new_state(config, turn_string)
+    locations = edge_locations(state)
+    for location in locations:
+        state.find_path_to_edge(location)
+    started = time.perf_counter()
+    for location in locations:
+        state.find_path_to_edge(location)
+    return len(locations), time.perf_counter() - started
+
+
+@benchmark
+def get_attackers(config, turn_string):
+    """Attackers of every arena tile, for both players"""
+    state = new_state(config, turn_string)
+    locations = state.game_map.get_locations_in_range([13, 13], 27)
+    for location in locations:
+        state.get_attackers(location, 0)
+        state.get_attackers(location, 1)
+    return 2 * len(locations)
+
+
+@benchmark
+def get_locations_in_range(config, turn_string):
+    """Every unit range around every arena tile"""
+    state = new_state(config, turn_string)
+    game_map = state.game_map
+    locations = game_map.get_locations_in_range([13, 13], 27)
+    for radius in (1.5, 2.5, 3.5, 4.5):
+        for location in locations:
+            game_map.get_locations_in_range(location, radius)
+    return 4 * len(locations)
+
+
+@benchmark
+def get_target(config, turn_string):
+    """Targets of a scout and an interceptor of each player on every open tile"""
+    state = new_state(config, turn_string)
+    types = [config["unitInformation"][3]["shorthand"], config["unitInformation"][5]["shorthand"]]
+    units = []
+    for location in state.game_map.get_locations_in_range([13, 13], 27):
+        if state.contains_stationary_unit(location):
+            continue
+        for unit_type in types:
+            for player_index in range(2):
+                units.append(gamelib.GameUnit(unit_type, config, player_index, None, location[0], location[1]))
+    started = time.perf_counter()
+    for unit in units:
+        state.get_target(unit)
+    return len(units), time.perf_counter() - started
+
+
+@benchmark
+def spawn_ranking(config, turn_string):
+    """Ranks every open tile of our edges, with an empty cache"""
+    state = new_state(config, turn_string)
+    default_transposition_table().clear()
+    ranking = gamelib.SpawnRanking(state)
+    return len(ranking.ranked)
+
+
+@benchmark
+def wave_profiles(config, turn_string):
+    """Scout and demolisher wave profiles from every open spawn tile, with the spawn rankings cached"""
+    state = new_state(config, turn_string)
+    types = [config["unitInformation"][3]["shorthand"], config["unitInformation"][4]["shorthand"]]
+    for unit_type in types:
+        gamelib.get_spawn_ranking(state, unit_type)
+    started = time.perf_counter()
+    estimator = gamelib.WaveEstimator(state)
+    profiles = [profile for unit_type in types for profile in estimator.profiles(unit_type)]
+    return len(profiles), time.perf_counter() - started
+
+
+@benchmark
+def firing_positions(config, turn_string):
+    """Demolisher firing positions from every open spawn tile, with the spawn ranking cached"""
+    state = new_state(config, turn_string)
+    gamelib.get_spawn_ranking(state, config["unitInformation"][4]["shorthand"])
+    started = time.perf_counter()
+    optimizer = gamelib.FiringPositionOptimizer(state)
+    return len(optimizer.ranked), time.perf_counter() - started
+
+
+@benchmark
+def attack_plan(config, turn_string):
+    """A full search of demolisher and scout mixes with 20 MP, with the spawn rankings cached"""
+    state = new_state(config, turn_string)
+    state._player_resources[0]["MP"] = 20
+    for type_index in (3, 4):
+        gamelib.get_spawn_ranking(state, config["unitInformation"][type_index]["shorthand"])
+    started = time.perf_counter()
+    planner = gamelib.AttackPlanner(state)
+    planner.plan(time_budget=10)
+    return planner.evaluated + planner.pruned, time.perf_counter() - started
+
+
+@benchmark
+def attempt_spawn_sweep(config, turn_string):
+    """Tries a turret on every tile of our half with plenty of SP"""
+    state = new_state(config, turn_string)
+    state._player_resources[0]["SP"] = 1000
+    locations = [location for location in state.game_map.get_locations_in_range([13, 13], 27) if location[1] < state.HALF_ARENA]
+    state.attempt_spawn(config["unitInformation"][2]["shorthand"], locations)
+    return len(locations)
+
+
+@benchmark
+def build_plan_sweep(config, turn_string):
+    """The same sweep as attempt_spawn_sweep through a BuildPlan compiled beforehand"""
+    state = new_state(config, turn_string)
+    state._player_resources[0]["SP"] = 1000
+    locations = [location for location in state.game_map.get_locations_in_range([13, 13], 27) if location[1] < state.HALF_ARENA]
+    plan = gamelib.BuildPlan(config).spawn(config["unitInformation"][2]["shorthand"], locations)
+    plan.compile()
+    started = time.perf_counter()
+    state.attempt_build_plan(plan)
+    return len(locations), time.perf_counter() - started
+
+
+@benchmark
+def algo_on_turn(config, turn_string):
+    """A full AlgoStrategy.on_turn, commands discarded"""
+    import algo_strategy
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        algo = algo_strategy.AlgoStrategy()
+        algo.on_game_start(config)
+        started = time.perf_counter()
+        algo.on_turn(turn_string)
+        elapsed = time.perf_counter() - started
+    return 1, elapsed
+
+
+def measure(function, config, turn_string, repeat):
+    """Best of repeat runs, as seconds per call
+
+    Benchmarks return a call count, or a call count and the seconds of the part worth timing.
+    """
+    best = None
+    calls = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outcome = function(config, turn_string)
+        elapsed = time.perf_counter() - started
+        if isinstance(outcome, tuple):
+            calls, elapsed = outcome
+        else:
+            calls = outcome
+        if best is None or elapsed < best:
+            best = elapsed
+    return calls, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time gamelib hot paths on synthetic boards")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.0, 0.1, 0.2, 0.3, 0.4])
+    parser.add_argument("--seeds", type=int, default=3, help="Boards per density")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per board, the best is kept")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--output", help="Write results as JSON here")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    names = args.only or sorted(BENCHMARKS)
+    results = []
+    print("{:<26} {:>8} {:>8} {:>12} {:>12}".format("benchmark", "density", "calls", "us per call", "ms per board"))
+    for name in names:
+        for density in args.densities:
+            totals = []
+            for seed in range(args.seeds):
+                turn_string = generate_board(config, density, seed)
+                calls, seconds = measure(BENCHMARKS[name], config, turn_string, args.repeat)
+                totals.append((calls, seconds))
+                results.append({"benchmark": name, "density": density, "seed": seed, "calls": calls,
+                                "seconds": seconds, "us_per_call": seconds / max(1, calls) * 1e6})
+            calls = sum(count for count, _ in totals)
+            seconds = sum(elapsed for _, elapsed in totals)
+            print("{:<26} {:>8.2f} {:>8} {:>12.2f} {:>12.3f}".format(name, density, calls, seconds / max(1, calls) * 1e6,
+                                                                     seconds * 1000 / len(totals)))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, output_file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
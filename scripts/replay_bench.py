@@ -0,0 +1,195 @@
+"""
+Benchmarks an algo against recorded engine traffic.
+
+Recordings made with ALGO_REPLAY_DIR (see gamelib.replay) are fed through a fresh
+AlgoStrategy at full speed, without the engine. Every on_turn and on_action_frame
+call is timed and latency percentiles are reported per phase and per game stage.
+
+Each algo runs in its own process, so two versions can be compared side by side:
+
+    python scripts/replay_bench.py replays/*.replay.gz
+    python scripts/replay_bench.py replays/*.replay.gz --compare git:HEAD~3
+    python scripts/replay_bench.py replays/*.replay.gz --algo /tmp/variant --compare Simon_5_5
+"""
+import argparse
+import glob
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "Simon_5_5"))
+DEFAULT_ALGO = os.path.join(REPO_DIR, "Simon_5_5")
+PHASES = ["on_turn", "on_action_frame"]
+STAGES = ["early", "mid", "late"]
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of a sorted list, the smallest value with at least fraction of the values at or below it"""
+    if not values:
+        return float("nan")
+    # The small slack keeps products such as 0.07 * 100 = 7.000000000000001 on their whole rank
+    rank = max(0, min(len(values) - 1, math.ceil(fraction * len(values) - 1e-9) - 1))
+    return values[rank]
+
+
+def stage_of(algo, turn):
+    if turn < getattr(algo, "stage_1", 12):
+        return "early"
+    if turn < getattr(algo, "stage_2", 36):
+        return "mid"
+    return "late"
+
+
+def extract_engine_lines(replays, directory):
+    """
+    Writes the lines the engine sent in each recording to a plain text file, so algos
+    from revisions without gamelib.replay can be benchmarked too.
+    """
+    from gamelib.replay import read_replay, ENGINE_TO_ALGO
+    paths = []
+    for index, replay in enumerate(replays):
+        path = os.path.join(directory, "{}.lines".format(index))
+        with open(path, "w") as lines_file:
+            for direction, _, line in read_replay(replay):
+                if direction == ENGINE_TO_ALGO:
+                    lines_file.write(line + "\n")
+        paths.append(path)
+    return paths
+
+
+def bench_worker(algo_dir, replays, repeat):
+    """Runs inside a child process with algo_dir's gamelib and algo_strategy first on the path
+
+    Args:
+        replays: Files written by extract_engine_lines
+
+    Returns:
+        A dict of phase to stage to a list of call times in seconds
+
+    """
+    sys.path.insert(0, algo_dir)
+    import algo_strategy
+
+    timings = dict((phase, dict((stage, []) for stage in STAGES)) for phase in PHASES)
+    sink = io.StringIO()
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    for _ in range(repeat):
+        for path in replays:
+            with open(path) as lines_file:
+                lines = lines_file.read().splitlines()
+            # Commands and debug output go nowhere, as they would be ignored by the engine anyway
+            sys.stdout, sys.stderr = sink, sink
+            try:
+                algo = algo_strategy.AlgoStrategy()
+                for line in lines:
+                    if "replaySave" in line:
+                        algo.on_game_start(json.loads(line))
+                        continue
+                    if "turnInfo" not in line:
+                        continue
+                    turn_info = json.loads(line)["turnInfo"]
+                    state_type, turn = int(turn_info[0]), int(turn_info[1])
+                    if state_type == 2:
+                        break
+                    phase = "on_turn" if state_type == 0 else "on_action_frame"
+                    started = time.perf_counter()
+                    if state_type == 0:
+                        algo.on_turn(line)
+                    else:
+                        algo.on_action_frame(line)
+                    elapsed = time.perf_counter() - started
+                    timings[phase][stage_of(algo, turn)].append(elapsed)
+                    sink.seek(0)
+                    sink.truncate()
+            finally:
+                sys.stdout, sys.stderr = real_stdout, real_stderr
+    return timings
+
+
+def export_revision(revision, directory):
+    """Extracts the algo folder at a git revision into directory and returns its path"""
+    archive = subprocess.run(["git", "-C", REPO_DIR, "archive", revision, "Simon_5_5"], check=True, stdout=subprocess.PIPE).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+    return os.path.join(directory, "Simon_5_5")
+
+
+def run_side(target, replays, repeat, scratch):
+    if target.startswith("git:"):
+        algo_dir = export_revision(target[len("git:"):], tempfile.mkdtemp(dir=scratch))
+    else:
+        algo_dir = os.path.abspath(target)
+    command = [sys.executable, os.path.abspath(__file__), "--worker", algo_dir, "--repeat", str(repeat)] + replays
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(times):
+    values = sorted(times)
+    return {"calls": len(values), "p50": percentile(values, 0.50), "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99), "max": values[-1] if values else float("nan")}
+
+
+def rows(timings):
+    for phase in PHASES:
+        for stage in STAGES + ["all"]:
+            if stage == "all":
+                times = [value for values in timings[phase].values() for value in values]
+            else:
+                times = timings[phase][stage]
+            yield phase, stage, summarize(times)
+
+
+def print_report(names, results):
+    header = "{:<16} {:<6}".format("phase", "stage")
+    for name in names:
+        header += " | {:>7} {:>8} {:>8} {:>8} {:>8}".format("calls", "p50 ms", "p95 ms", "p99 ms", "max ms")
+    if len(names) == 2:
+        header += " | {:>9}".format("p50 ratio")
+    print(" " * 24 + "".join(" | {:<44}".format(name[:44]) for name in names))
+    print(header)
+    tables = [list(rows(timings)) for timings in results]
+    for index, (phase, stage, _) in enumerate(tables[0]):
+        line = "{:<16} {:<6}".format(phase, stage)
+        for table in tables:
+            stats = table[index][2]
+            line += " | {:>7} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}".format(
+                stats["calls"], stats["p50"] * 1000, stats["p95"] * 1000, stats["p99"] * 1000, stats["max"] * 1000)
+        if len(tables) == 2:
+            before, after = tables[0][index][2]["p50"], tables[1][index][2]["p50"]
+            line += " | {:>9.2f}".format(after / before if before > 0 else float("nan"))
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time an algo's turn and frame handlers against recorded games")
+    parser.add_argument("replays", nargs="+", help="Recordings made with ALGO_REPLAY_DIR, globs allowed")
+    parser.add_argument("--algo", default=DEFAULT_ALGO, help="Algo folder, or git:REVISION for the algo at a revision")
+    parser.add_argument("--compare", help="A second algo folder or git:REVISION to compare against")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to play each recording")
+    parser.add_argument("--output", help="Write the raw timings as JSON here")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    replays = sorted(set(path for pattern in args.replays for path in (glob.glob(pattern) or [pattern])))
+    if args.worker:
+        print(json.dumps(bench_worker(args.worker, replays, args.repeat)))
+        return
+
+    names = [args.algo] + ([args.compare] if args.compare else [])
+    with tempfile.TemporaryDirectory() as scratch:
+        lines = extract_engine_lines(replays, scratch)
+        results = [run_side(name, lines, args.repeat, scratch) for name in names]
+    print_report(names, results)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(dict(zip(names, results)), output_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Measures how long a freshly launched algo takes to be ready for its first turn.
+
+The engine starts a new algo process for every game, so interpreter startup,
+imports and on_game_start are paid every game before the first turn is answered.
+Each run launches a new interpreter with -X importtime that imports algo_strategy,
+calls on_game_start with the config and on_turn with an empty turn 0 board, and
+reports when each step finished. The import time lines are collected up to the
+first turn, so the breakdown shows which modules the startup actually paid for.
+
+Every side gets its own empty ALGO_CACHE_DIR, so the first run is a first game
+(cold precompute cache and bytecode) and the later runs are the games after it.
+
+Usage:
+    python scripts/startup_bench.py --runs 10
+    python scripts/startup_bench.py --compare git:HEAD~1 --top 15 --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from boards import load_config, layout_to_turn_string, DEFAULT_CONFIG
+from replay_bench import export_revision, DEFAULT_ALGO
+
+STEPS = ["interpreter", "import", "on_game_start", "first_turn"]
+READY_MARKER = "startup_bench: first turn ready"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+# Runs in the launched interpreter. It imports nothing before algo_strategy that the
+# interpreter has not already loaded, so the algo is charged for all of its imports.
+CHILD = """
+import sys, time
+started = time.time()
+algo_dir, config_path, turn_path = sys.argv[1:4]
+sys.path.insert(0, algo_dir)
+import algo_strategy
+imported = time.time()
+import io, json
+with open(config_path) as config_file:
+    config_string = config_file.read()
+with open(turn_path) as turn_file:
+    turn_string = turn_file.read()
+real_stdout = sys.stdout
+sys.stdout = io.StringIO()
+algo = algo_strategy.AlgoStrategy()
+algo.on_game_start(json.loads(config_string))
+game_started = time.time()
+algo.on_turn(turn_string)
+turn_done = time.time()
+sys.stdout = real_stdout
+sys.stderr.write("{}\\n".format(MARKER))
+print(json.dumps([started, imported, game_started, turn_done]))
+"""
+
+
+def parse_import_times(stderr):
+    """Import time lines printed before the first turn was ready, as {module: (self us, cumulative us, depth)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if line.startswith(READY_MARKER):
+            break
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return modules
+
+
+def launch(algo_dir, config_path, turn_path, environment):
+    """One cold start, returns the seconds each step took and the import times"""
+    command = [sys.executable, "-X", "importtime", "-c", CHILD.replace("MARKER", repr(READY_MARKER)),
+               algo_dir, config_path, turn_path]
+    launched = time.time()
+    process = subprocess.run(command, cwd=algo_dir, env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError("The algo in {} failed to start:\n{}".format(algo_dir, process.stderr[-2000:]))
+    marks = [launched] + json.loads(process.stdout.strip().splitlines()[-1])
+    steps = dict((step, marks[index + 1] - marks[index]) for index, step in enumerate(STEPS))
+    steps["total"] = marks[-1] - launched
+    return steps, parse_import_times(process.stderr)
+
+
+def run_side(target, runs, config_path, turn_path, scratch):
+    if target.startswith("git:"):
+        algo_dir = export_revision(target[len("git:"):], tempfile.mkdtemp(dir=scratch))
+    else:
+        algo_dir = os.path.abspath(target)
+    environment = dict(os.environ)
+    environment["ALGO_CACHE_DIR"] = tempfile.mkdtemp(dir=scratch)
+    environment.pop("ALGO_REPLAY_DIR", None)
+    # The later runs should find the bytecode written by the first, as later games do
+    environment.pop("PYTHONDONTWRITEBYTECODE", None)
+    results = [launch(algo_dir, config_path, turn_path, environment) for _ in range(runs)]
+    return {"steps": [steps for steps, _ in results], "imports": [modules for _, modules in results]}
+
+
+def median_imports(runs):
+    """Median self and cumulative microseconds of every module, over the runs that imported it"""
+    names = set(name for modules in runs for name in modules)
+    medians = {}
+    for name in names:
+        samples = [modules[name] for modules in runs if name in modules]
+        medians[name] = (statistics.median(own for own, _, _ in samples),
+                         statistics.median(cumulative for _, cumulative, _ in samples), samples[0][2])
+    return medians
+
+
+def print_steps(names, results):
+    print("{:<14}".format("step") + "".join(" | {:>10} {:>10} {:>10}".format("first ms", "median ms", "max ms") for _ in names))
+    for step in STEPS + ["total"]:
+        line = "{:<14}".format(step)
+        for result in results:
+            first = result["steps"][0][step]
+            later = [steps[step] for steps in result["steps"][1:]] or [first]
+            line += " | {:>10.1f} {:>10.1f} {:>10.1f}".format(first * 1000, statistics.median(later) * 1000, max(later) * 1000)
+        print(line)
+
+
+def print_imports(names, results, top):
+    for name, result in zip(names, results):
+        # The first run also compiles bytecode, so it is left out of the breakdown
+        medians = median_imports(result["imports"][1:] or result["imports"])
+        print("\nImports of {}, median over runs (ms)".format(name))
+        print("{:<40} {:>8} {:>10}".format("module", "self", "cumulative"))
+        for module, (own, cumulative, depth) in sorted(medians.items(), key=lambda item: -item[1][1])[:top]:
+            print("{:<40} {:>8.2f} {:>10.2f}".format(("  " * depth + module)[:40], own / 1000, cumulative / 1000))
+        gamelib_total = sum(own for module, (own, _, _) in medians.items() if module.split(".")[0] in ("gamelib", "algo_strategy"))
+        print("{:<40} {:>8.2f}".format("algo and gamelib modules, self", gamelib_total / 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a cold algo process from launch to its first turn")
+    parser.add_argument("--algo", default=DEFAULT_ALGO, help="Algo folder, or git:REVISION for the algo at a revision")
+    parser.add_argument("--compare", help="A second algo folder or git:REVISION to compare against")
+    parser.add_argument("--runs", type=int, default=10, help="Processes to launch for each algo")
+    parser.add_argument("--top", type=int, default=20, help="Modules to list in the import breakdown")
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--output", help="Write the raw timings as JSON here")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    names = [args.algo] + ([args.compare] if args.compare else [])
+    with tempfile.TemporaryDirectory() as scratch:
+        config_path = os.path.join(scratch, "config.json")
+        turn_path = os.path.join(scratch, "turn.json")
+        with open(config_path, "w") as config_file:
+            json.dump(config, config_file)
+        with open(turn_path, "w") as turn_file:
+            turn_file.write(layout_to_turn_string(config, [], turn=0))
+        results = [run_side(name, args.runs, config_path, turn_path, scratch) for name in names]
+    print_steps(names, results)
+    print_imports(names, results, args.top)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(dict(zip(names, results)), output_file)
+
+
+if __name__ == "__main__":
+    main()
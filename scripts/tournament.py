@@ -0,0 +1,145 @@
+"""
+Round robin tournament between algo variants on the local stand-in engine.
+
+Games run on a process pool, one game per core. Every finished game is appended
+to a results file as one JSON line, and win rates with Wilson score intervals are
+printed once all games are done, with the mean and 95th percentile of the
+algos' reply times over every turn. Rerunning with the same results file and
+--resume skips games already played.
+
+Usage:
+    python scripts/tournament.py base=Simon_5_5 early=/tmp/early_stage_1 --games 20 --results results.jsonl
+"""
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_engine import DEFAULT_CONFIG, run_game
+from replay_bench import percentile
+
+
+def wilson_interval(wins, games, z=1.96):
+    """The Wilson score interval for a win rate, (low, high)"""
+    if games == 0:
+        return (0.0, 1.0)
+    rate = wins / games
+    denominator = 1 + z ** 2 / games
+    center = (rate + z ** 2 / (2 * games)) / denominator
+    spread = z * math.sqrt(rate * (1 - rate) / games + z ** 2 / (4 * games ** 2)) / denominator
+    return (max(0.0, center - spread), min(1.0, center + spread))
+
+
+def play(job):
+    """Runs one scheduled game in a worker process"""
+    game_id, names, dirs, config, options = job
+    try:
+        summary = run_game(config, dirs, seat_swap=game_id[2] % 2 == 1, **options)
+    except Exception as error:
+        return {"id": list(game_id), "algos": names, "error": repr(error)}
+    # Reply times are kept per turn, to 10 microseconds, so sweeps can be summarized any way afterwards
+    return {"id": list(game_id), "algos": names, "winner": summary["winner"], "turns": summary["turns"],
+            "health": summary["health"], "seconds": round(summary["seconds"], 3),
+            "replies": [[round(value, 5) for value in replies] for replies in summary["replies"]],
+            "timeouts": summary["timeouts"]}
+
+
+def schedule(variants, games_per_pair, done):
+    jobs = []
+    for (first, second) in itertools.combinations(range(len(variants)), 2):
+        for game in range(games_per_pair):
+            game_id = (variants[first][0], variants[second][0], game)
+            if game_id not in done:
+                jobs.append((game_id, [variants[first][0], variants[second][0]], [variants[first][1], variants[second][1]]))
+    return jobs
+
+
+def aggregate(records):
+    """Wins, draws and games per variant, draws counting as half a win"""
+    table = {}
+    for record in records:
+        if "error" in record:
+            continue
+        for seat, name in enumerate(record["algos"]):
+            row = table.setdefault(name, {"games": 0, "wins": 0, "draws": 0, "turns": 0, "latency": []})
+            row["games"] += 1
+            row["turns"] += record["turns"]
+            if record["winner"] is None:
+                row["draws"] += 1
+            elif record["winner"] == seat:
+                row["wins"] += 1
+            # Records written before reply times were kept per turn have none
+            row["latency"].extend(record.get("replies", [[], []])[seat])
+    return table
+
+
+def print_table(table):
+    print("{:<20} {:>6} {:>6} {:>6} {:>8} {:>17} {:>10} {:>12} {:>11}".format(
+        "variant", "games", "wins", "draws", "win rate", "95% interval", "avg turns", "mean reply s", "p95 reply s"))
+    for name, row in sorted(table.items(), key=lambda item: -(item[1]["wins"] + item[1]["draws"] / 2) / max(1, item[1]["games"])):
+        score = row["wins"] + row["draws"] / 2
+        low, high = wilson_interval(score, row["games"])
+        latency = sum(row["latency"]) / len(row["latency"]) if row["latency"] else float("nan")
+        print("{:<20} {:>6} {:>6} {:>6} {:>8.3f} {:>8.3f}-{:<8.3f} {:>10.1f} {:>12.4f} {:>11.4f}".format(
+            name, row["games"], row["wins"], row["draws"], score / max(1, row["games"]), low, high,
+            row["turns"] / max(1, row["games"]), latency, percentile(sorted(row["latency"]), 0.95)))
+
+
+def parse_variant(text):
+    if "=" in text:
+        name, path = text.split("=", 1)
+    else:
+        path = text
+        name = os.path.basename(os.path.normpath(text))
+    return name, os.path.abspath(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a round robin tournament between algo variants in parallel")
+    parser.add_argument("variants", nargs="+", help="Variants as name=folder, each folder containing a run.sh")
+    parser.add_argument("--games", type=int, default=10, help="Games per pair of variants, alternating seats")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Game config JSON")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Games played at once")
+    parser.add_argument("--max-turns", type=int, default=100)
+    parser.add_argument("--turn-timeout", type=float, default=None, help="Seconds an algo has to reply each turn")
+    parser.add_argument("--results", default="tournament_results.jsonl", help="One JSON line per game is appended here")
+    parser.add_argument("--resume", action="store_true", help="Skip games already in the results file")
+    args = parser.parse_args()
+
+    variants = [parse_variant(text) for text in args.variants]
+    if len(set(name for name, _ in variants)) != len(variants):
+        parser.error("Variant names must be unique")
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+
+    records = []
+    if args.resume and os.path.exists(args.results):
+        with open(args.results) as results_file:
+            records = [json.loads(line) for line in results_file if line.strip()]
+    done = set(tuple(record["id"]) for record in records if "error" not in record)
+    names = set(name for name, _ in variants)
+    records = [record for record in records if set(record["algos"]) <= names]
+
+    options = {"max_turns": args.max_turns, "turn_timeout": args.turn_timeout}
+    jobs = [(game_id, job_names, dirs, config, options) for game_id, job_names, dirs in schedule(variants, args.games, done)]
+    print("Playing {} games on {} workers".format(len(jobs), args.workers))
+    with open(args.results, "a" if args.resume else "w") as results_file:
+        with multiprocessing.Pool(args.workers) as pool:
+            for count, record in enumerate(pool.imap_unordered(play, jobs), 1):
+                results_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                results_file.flush()
+                records.append(record)
+                if "error" in record:
+                    print("Game {} failed: {}".format(record["id"], record["error"]))
+                elif count % max(1, len(jobs) // 10) == 0:
+                    print("{}/{} games played".format(count, len(jobs)))
+    print_table(aggregate(records))
+
+
+if __name__ == "__main__":
+    main()